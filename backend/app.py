@@ -7,13 +7,17 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from flask import Flask, g
 from flask_cors import CORS
 from backend.database import close_db, startup, DB_PATH
+from backend import metrics, profiling
 
 def create_app():
     app = Flask(__name__)
-    CORS(app)
+    CORS(app, expose_headers=['X-Next-Cursor'])
     
     # Register Teardown
     app.teardown_appcontext(close_db)
+    # Inside the metrics wrapper, so a profiled request is still counted
+    profiling.init_app(app)
+    metrics.init_app(app)
     
     # Import Blueprints
     from backend.routes.auth import auth_bp
@@ -21,6 +25,7 @@ def create_app():
     from backend.routes.doctors import doctors_bp
     from backend.routes.admin import admin_bp
     from backend.routes.notifications import notifications_bp
+    from backend.routes.stream import stream_bp
     from backend.routes.pages import pages_bp
     
     # Register Blueprints
@@ -29,6 +34,7 @@ def create_app():
     app.register_blueprint(doctors_bp, url_prefix='/api') # doctors.py has /doctors and /departments
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
     app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
+    app.register_blueprint(stream_bp, url_prefix='/api/stream')
     app.register_blueprint(pages_bp, url_prefix='/')
 
     return app
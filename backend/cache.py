@@ -0,0 +1,96 @@
+"""
+In-process read-through cache for tables that rarely change (the doctor and
+department catalog).
+
+Every entry remembers the table_versions counter of its table when it was
+loaded. Triggers bump that counter on any write, so a lookup reads one
+primary-key row and serves the cached value only while the counter still
+matches. A write in one worker process therefore invalidates the copies held
+by every other process on their next read, without any messaging between them.
+
+The same counters feed the strong ETags of the catalog, slot and booking GETs:
+a repeat poll costs one counter read and an empty 304.
+"""
+import hashlib
+import threading
+from flask import current_app, request
+from backend import database
+
+# Filters come from query strings, so the key space is open-ended; past this
+# many entries the cache starts over rather than growing without bound
+MAX_ENTRIES = 256
+
+
+def table_version(db, table):
+    row = db.execute("SELECT version FROM table_versions WHERE name = ?", (table,)).fetchone()
+    return row[0] if row else None
+
+def make_etag(*parts):
+    """Strong validator for a response fully determined by parts (versions, filters)."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+def not_modified(etag, cache_control='no-cache'):
+    """
+    An empty 304 when the client already holds etag, else None. Call it before
+    the main query: all it needs is the version counters that went into etag.
+    """
+    if not request.if_none_match.contains(etag):
+        return None
+    return with_etag(current_app.response_class(status=304), etag, cache_control)
+
+def with_etag(response, etag, cache_control='no-cache'):
+    # no-cache: the browser may keep the body but asks again (cheaply) every time
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+class VersionedCache:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db, table, key, load, version=None):
+        """
+        Value cached under (table, key), or load() when the table changed since.
+        The version is read before load() runs, so a write racing the load can
+        only make the next lookup miss, never serve stale data.
+        """
+        if version is None:
+            version = table_version(db, table)
+        # Versions restart at 0 in every database file (tests swap DB_PATH)
+        key = (database.DB_PATH, table, key)
+        entry = self._entries.get(key)
+        if entry is not None and version is not None and entry[0] == version:
+            with self._lock:
+                self.hits += 1
+            return entry[1]
+
+        value = load()
+        with self._lock:
+            self.misses += 1
+            if len(self._entries) >= MAX_ENTRIES and key not in self._entries:
+                self._entries.clear()
+            self._entries[key] = (version, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else None,
+                'entries': len(self._entries),
+            }
+
+
+# Shared by routes/doctors.py; values are treated as read-only
+catalog = VersionedCache()
@@ -1,6 +1,14 @@
 from flask import g
 import sqlite3
+import logging
 import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import Counter
+from backend import slowlog
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # Adjusted to be in backend/
 DB_PATH = os.path.join(BASE_DIR, 'backend', 'bookings.db') # app.py is in backend/, so database.py in backend/ means BASE_DIR is backend/. 
@@ -16,30 +24,290 @@ DB_PATH = os.path.join(BASE_DIR, 'backend', 'bookings.db') # app.py is in backen
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, 'bookings.db')
 
+# Applied to every new connection. WAL lets readers run next to the single
+# writer; synchronous=NORMAL is durable across app crashes in WAL mode and only
+# risks the last commits on power loss.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",      # KiB, i.e. 16 MB of page cache per connection
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+POOL_ENABLED = os.environ.get('DB_POOL', '1') != '0'
+# Per-request latency and SQL counters (metrics.py, GET /api/admin/metrics)
+METRICS_ENABLED = os.environ.get('METRICS', '1') != '0'
+
+class SqlStats(threading.local):
+    """Statements and execute() time of the current thread; metrics.py resets it per request."""
+    statements = 0
+    seconds = 0.0
+
+sql_stats = SqlStats()
+
+class Connection(sqlite3.Connection):
+    """
+    Counts the statements run through execute()/executemany() into sql_stats
+    and hands the slow ones to slowlog. Rows a SELECT still streams to
+    fetchall() after its first step are not timed, which for this app's
+    queries (sorted, limited or single-row) is a small share of the work.
+    """
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            cursor = super().execute(sql, parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            sql_stats.statements += 1
+            sql_stats.seconds += elapsed
+        if elapsed >= slowlog.THRESHOLD:
+            return slowlog.record(self, sql, parameters, cursor, elapsed)
+        return cursor
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            cursor = super().executemany(sql, seq_of_parameters)
+        finally:
+            elapsed = time.perf_counter() - started
+            sql_stats.statements += 1
+            sql_stats.seconds += elapsed
+        if elapsed >= slowlog.THRESHOLD:
+            return slowlog.record(self, sql, seq_of_parameters, cursor, elapsed, many=True)
+        return cursor
+
+def connect(path=None, check_same_thread=True):
+    conn = sqlite3.connect(path or DB_PATH, check_same_thread=check_same_thread,
+                           factory=Connection if METRICS_ENABLED or slowlog.THRESHOLD < float('inf') else sqlite3.Connection)
+    conn.row_factory = sqlite3.Row
+    # Setup and health checks below bypass Connection.execute so they do not
+    # count as the SQL of the request that happens to open the connection
+    for pragma in PRAGMAS:
+        sqlite3.Connection.execute(conn, pragma)
+    return conn
+
+class ConnectionPool:
+    """
+    Idle connections to one database file, reused across requests.
+
+    The dev server starts a new thread for every request, so connections are
+    pooled per process rather than per thread: a request checks one out, owns
+    it until teardown and hands it back. Checkout never blocks; when the pool
+    is empty a new connection is opened, and at most `size` are kept idle.
+    """
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(('opened', 'closed', 'checkouts', 'reused', 'health_failures', 'in_use'), 0)
+
+    def _count(self, key, delta=1):
+        with self._lock:
+            self._stats[key] += delta
+
+    def _open(self):
+        self._count('opened')
+        return connect(self.path, check_same_thread=False)
+
+    def _close(self, conn):
+        self._count('closed')
+        conn.close()
+
+    def acquire(self):
+        conn = None
+        while conn is None:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+                break
+            try:
+                sqlite3.Connection.execute(conn, "SELECT 1").fetchone()
+                self._count('reused')
+            except sqlite3.Error:
+                self._count('health_failures')
+                self._close(conn)
+                conn = None
+        self._count('checkouts')
+        self._count('in_use')
+        return conn
+
+    def release(self, conn):
+        self._count('in_use', -1)
+        try:
+            # Work a request never committed is discarded, as closing used to do
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._close(conn)
+            return
+        if self._idle.qsize() >= self.size:
+            self._close(conn)
+        else:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, path=self.path, size=self.size, idle=self._idle.qsize())
+
+# One pool per database file, so pointing DB_PATH elsewhere (tests, benchmarks)
+# never hands out a connection to the previous file
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=None):
+    path = path or DB_PATH
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [p.stats() for p in pools]
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
 def get_db():
     db = getattr(g, '_database', None)
     if db is None:
-        db = g._database = sqlite3.connect(DB_PATH)
-        db.row_factory = sqlite3.Row
+        if POOL_ENABLED:
+            g._db_pool = get_pool()
+            db = g._database = g._db_pool.acquire()
+        else:
+            db = g._database = connect()
     return db
 
 def close_db(exception):
-    db = getattr(g, '_database', None)
-    if db is not None:
+    db = g.pop('_database', None)
+    if db is None:
+        return
+    pool = g.pop('_db_pool', None)
+    if pool is not None:
+        pool.release(db)
+    else:
         db.close()
 
-def init_db():
-    db = get_db()
-    
-    # bookings table
-    cur = db.execute("PRAGMA table_info(bookings)")
-    cols = [r['name'] for r in cur.fetchall()]
-    if 'booking_Status' not in cols:
-        db.execute("DROP TABLE IF EXISTS bookings")
+# Retry policy for write transactions that lose the race for the SQLite write lock
+LOCK_RETRIES = 5
+LOCK_BACKOFF = 0.05 # seconds, doubled on every attempt
+
+def is_lock_error(exc):
+    msg = str(exc).lower()
+    return 'locked' in msg or 'busy' in msg
+
+def run_immediate(db, work, retries=LOCK_RETRIES, backoff=LOCK_BACKOFF):
+    """
+    Runs work(db) inside a BEGIN IMMEDIATE transaction and commits it.
+    The write lock is taken up front, so nothing read inside work() can be
+    changed by another writer before we commit. Lock errors are retried with
+    jittered exponential backoff; any other exception rolls back and propagates.
+    """
+    if db.in_transaction:
         db.commit()
 
-    db.execute(
-        """
+    attempt = 0
+    while True:
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            result = work(db)
+            db.commit()
+            return result
+        except sqlite3.OperationalError as e:
+            if db.in_transaction:
+                db.rollback()
+            if not is_lock_error(e) or attempt >= retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+            attempt += 1
+        except Exception:
+            if db.in_transaction:
+                db.rollback()
+            raise
+
+# bookings.detail JSON key -> column holding the same value
+BOOKING_DETAIL_COLUMNS = {
+    'patientName': 'patient_name',
+    'doctorName': 'doctor_name',
+    'departmentName': 'department_name',
+    'departmentValue': 'department_value',
+    'symptoms': 'symptoms',
+}
+
+def backfill_booking_columns(db, batch_size=5000, commit=True):
+    """
+    Copies the detail JSON fields of existing bookings into their columns,
+    batch_size ids per transaction. Rows whose detail is not a JSON object
+    keep the raw text as symptoms, like the old read paths did.
+    """
+    is_obj = "json_valid(detail) AND json_type(detail) = 'object'"
+    sets = [f"{col} = CASE WHEN {is_obj} THEN json_extract(detail, '$.{key}') END"
+            for key, col in BOOKING_DETAIL_COLUMNS.items() if key != 'symptoms']
+    sets.append(f"symptoms = CASE WHEN {is_obj} THEN json_extract(detail, '$.symptoms') ELSE detail END")
+    sql = f"UPDATE bookings SET {', '.join(sets)} WHERE id > ? AND id <= ?"
+
+    last_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM bookings").fetchone()[0]
+    start = 0
+    while start < last_id:
+        db.execute(sql, (start, start + batch_size))
+        if commit:
+            db.commit()
+        start += batch_size
+
+def backfill_booking_times(db, batch_size=5000, commit=True):
+    """
+    Fills bookings.slot_date ('YYYY-MM-DD') and start_time ('HH:MM'), batch_size
+    ids per transaction. booking_at wins when it holds a valid date, because a
+    reschedule rewrites booking_at but keeps the original slot_id; rows with
+    an unusable booking_at ('None None', blank) take the linked slot's values,
+    as does the time of a booking_at with a date but no usable time.
+    A time range such as '10:30 - 11:00' keeps its start.
+    """
+    rest = "trim(substr(booking_at, instr(booking_at || ' ', ' ') + 1))"
+    sql = f"""
+        UPDATE bookings SET
+            slot_date = COALESCE(
+                date(substr(booking_at, 1, instr(booking_at || ' ', ' ') - 1)),
+                (SELECT s.slot_date FROM appointment_slots s WHERE s.slot_id = bookings.slot_id)),
+            start_time = CASE
+                WHEN date(substr(booking_at, 1, instr(booking_at || ' ', ' ') - 1)) IS NOT NULL
+                THEN COALESCE(strftime('%H:%M', substr({rest}, 1, 5)),
+                              (SELECT s.start_time FROM appointment_slots s WHERE s.slot_id = bookings.slot_id))
+                ELSE (SELECT s.start_time FROM appointment_slots s WHERE s.slot_id = bookings.slot_id)
+            END
+        WHERE id > ? AND id <= ?
+    """
+    last_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM bookings").fetchone()[0]
+    start = 0
+    while start < last_id:
+        db.execute(sql, (start, start + batch_size))
+        if commit:
+            db.commit()
+        start += batch_size
+
+# Schema as of the first versioned release. Older databases may have been
+# created with fewer columns; the baseline step adds what is missing instead of
+# dropping the table.
+BASELINE_TABLES = {
+    'bookings': """
         CREATE TABLE IF NOT EXISTS bookings (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             slot_id INTEGER,
@@ -52,28 +320,8 @@ def init_db():
             updated_at TEXT,
             FOREIGN KEY(id_users) REFERENCES users(ID_user)
         )
-        """
-    )
-    db.commit()
-    
-    # Check for new columns in bookings and add if missing
-    cur = db.execute("PRAGMA table_info(bookings)")
-    cols = [r['name'] for r in cur.fetchall()]
-    if 'created_at' not in cols:
-        db.execute("ALTER TABLE bookings ADD COLUMN created_at TEXT")
-    if 'updated_at' not in cols:
-        db.execute("ALTER TABLE bookings ADD COLUMN updated_at TEXT")
-    db.commit()
-
-    # staff table
-    cur = db.execute("PRAGMA table_info(staff)")
-    staff_cols = [r['name'] for r in cur.fetchall()]
-    if 'full_name' in staff_cols:
-        db.execute("DROP TABLE staff")
-        db.commit()
-
-    db.execute(
-        """
+    """,
+    'staff': """
         CREATE TABLE IF NOT EXISTS staff (
             id_admin INTEGER PRIMARY KEY AUTOINCREMENT,
             firstname TEXT,
@@ -85,19 +333,8 @@ def init_db():
             role TEXT,
             created_at TEXT
         )
-        """
-    )
-    db.commit()
-
-    # doctors table
-    cur = db.execute("PRAGMA table_info(doctors)")
-    doc_cols = [r['name'] for r in cur.fetchall()]
-    if 'department' not in doc_cols:
-        db.execute("DROP TABLE IF EXISTS doctors")
-        db.commit()
-
-    db.execute(
-        """
+    """,
+    'doctors': """
         CREATE TABLE IF NOT EXISTS doctors (
             id_doctor INTEGER PRIMARY KEY AUTOINCREMENT,
             firstname TEXT,
@@ -110,19 +347,8 @@ def init_db():
             image TEXT,
             status_color TEXT DEFAULT 'text-green-600'
         )
-        """
-    )
-    db.commit()
-
-    # users table
-    cur = db.execute("PRAGMA table_info(users)")
-    current_cols = [r['name'] for r in cur.fetchall()]
-    if 'first_name' in current_cols:
-        db.execute("DROP TABLE users")
-        db.commit()
-
-    db.execute(
-        """
+    """,
+    'users': """
         CREATE TABLE IF NOT EXISTS users (
             ID_user INTEGER PRIMARY KEY AUTOINCREMENT,
             firstname TEXT,
@@ -135,43 +361,21 @@ def init_db():
             created_at TEXT,
             last_login TEXT
         )
-        """
-    )
-    db.commit()
-
-    # Check for last_login column in users and add if missing
-    cur = db.execute("PRAGMA table_info(users)")
-    current_cols = [r['name'] for r in cur.fetchall()]
-    if 'last_login' not in current_cols:
-        db.execute("ALTER TABLE users ADD COLUMN last_login TEXT")
-        db.commit()
-
-    # departments table
-    db.execute(
-        """
+    """,
+    'departments': """
         CREATE TABLE IF NOT EXISTS departments (
             department_id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT
         )
-        """
-    )
-    db.commit()
-
-    # Doctor_to_Department table
-    db.execute(
-        """
+    """,
+    'Doctor_to_Department': """
         CREATE TABLE IF NOT EXISTS Doctor_to_Department (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             doctor_id TEXT,
             department_id INTEGER
         )
-        """
-    )
-    db.commit()
-
-    # appointment_slots table
-    db.execute(
-        """
+    """,
+    'appointment_slots': """
         CREATE TABLE IF NOT EXISTS appointment_slots (
             slot_id INTEGER PRIMARY KEY AUTOINCREMENT,
             doctor_id INTEGER,
@@ -185,13 +389,24 @@ def init_db():
             FOREIGN KEY(doctor_id) REFERENCES doctors(id_doctor),
             FOREIGN KEY(department_id) REFERENCES departments(department_id)
         )
-        """
-    )
-    db.commit()
+    """,
+}
+
+# Matches "name TYPE ..." column lines of the CREATE TABLE statements above
+COLUMN_DEF = re.compile(r'^\s*(\w+)\s+([A-Z]+)(.*?),?\s*$')
 
-    # Seed initial departments if empty
-    cur = db.execute("SELECT count(*) FROM departments")
-    if cur.fetchone()[0] == 0:
+def add_missing_columns(db, table, create_sql):
+    have = {r['name'] for r in db.execute(f"PRAGMA table_info({table})")}
+    for line in create_sql.splitlines():
+        m = COLUMN_DEF.match(line)
+        if not m or m.group(1) in have or m.group(1) in ('CREATE', 'FOREIGN'):
+            continue
+        # ALTER TABLE cannot add PRIMARY KEY/UNIQUE columns; keep type and default only
+        default = re.search(r"DEFAULT\s+('[^']*'|\S+)", m.group(3))
+        db.execute(f"ALTER TABLE {table} ADD COLUMN {m.group(1)} {m.group(2)}" + (f" DEFAULT {default.group(1)}" if default else ''))
+
+def seed_catalog(db):
+    if db.execute("SELECT count(*) FROM departments").fetchone()[0] == 0:
         initial_depts = [
             ('อายุรกรรม',),
             ('ทันตกรรม',),
@@ -199,11 +414,8 @@ def init_db():
             ('กุมารเวชกรรม',)
         ]
         db.executemany("INSERT INTO departments (name) VALUES (?)", initial_depts)
-        db.commit()
 
-    # Seed initial doctors if empty
-    cur = db.execute("SELECT count(*) FROM doctors")
-    if cur.fetchone()[0] == 0:
+    if db.execute("SELECT count(*) FROM doctors").fetchone()[0] == 0:
         initial_doctors = [
             ('สมชาย', 'ใจดี', 'D001', 'med', 'อายุรกรรมทั่วไป', 'ว่างวันนี้', 'จ-ศ 09:00-16:00', 'https://cdn-icons-png.flaticon.com/512/3774/3774299.png', 'text-green-600'),
             ('วารี', 'รักษา', 'D002', 'med', 'อายุรกรรมโรคหัวใจ', 'คิวเต็มช่วงเช้า', 'อ-พฤ 10:00-14:00', 'https://cdn-icons-png.flaticon.com/512/3774/3774293.png', 'text-gray-400'),
@@ -215,5 +427,332 @@ def init_db():
             ('เด็กน้อย', 'สดใส', 'D008', 'pedia', 'ทารกแรกเกิด', 'คิวเต็มวันนี้', 'จ-ศ 08:00-16:00', 'https://cdn-icons-png.flaticon.com/512/3774/3774299.png', 'text-red-600')
         ]
         db.executemany("INSERT INTO doctors (firstname, lastname, doctor_id, department, specialist, status, schedule, image, status_color) VALUES (?,?,?,?,?,?,?,?,?)", initial_doctors)
+
+def migrate_baseline(db):
+    for table, create_sql in BASELINE_TABLES.items():
+        db.execute(create_sql)
+        add_missing_columns(db, table, create_sql)
+    seed_catalog(db)
+
+def migrate_notifications_outbox(db):
+    # notifications outbox (see outbox.py), append-only
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            booking_id INTEGER,
+            event TEXT,
+            type TEXT,
+            title TEXT,
+            message TEXT,
+            date TEXT,
+            time TEXT,
+            patient_name TEXT,
+            is_new INTEGER DEFAULT 1,
+            meta TEXT,
+            created_at TEXT
+        )
+    """)
+
+def add_columns(db, table, columns):
+    have = {r['name'] for r in db.execute(f"PRAGMA table_info({table})")}
+    for col in columns:
+        if col not in have:
+            db.execute(f"ALTER TABLE {table} ADD COLUMN {col} TEXT")
+
+def migrate_booking_detail_columns(db):
+    add_columns(db, 'bookings', BOOKING_DETAIL_COLUMNS.values())
+    backfill_booking_columns(db, commit=False)
+
+def migrate_booking_day_time(db):
+    add_columns(db, 'bookings', ('slot_date', 'start_time'))
+    backfill_booking_times(db, commit=False)
+
+# Frozen copy of the schedule parser in schedules.py as migrate_doctor_schedules
+# first shipped it. Leave it alone when that parser changes: replaying
+# MIGRATIONS on an old database must always produce the same rules.
+SCHEDULE_DAY_NAMES = sorted({
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6,
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
+    'จ': 0, 'อ': 1, 'พ': 2, 'พฤ': 3, 'ศ': 4, 'ส': 5, 'อา': 6,
+    'จันทร์': 0, 'อังคาร': 1, 'พุธ': 2, 'พฤหัส': 3, 'พฤหัสบดี': 3, 'ศุกร์': 4, 'เสาร์': 5, 'อาทิตย์': 6,
+}.items(), key=lambda kv: -len(kv[0]))
+SCHEDULE_SEGMENT = re.compile(r'([^\d;]*?)\s*(\d{1,2})[:.](\d{2})\s*-\s*(\d{1,2})[:.](\d{2})')
+SCHEDULE_FALLBACK = [(0b0011111, '09:00', '11:00'), (0b0011111, '13:00', '17:00')]
+
+def schedule_days(text):
+    text = text.strip().strip(',').strip()
+    if not text or text.lower() in ('ทุกวัน', 'every day', 'everyday', 'daily'):
+        return 0b1111111
+    names = dict(SCHEDULE_DAY_NAMES)
+    mask = 0
+    for part in re.split(r'[,\s]+', text):
+        if not part:
+            continue
+        # KeyError for a day name nobody knows, like the ValueError upstream
+        first, _, last = (p.strip().lower() for p in part.partition('-'))
+        day, last = names[first], names[last or first]
+        while True:
+            mask |= 1 << day
+            if day == last:
+                break
+            day = (day + 1) % 7
+    return mask
+
+def schedule_rules(text):
+    """Free-text schedule -> [(weekdays, start_time, end_time)], or the fallback hours when unreadable."""
+    rules = []
+    try:
+        for days, h1, m1, h2, m2 in SCHEDULE_SEGMENT.findall(text or ''):
+            start, end = f'{int(h1):02d}:{m1}', f'{int(h2):02d}:{m2}'
+            if start >= end:
+                raise ValueError(start, end)
+            rules.append((schedule_days(days), start, end))
+    except (KeyError, ValueError):
+        rules = []
+    return rules or list(SCHEDULE_FALLBACK)
+
+def migrate_doctor_schedules(db):
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS doctor_schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            doctor_id INTEGER NOT NULL,
+            weekdays INTEGER NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            slot_minutes INTEGER NOT NULL DEFAULT 30,
+            capacity INTEGER NOT NULL DEFAULT 10,
+            valid_from TEXT,
+            valid_to TEXT,
+            FOREIGN KEY(doctor_id) REFERENCES doctors(id_doctor)
+        )
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_exceptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            doctor_id INTEGER NOT NULL,
+            exception_date TEXT NOT NULL,
+            reason TEXT,
+            UNIQUE(doctor_id, exception_date)
+        )
+    """)
+    # Rules for existing doctors come from their free-text schedule
+    for doc in db.execute("SELECT id_doctor, schedule FROM doctors").fetchall():
+        db.execute("DELETE FROM doctor_schedules WHERE doctor_id = ?", (doc['id_doctor'],))
+        db.executemany(
+            "INSERT INTO doctor_schedules (doctor_id, weekdays, start_time, end_time, slot_minutes, capacity) VALUES (?,?,?,?,30,10)",
+            [(doc['id_doctor'], days, start, end) for days, start, end in schedule_rules(doc['schedule'])]
+        )
+
+def add_version_triggers(db, table):
+    """Bumps table_versions[table] on every insert, update and delete of table."""
+    db.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (table,))
+    for op in ('INSERT', 'UPDATE', 'DELETE'):
+        db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{op.lower()} AFTER {op} ON {table}
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+            END
+        """)
+
+def migrate_table_versions(db):
+    # Change counters for cache.py; kept by triggers so every writer (any
+    # worker process, admin scripts, the sqlite3 shell) invalidates caches
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for table in ('doctors', 'departments'):
+        add_version_triggers(db, table)
+
+def add_keyed_version_triggers(db, table, prefix, column):
+    """Bumps table_versions['<prefix>:<column value>'] for every row of table that changes."""
+    bump = f"""
+        INSERT INTO table_versions (name, version) SELECT '{prefix}:' || {{row}}.{column}, 1 WHERE {{cond}}
+        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+    """
+    bodies = {
+        'insert': bump.format(row='NEW', cond='1'),
+        'delete': bump.format(row='OLD', cond='1'),
+        'update': bump.format(row='NEW', cond='1') + bump.format(row='OLD', cond=f'OLD.{column} IS NOT NEW.{column}'),
+    }
+    for op, body in bodies.items():
+        db.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{prefix}_version_{op} AFTER {op.upper()} ON {table}
+            BEGIN
+                {body}
+            END
+        """)
+
+def migrate_entity_versions(db):
+    # Per-entity counters behind the ETags of GET /api/doctors/<id>/slots
+    # ('slots:<doctor_id>' rows) and GET /api/bookings/<id> (bookings.row_version)
+    for table in ('appointment_slots', 'doctor_schedules', 'schedule_exceptions'):
+        add_keyed_version_triggers(db, table, 'slots', 'doctor_id')
+    if 'row_version' not in {r['name'] for r in db.execute("PRAGMA table_info(bookings)")}:
+        db.execute("ALTER TABLE bookings ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+    # recursive_triggers is off, so the inner UPDATE does not fire this again
+    db.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_bookings_row_version AFTER UPDATE ON bookings
+        WHEN OLD.row_version IS NEW.row_version
+        BEGIN
+            UPDATE bookings SET row_version = OLD.row_version + 1 WHERE id = NEW.id;
+        END
+    """)
+
+# users columns a person is looked up by; each identifies one account
+USER_IDENTIFIERS = ('tel', 'email', 'card_id')
+
+def normalize_identifier(value):
+    # '081-234-5678' and '1 2345 67890 12 3' are typed as often as the bare digits
+    return re.sub(r'[\s-]', '', value or '')
+
+def normalize_user_identifiers(db):
+    # Older registrations stored tel/card_id as typed, but login looks up the
+    # bare digits. A row that would collide with another account once
+    # normalized keeps its value; login still finds it by the exact string.
+    for col in ('tel', 'card_id'):
+        rows = [(r[0], r[1], normalize_identifier(r[1])) for r in db.execute(f"SELECT ID_user, {col} FROM users WHERE {col} IS NOT NULL")]
+        counts = Counter(value for _, _, value in rows)
+        changes = [(value, user_id) for user_id, raw, value in rows if value != raw]
+        db.executemany(f"UPDATE users SET {col} = ? WHERE ID_user = ?", [c for c in changes if counts[c[0]] == 1])
+        kept = sum(1 for value, _ in changes if counts[value] > 1)
+        if kept:
+            logging.getLogger(__name__).warning(
+                "users.%s: %d formatted value(s) left as stored; normalizing them would duplicate another account", col, kept)
+
+def migrate_unique_user_identifiers(db):
+    normalize_user_identifiers(db)
+    # Blank means "not given": NULLs never collide in a UNIQUE index, '' would
+    for col in USER_IDENTIFIERS:
+        db.execute(f"UPDATE users SET {col} = NULL WHERE trim({col}) = ''")
+    for col in USER_IDENTIFIERS:
+        try:
+            db.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS ux_users_{col} ON users({col})")
+        except sqlite3.IntegrityError:
+            # Existing duplicates have to be merged by hand; until then keep
+            # the lookup indexed and let the routes cope with several rows
+            dupes = db.execute(f"SELECT count(*) FROM (SELECT 1 FROM users WHERE {col} IS NOT NULL GROUP BY {col} HAVING count(*) > 1)").fetchone()[0]
+            logging.getLogger(__name__).warning(
+                "users.%s has %d duplicated value(s); keeping a non-unique index. "
+                "Merge the duplicates and run: CREATE UNIQUE INDEX ux_users_%s ON users(%s)", col, dupes, col, col)
+            db.execute(f"CREATE INDEX IF NOT EXISTS idx_users_{col} ON users({col})")
+        else:
+            db.execute(f"DROP INDEX IF EXISTS idx_users_{col}")
+
+# Applied in order; PRAGMA user_version holds how many have run. Append new
+# steps at the end and never edit one that has shipped. INDEXES is re-applied
+# after any pending step, so a new index needs a (possibly empty) step too.
+MIGRATIONS = [
+    migrate_baseline,
+    migrate_notifications_outbox,
+    migrate_booking_detail_columns,
+    migrate_booking_day_time,
+    migrate_doctor_schedules,
+    migrate_table_versions,
+    migrate_entity_versions,
+    migrate_unique_user_identifiers,
+]
+
+def schema_version(db):
+    return db.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(db):
+    """
+    Brings the schema up to date and returns the number of steps applied.
+    A current database costs one PRAGMA read. Otherwise every pending step,
+    the indexes and the new user_version commit as one transaction, so a
+    failing step leaves the database exactly as it was.
+    """
+    if schema_version(db) >= len(MIGRATIONS):
+        return 0
+    if db.in_transaction:
+        db.commit()
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        # Another process may have migrated while we waited for the lock
+        version = schema_version(db)
+        for step in MIGRATIONS[version:]:
+            step(db)
+        create_indexes(db, commit=False)
+        db.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(MIGRATIONS) - version
+
+def init_db():
+    return migrate(get_db())
+
+# Secondary indexes for the hot lookups in routes/*. Each one is named after the
+# query it serves; test_query_plans.py fails if a hot query stops using them.
+INDEXES = [
+    # create_booking / verify_booking_by_card: active booking of a user (covering for the existence check)
+    "CREATE INDEX IF NOT EXISTS idx_bookings_user_status ON bookings(id_users, booking_Status)",
+    # list_bookings: a user's bookings newest first, day ranges and per-doctor listings;
+    # day windows (today's list, reminders) on the normalized day/time pair
+    "CREATE INDEX IF NOT EXISTS idx_bookings_user_id ON bookings(id_users, id)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_day ON bookings(slot_date, start_time)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_slot ON bookings(slot_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bookings_doctor_name ON bookings(doctor_name, id)",
+    # notifications: bookings by status
+    "CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings(booking_Status)",
+    # notifications outbox: per-user reads after a cursor, global reads and pruning by age
+    "CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications(user_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_notifications_created_at ON notifications(created_at)",
+    # create_booking by doctor/date/time and list_doctor_slots; also stops duplicate slots
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_slots_doctor_date_time ON appointment_slots(doctor_id, slot_date, start_time)",
+    # login, register and verify by card use ux_users_tel/email/card_id from migrate_unique_user_identifiers
+    # notifications: users who logged in recently
+    "CREATE INDEX IF NOT EXISTS idx_users_last_login ON users(last_login)",
+    # schedules.expand: a doctor's rules
+    "CREATE INDEX IF NOT EXISTS idx_doctor_schedules_doctor ON doctor_schedules(doctor_id)",
+    # list_doctors filters and the doctor lookup by display name in create_booking
+    "CREATE INDEX IF NOT EXISTS idx_doctors_department ON doctors(department)",
+    "CREATE INDEX IF NOT EXISTS idx_doctors_specialist ON doctors(specialist)",
+    "CREATE INDEX IF NOT EXISTS idx_doctors_full_name ON doctors(firstname || ' ' || lastname)",
+]
+
+def dedupe_slots(db):
+    """
+    Merges appointment_slots rows that share (doctor_id, slot_date, start_time)
+    into the oldest row so the unique index can be built. Bookings are moved to
+    the surviving slot and its counters absorb the removed duplicates.
+    """
+    groups = db.execute("""
+        SELECT doctor_id, slot_date, start_time, MIN(slot_id) AS keep_id,
+               SUM(COALESCE(current_booking, 0)) AS booked, MAX(max_capacity) AS capacity
+        FROM appointment_slots
+        WHERE doctor_id IS NOT NULL AND slot_date IS NOT NULL AND start_time IS NOT NULL
+        GROUP BY doctor_id, slot_date, start_time
+        HAVING COUNT(*) > 1
+    """).fetchall()
+    for grp in groups:
+        dup_ids = [r['slot_id'] for r in db.execute(
+            "SELECT slot_id FROM appointment_slots WHERE doctor_id = ? AND slot_date = ? AND start_time = ? AND slot_id != ?",
+            (grp['doctor_id'], grp['slot_date'], grp['start_time'], grp['keep_id'])
+        ).fetchall()]
+        marks = ','.join('?' * len(dup_ids))
+        db.execute(f"UPDATE bookings SET slot_id = ? WHERE slot_id IN ({marks})", [grp['keep_id'], *dup_ids])
+        db.execute(f"DELETE FROM appointment_slots WHERE slot_id IN ({marks})", dup_ids)
+        db.execute(
+            "UPDATE appointment_slots SET current_booking = ?, max_capacity = ? WHERE slot_id = ?",
+            (grp['booked'], grp['capacity'], grp['keep_id'])
+        )
+    return len(groups)
+
+def create_indexes(db, commit=True):
+    has_unique = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_slots_doctor_date_time'"
+    ).fetchone()
+    if not has_unique:
+        dedupe_slots(db)
+    for stmt in INDEXES:
+        db.execute(stmt)
+    if commit:
         db.commit()
+
 startup = init_db
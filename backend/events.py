@@ -0,0 +1,117 @@
+"""
+In-process fan-out hub for Server-Sent Events.
+
+The booking routes publish after they commit; every open /api/stream
+connection holds a Subscription and receives the events that match it.
+Recent events are kept in a ring buffer so a client that reconnects with
+Last-Event-ID gets what it missed. The hub lives in one process: with several
+worker processes each one only sees the writes it served itself.
+"""
+import json
+import queue
+import threading
+from collections import deque
+
+HISTORY_SIZE = 1000
+QUEUE_SIZE = 256
+
+
+class Event:
+    __slots__ = ('id', 'event', 'user_id', 'data')
+
+    def __init__(self, id, event, user_id, data):
+        self.id = id
+        self.event = event
+        self.user_id = user_id
+        self.data = data
+
+    def encode(self):
+        return f"id: {self.id}\nevent: {self.event}\ndata: {json.dumps(self.data, ensure_ascii=False)}\n\n"
+
+
+class Subscription:
+    __slots__ = ('user_id', 'queue')
+
+    def __init__(self, user_id=None, maxsize=QUEUE_SIZE):
+        self.user_id = user_id # None means admin: every event
+        self.queue = queue.Queue(maxsize)
+
+    def wants(self, event):
+        return self.user_id is None or event.user_id == self.user_id
+
+    def get(self, timeout=None):
+        """Next Event, or None when nothing arrived within timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventHub:
+    def __init__(self, history_size=HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+
+    def publish(self, event, data, user_id=None):
+        with self._lock:
+            self._last_id += 1
+            ev = Event(self._last_id, event, user_id, data)
+            self._history.append(ev)
+            targets = [s for s in self._subscribers if s.wants(ev)]
+        for sub in targets:
+            try:
+                sub.queue.put_nowait(ev)
+            except queue.Full:
+                # A stalled client must not slow the booking routes down; it
+                # gets a reset and refetches once it drains its queue.
+                self._overflow(sub)
+        return ev
+
+    def _overflow(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+            reset = self._reset(sub)
+        # Publishers that picked sub before it was dropped can still refill
+        # the freed slot; there are only so many of them, so this ends
+        while True:
+            try:
+                sub.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                sub.queue.put_nowait(reset)
+                return
+            except queue.Full:
+                continue
+
+    def subscribe(self, user_id=None, last_event_id=None):
+        sub = Subscription(user_id)
+        with self._lock:
+            if last_event_id is not None:
+                missed = [ev for ev in self._history if ev.id > last_event_id and sub.wants(ev)]
+                gap = self._history and last_event_id < self._history[0].id - 1
+                # An id we never issued comes from before a restart
+                if last_event_id > self._last_id or gap or len(missed) >= sub.queue.maxsize:
+                    sub.queue.put_nowait(self._reset(sub))
+                else:
+                    for ev in missed:
+                        sub.queue.put_nowait(ev)
+            self._subscribers.add(sub)
+        return sub
+
+    def _reset(self, sub):
+        # Carries the current id so the client resumes from "now" after refetching
+        return Event(self._last_id, 'reset', sub.user_id, {})
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+hub = EventHub()
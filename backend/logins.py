@@ -0,0 +1,116 @@
+"""
+Write-behind buffer for users.last_login.
+
+A successful login only records (user, time) in memory. A background thread
+writes the latest time per user, together with the login notification, in one
+transaction every LOGIN_FLUSH_INTERVAL seconds and once more at exit, so the
+login path itself never takes the write lock. Until a login is written, GET
+/api/notifications merges it in from here (this process only; other workers
+see it after the flush).
+"""
+import atexit
+import logging
+import os
+import threading
+from backend import database, outbox
+
+FLUSH_INTERVAL = float(os.environ.get('LOGIN_FLUSH_INTERVAL', 2))
+# Flush early once this many users are waiting
+MAX_PENDING = 1000
+
+UPDATE_SQL = "UPDATE users SET last_login = ? WHERE ID_user = ? AND (last_login IS NULL OR last_login < ?)"
+
+log = logging.getLogger(__name__)
+
+
+class LoginBuffer:
+    def __init__(self, interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        # (database path, user_id) -> (at, firstname, lastname); a newer login replaces an older one
+        self._pending = {}
+        # The same, for logins a flush is writing right now; they stay visible
+        # to pending_notifications until their transaction has committed
+        self._flushing = {}
+        self._lock = threading.Lock()
+        # One flush at a time (the background thread and atexit)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def record(self, user_id, at, firstname='', lastname=''):
+        with self._lock:
+            self._pending[(database.DB_PATH, user_id)] = (at, firstname, lastname)
+            full = len(self._pending) >= self.max_pending
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='login-flush', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+        if full:
+            self._wake.set()
+
+    def pending_notifications(self, user_id=None):
+        """Login notifications not written yet, for one user or everyone."""
+        path = database.DB_PATH
+        with self._lock:
+            sources = (self._flushing, self._pending)
+            if user_id is not None:
+                found = [(user_id, d[(path, user_id)]) for d in sources if (path, user_id) in d]
+            else:
+                found = [(uid, v) for d in sources for (p, uid), v in d.items() if p == path]
+        return [outbox.pending_login_dict(uid, firstname, lastname, at) for uid, (at, firstname, lastname) in found]
+
+    def flush(self):
+        """Writes everything pending, one transaction per database. Returns the number of users written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._flushing = dict(pending)
+            by_path = {}
+            for (path, user_id), (at, firstname, lastname) in pending.items():
+                by_path.setdefault(path, []).append((user_id, at, firstname, lastname))
+
+            written, error = 0, None
+            for path, logins in by_path.items():
+                if not os.path.exists(path):
+                    log.warning('dropping %d pending login(s) for missing database %s', len(logins), path)
+                    self._done(path, logins)
+                    continue
+                conn = database.connect(path)
+                try:
+                    database.run_immediate(conn, lambda db: self._write(db, logins))
+                    written += len(logins)
+                except Exception as e:
+                    # Keep them for the next round unless the user logged in again meanwhile
+                    with self._lock:
+                        for user_id, at, firstname, lastname in logins:
+                            self._pending.setdefault((path, user_id), (at, firstname, lastname))
+                    error = e
+                finally:
+                    self._done(path, logins)
+                    conn.close()
+            if error is not None:
+                raise error
+            return written
+
+    def _done(self, path, logins):
+        with self._lock:
+            for user_id, *_ in logins:
+                self._flushing.pop((path, user_id), None)
+
+    def _write(self, db, logins):
+        db.executemany(UPDATE_SQL, [(at.isoformat(), user_id, at.isoformat()) for user_id, at, _, _ in logins])
+        for user_id, at, firstname, lastname in logins:
+            outbox.record_login(db, user_id, firstname, lastname, at)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                log.exception('could not write pending logins; retrying in %ss', self.interval)
+
+
+buffer = LoginBuffer()
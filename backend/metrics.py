@@ -0,0 +1,165 @@
+"""
+Per-endpoint request and SQL metrics, served in the Prometheus text format at
+GET /api/admin/metrics.
+
+init_app wraps the WSGI app: for every request it records the latency, the
+status, the requests in flight and, from database.sql_stats, how many
+statements the request ran and how long they took, up to the moment the
+server closes the response body. Endpoints are labelled by
+their Flask endpoint name ('bookings.get_booking'), never the raw path, so the
+series stay bounded. A WSGI wrapper plus one url_value_preprocessor (which
+Flask calls without the ensure_sync and context-proxy overhead of
+before/after_request hooks) keeps the cost to a few microseconds per request. Counters live in this
+process; with several workers each one is scraped on its own. METRICS=0
+turns all of it off.
+"""
+import threading
+import time
+from bisect import bisect_left
+from functools import partial
+from werkzeug.wsgi import ClosingIterator
+from backend import database
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus +Inf, not cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {total}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {total}'
+
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class EndpointStats:
+    """Everything recorded for one (method, endpoint)."""
+    __slots__ = ('statuses', 'latency', 'sql_statements', 'sql_seconds')
+
+    def __init__(self):
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.sql_statements = Histogram(STATEMENT_BUCKETS)
+        self.sql_seconds = Histogram(LATENCY_BUCKETS)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # (method, endpoint) -> EndpointStats; in_flight is by method only,
+            # the endpoint is not known until the request has been routed
+            self.endpoints = {}
+            self.in_flight = {}
+
+    def started(self, method):
+        with self._lock:
+            self.in_flight[method] = self.in_flight.get(method, 0) + 1
+
+    def finished(self, key, status, seconds, statements, sql_seconds):
+        with self._lock:
+            self.in_flight[key[0]] -= 1
+            stats = self.endpoints.get(key)
+            if stats is None:
+                stats = self.endpoints[key] = EndpointStats()
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.latency.observe(seconds)
+            stats.sql_statements.observe(statements)
+            stats.sql_seconds.observe(sql_seconds)
+
+    def render(self):
+        out = []
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            out += ['# HELP http_requests_total Requests handled, by endpoint and status.',
+                    '# TYPE http_requests_total counter']
+            for (method, endpoint), stats in endpoints:
+                for status, n in sorted(stats.statuses.items()):
+                    out.append(f'http_requests_total{{method="{method}",endpoint="{label(endpoint)}",status="{status}"}} {n}')
+            out += ['# HELP http_requests_in_flight Requests being handled right now.',
+                    '# TYPE http_requests_in_flight gauge']
+            for method, n in sorted(self.in_flight.items()):
+                out.append(f'http_requests_in_flight{{method="{method}"}} {n}')
+            for name, attr, help_text in (
+                ('http_request_duration_seconds', 'latency', 'Time the app took to produce a response.'),
+                ('http_request_sql_statements', 'sql_statements', 'SQL statements run by one request.'),
+                ('http_request_sql_seconds', 'sql_seconds', 'Time one request spent in SQL execute calls.'),
+            ):
+                out += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (method, endpoint), stats in endpoints:
+                    out.extend(getattr(stats, attr).lines(name, f'method="{method}",endpoint="{label(endpoint)}"'))
+        return '\n'.join(out) + '\n'
+
+
+registry = Metrics()
+
+
+class RequestState(threading.local):
+    endpoint = 'unmatched'
+
+current = RequestState()
+
+
+def _routed(endpoint, values):
+    # None when routing failed (404, 405)
+    current.endpoint = endpoint or 'unmatched'
+
+
+class MetricsMiddleware:
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        method = environ.get('REQUEST_METHOD', 'GET')
+        stats = database.sql_stats
+        stats.statements, stats.seconds = 0, 0.0
+        current.endpoint = 'unmatched'
+        # Stays 500 when the app raises instead of responding
+        status = [500]
+
+        def capture(status_line, headers, exc_info=None):
+            status[0] = int(status_line[:3])
+            return start_response(status_line, headers, exc_info)
+
+        registry.started(method)
+        started = time.perf_counter()
+
+        def finish(endpoint=None):
+            # Runs when the server closes the body, so a streamed response
+            # (the event stream, ?stream=1 listings) is timed and counted to
+            # its end and stays in flight until then
+            registry.finished((method, endpoint or current.endpoint), status[0], time.perf_counter() - started,
+                              stats.statements, stats.seconds)
+
+        try:
+            body = self.wsgi_app(environ, capture)
+        except BaseException:
+            finish()
+            raise
+        return ClosingIterator(body, partial(finish, current.endpoint))
+
+
+def init_app(app):
+    if database.METRICS_ENABLED:
+        app.url_value_preprocessor(_routed)
+        app.wsgi_app = MetricsMiddleware(app.wsgi_app)
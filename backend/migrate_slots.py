@@ -1,139 +1,114 @@
-import sqlite3
+import argparse
 import datetime
-import re
-
+import itertools
 import os
+import sqlite3
+import sys
+
+# Run as a script from anywhere
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backend import schedules
+from backend.database import migrate as migrate_schema
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, 'bookings.db')
 
-# Map Thai/English days to Python weekday integers (Monday is 0)
-DAY_MAP = {
-    'Mon': 0, 'Tue': 1, 'Wed': 2, 'Thu': 3, 'Fri': 4, 'Sat': 5, 'Sun': 6,
-    'จ': 0, 'อ': 1, 'พ': 2, 'พฤ': 3, 'ศ': 4, 'ส': 5, 'อา': 6,
-    'จันทร์': 0, 'อังคาร': 1, 'พุธ': 2, 'พฤหัส': 3, 'ศุกร์': 4, 'เสาร์': 5, 'อาทิตย์': 6
-}
-
-# Standard 30-min slots
-STANDARD_SLOTS = [
-    ("09:00", "09:30"), ("09:30", "10:00"),
-    ("10:00", "10:30"), ("10:30", "11:00"),
-    ("13:00", "13:30"), ("13:30", "14:00"),
-    ("14:00", "14:30"), ("14:30", "15:00"),
-    ("15:00", "15:30"), ("15:30", "16:00"),
-    ("16:00", "16:30"), ("16:30", "17:00")
-]
-
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def parse_schedule(schedule_str):
+HORIZON_DAYS = 90
+BATCH_SIZE = 10000
+
+INSERT_SLOT_SQL = """
+    INSERT OR IGNORE INTO appointment_slots
+    (doctor_id, department_id, slot_date, start_time, end_time, max_capacity, current_booking, status)
+    VALUES (?, ?, ?, ?, ?, ?, 0, 'available')
+"""
+
+def resolve_department(cursor, doc):
+    # Try to find existing mapping
+    dept_mapping = cursor.execute("SELECT department_id FROM Doctor_to_Department WHERE doctor_id = ?", (doc['id_doctor'],)).fetchone()
+    if dept_mapping:
+        return dept_mapping['department_id']
+
+    # If not mapped, try to find department by name
+    dept_name = doc['department']
+    dept_row = cursor.execute("SELECT department_id FROM departments WHERE name = ?", (dept_name,)).fetchone()
+    if dept_row:
+        return dept_row['department_id']
+
+    # For migration safety, create the department and link it
+    if dept_name:
+        cursor.execute("INSERT INTO departments (name) VALUES (?)", (dept_name,))
+        dept_id = cursor.lastrowid
+        cursor.execute("INSERT INTO Doctor_to_Department (doctor_id, department_id) VALUES (?, ?)", (doc['id_doctor'], dept_id))
+        return dept_id
+    return None
+
+def slot_rows(conn, doctors, first_day, days):
     """
-    Parses a schedule string like "จ-ศ 09:00-17:00" or "Mon-Fri 09:00-16:00".
-    Returns a list of allowed weekdays [0, 1, 2, 3, 4] and start/end times.
-    For simplicity in this migration, we will generate ALL standard slots 
-    if the doctor works on that day, as the standard slots are within typical working hours.
+    Yields one appointment_slots row per scheduled slot that is not stored yet:
+    the doctor's doctor_schedules rules, minus schedule_exceptions, exactly as
+    the lazy expansion (schedules.expand) offers them.
+    """
+    last_day = first_day + datetime.timedelta(days=days - 1)
+    for doc_id, dept_id in doctors:
+        rules, off, stored = schedules.load_window(conn, [doc_id], first_day, last_day)
+        for day in schedules.day_range(first_day, last_day):
+            for start, slot in sorted(schedules.day_slots(doc_id, day, rules, off, stored).items()):
+                if slot['slot_id'] is None:
+                    yield (doc_id, dept_id, slot['slot_date'], start, slot['end_time'], slot['max_capacity'])
+
+def extend_horizon(conn, days=HORIZON_DAYS, today=None, batch_size=BATCH_SIZE):
+    """
+    Stores every doctor's scheduled slots from today up to `days` ahead. Slots
+    expand lazily without this; the job is only for reports or tools that
+    read appointment_slots directly. Relies on the unique (doctor_id,
+    slot_date, start_time) index, so slots that already exist (booked or not)
+    are left alone and re-running is cheap. Returns the number of new slots.
     """
-    if not schedule_str:
-        return []
-
-    # Simple regex to find days range
-    # Matches "Mon-Fri" or "จ-ศ"
-    # This is a basic parser. Complex schedules might need manual adjustment.
-    
-    allowed_days = []
-    
-    # Check for "Mon-Fri" or "จ-ศ" pattern
-    if 'จ-ศ' in schedule_str or 'Mon-Fri' in schedule_str:
-        allowed_days = [0, 1, 2, 3, 4]
-    elif 'จ-อา' in schedule_str: # Mon-Sun
-        allowed_days = [0, 1, 2, 3, 4, 5, 6]
-    elif 'ส-อา' in schedule_str: # Sat-Sun
-        allowed_days = [5, 6]
-    else:
-        # Fallback: Assume Mon-Fri if unknown, or try to detect specific days
-        # If specific days are listed like "Mon, Wed" (not implemented deep parsing for now)
-        allowed_days = [0, 1, 2, 3, 4] 
-
-    return allowed_days
-
-def migrate():
-    conn = get_db()
     cursor = conn.cursor()
+    today = today or datetime.date.today()
 
-    # Get all doctors
-    doctors = cursor.execute("SELECT * FROM doctors").fetchall()
-
-    today = datetime.date.today()
-    days_to_generate = 30
-    
-    print(f"Found {len(doctors)} doctors. Generating slots for next {days_to_generate} days...")
-
-    count = 0
-    for doc in doctors:
-        doc_id = doc['id_doctor']
-        # We need department_id. 
-        # Since doctors table might not have it or it's in Doctor_to_Department
-        # Let's check if we can get it.
-        # For now, we'll try to get it from Doctor_to_Department or doctor's 'department' field text mapping
-        
-        # Try to find existing mapping
-        dept_mapping = cursor.execute("SELECT department_id FROM Doctor_to_Department WHERE doctor_id = ?", (doc['id_doctor'],)).fetchone()
-        
-        dept_id = None
-        if dept_mapping:
-            dept_id = dept_mapping['department_id']
-        else:
-            # If not mapped, try to find department by name
-            dept_name = doc['department']
-            dept_row = cursor.execute("SELECT department_id FROM departments WHERE name = ?", (dept_name,)).fetchone()
-            if dept_row:
-                dept_id = dept_row['department_id']
-            else:
-                # Create department if not exists? Or skip?
-                # For migration safety, let's create it or use a default
-                if dept_name:
-                    cursor.execute("INSERT INTO departments (name) VALUES (?)", (dept_name,))
-                    dept_id = cursor.lastrowid
-                    # Link it
-                    cursor.execute("INSERT INTO Doctor_to_Department (doctor_id, department_id) VALUES (?, ?)", (doc['id_doctor'], dept_id))
-
+    doctors = []
+    for doc in cursor.execute("SELECT * FROM doctors").fetchall():
+        dept_id = resolve_department(cursor, doc)
         if not dept_id:
-            print(f"Skipping doctor {doc['name']} (No Department)")
+            print(f"Skipping doctor {doc['firstname']} {doc['lastname']} (No Department)")
             continue
-
-        schedule = doc['schedule']
-        allowed_days = parse_schedule(schedule)
-        
-        if not allowed_days:
-            # If no schedule, maybe assume default Mon-Fri?
-            allowed_days = [0, 1, 2, 3, 4]
-
-        # Generate slots
-        for day_offset in range(days_to_generate):
-            date = today + datetime.timedelta(days=day_offset)
-            if date.weekday() in allowed_days:
-                # Generate all standard slots for this day
-                for start, end in STANDARD_SLOTS:
-                    # Check if exists
-                    exists = cursor.execute("""
-                        SELECT 1 FROM appointment_slots 
-                        WHERE doctor_id = ? AND slot_date = ? AND start_time = ?
-                    """, (doc['id_doctor'], date.strftime('%Y-%m-%d'), start)).fetchone()
-
-                    if not exists:
-                        cursor.execute("""
-                            INSERT INTO appointment_slots 
-                            (doctor_id, department_id, slot_date, start_time, end_time, max_capacity, current_booking, status)
-                            VALUES (?, ?, ?, ?, ?, ?, 0, 'available')
-                        """, (doc['id_doctor'], dept_id, date.strftime('%Y-%m-%d'), start, end, 10)) # Default capacity 10
-                        count += 1
-    
+        doctors.append((doc['id_doctor'], dept_id))
+
+    created = 0
+    rows = slot_rows(conn, doctors, today, days)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        # rowcount, unlike total_changes, leaves out rows written by triggers
+        created += cursor.executemany(INSERT_SLOT_SQL, batch).rowcount
+        conn.commit()
+    return created
+
+def prune_past(conn, today=None):
+    """Deletes slots before today that were never booked. Returns the count."""
+    today = today or datetime.date.today()
+    cur = conn.execute("""
+        DELETE FROM appointment_slots
+        WHERE slot_date < ? AND COALESCE(current_booking, 0) = 0
+        AND NOT EXISTS (SELECT 1 FROM bookings b WHERE b.slot_id = appointment_slots.slot_id)
+    """, (today.strftime('%Y-%m-%d'),))
     conn.commit()
-    print(f"Migration completed. Generated {count} new slots.")
-    conn.close()
+    return cur.rowcount
 
 if __name__ == "__main__":
-    migrate()
+    parser = argparse.ArgumentParser(description='Store scheduled appointment slots up to N days ahead; run it daily to roll the horizon forward.')
+    parser.add_argument('--days', type=int, default=HORIZON_DAYS)
+    parser.add_argument('--prune', action='store_true', help='also delete past slots that were never booked')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+    migrate_schema(conn) # the unique slot index comes with the schema
+    print(f"Generated {extend_horizon(conn, args.days, batch_size=args.batch_size)} new slots for the next {args.days} days.")
+    if args.prune:
+        print(f"Pruned {prune_past(conn)} past slots without bookings.")
+    conn.close()
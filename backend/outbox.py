@@ -0,0 +1,103 @@
+"""
+Append-only notification outbox.
+
+Booking, reschedule, check-in and cancel events are written here by the
+routes, inside the same transaction as the change that caused them; login
+events arrive with the batched last_login write from logins.py. GET
+/api/notifications then only reads rows back by (user_id, id).
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+RETENTION_DAYS = 30
+PRUNE_BATCH_SIZE = 1000
+
+EVENT_SQL = """
+    INSERT INTO notifications (user_id, booking_id, event, type, title, message, date, time, patient_name, is_new, meta, created_at)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+"""
+
+def record(db, user_id, event, type_, title, message, date='', time='', patient_name='-', booking_id=None, meta='', is_new=True, created_at=None):
+    """Adds one notification. Does not commit: the caller's transaction owns it."""
+    cur = db.execute(EVENT_SQL, (
+        user_id, booking_id, event, type_, title, message, date, time, patient_name,
+        1 if is_new else 0, meta, (created_at or datetime.now()).isoformat()
+    ))
+    return cur.lastrowid
+
+def record_booking_event(db, event, booking_id, user_id, slot_date, start_time, dept_name, patient_name):
+    date_str, time_str = slot_date or '', start_time or ''
+    if event == 'booked':
+        return record(db, user_id, event, 'appointment', 'จองคิวสำเร็จ', f"คุณได้จองคิว {dept_name} เรียบร้อยแล้ว",
+                      date_str, time_str, patient_name, booking_id, 'จองเมื่อเร็วๆ นี้')
+    if event == 'rescheduled':
+        return record(db, user_id, event, 'system', 'เลื่อนวันจองสำเร็จ', f"การนัดหมาย {dept_name} เปลี่ยนเป็นวันที่ {date_str} เวลา {time_str}",
+                      date_str, time_str, patient_name, booking_id, 'แก้ไขล่าสุด')
+    if event == 'arrived':
+        return record(db, user_id, event, 'system', 'เช็คอินสำเร็จ', f"คุณได้เช็คอิน {dept_name} เรียบร้อยแล้ว",
+                      date_str, time_str, patient_name, booking_id, 'ใช้บริการแล้ว')
+    if event == 'cancelled':
+        return record(db, user_id, event, 'system', 'ยกเลิกสำเร็จ', f"คุณได้ยกเลิกนัดหมาย {dept_name} เรียบร้อยแล้ว",
+                      date_str, '', patient_name, booking_id, 'ยกเลิกแล้ว')
+    raise ValueError(f'unknown booking event: {event}')
+
+def login_fields(firstname, lastname, at):
+    return {
+        'event': 'login',
+        'type': 'system',
+        'title': 'เข้าสู่ระบบสำเร็จ',
+        'message': f"ยินดีต้อนรับคุณ {firstname} เข้าสู่ระบบ",
+        'date': at.strftime("%Y-%m-%d"),
+        'time': at.strftime("%H:%M"),
+        'patient_name': f"{firstname} {lastname}".strip(),
+        'meta': 'ระบบ',
+    }
+
+def record_login(db, user_id, firstname, lastname, at):
+    f = login_fields(firstname, lastname, at)
+    return record(db, user_id, f['event'], f['type'], f['title'], f['message'], f['date'], f['time'],
+                  f['patient_name'], meta=f['meta'], created_at=at)
+
+def pending_login_dict(user_id, firstname, lastname, at):
+    """A login that logins.py has not written yet, shaped like to_dict() of its future row (no id yet)."""
+    return {'id': None, 'user_id': user_id, 'booking_id': None, 'is_new': True, 'created_at': at.isoformat(),
+            **login_fields(firstname, lastname, at)}
+
+def to_dict(row):
+    d = dict(row)
+    d['is_new'] = bool(d['is_new'])
+    return d
+
+def prune(db, retention_days=RETENTION_DAYS, batch_size=PRUNE_BATCH_SIZE):
+    """
+    Deletes notifications older than retention_days, batch_size rows per
+    transaction so the write lock is never held for long. Returns the row count.
+    """
+    cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+    total = 0
+    while True:
+        cur = db.execute(
+            "DELETE FROM notifications WHERE id IN (SELECT id FROM notifications WHERE created_at < ? ORDER BY created_at LIMIT ?)",
+            (cutoff, batch_size)
+        )
+        db.commit()
+        total += cur.rowcount
+        if cur.rowcount < batch_size:
+            return total
+
+if __name__ == '__main__':
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from backend.database import DB_PATH
+
+    parser = argparse.ArgumentParser(description='Prune old rows from the notifications outbox.')
+    parser.add_argument('--days', type=int, default=RETENTION_DAYS)
+    parser.add_argument('--batch-size', type=int, default=PRUNE_BATCH_SIZE)
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    print(f"Pruned {prune(conn, args.days, args.batch_size)} notifications older than {args.days} days.")
+    conn.close()
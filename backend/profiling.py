@@ -0,0 +1,190 @@
+"""
+On-demand profiling of single requests.
+
+With PROFILE_TOKEN set, a request that carries the token in an X-Profile
+header (or a ?profile= query flag, for a browser) runs under cProfile. The
+response gets an X-Profile-Id header and three files are written to
+PROFILE_DIR (default backend/logs/profiles): <id>.prof, the pstats dump for
+`python -m pstats` or snakeviz; <id>.folded, collapsed stacks for
+flamegraph.pl or speedscope; and <id>.json with the request it came from.
+Only the newest PROFILE_KEEP (default 20) profiles are kept.
+GET /api/admin/profiles lists them and
+GET /api/admin/profiles/<id>.prof|.folded downloads one.
+
+Without PROFILE_TOKEN nothing is installed, so requests pay nothing; with it,
+an unflagged request costs one environ lookup. The profile covers producing
+the response, not streaming a generator body (the event stream) afterwards.
+"""
+import cProfile
+import hmac
+import itertools
+import json
+import logging
+import os
+import pstats
+import re
+import time
+from datetime import datetime
+from urllib.parse import parse_qs
+
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'profiles'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 20))
+KINDS = {'prof': 'application/octet-stream', 'folded': 'text/plain; charset=utf-8'}
+ID_PATTERN = re.compile(r'^\d{8}T\d{6}-\d{6}-\d+$')
+# Deeper call chains and paths under MIN_MICROS are cut off in the collapsed stacks
+MAX_DEPTH = 200
+MIN_MICROS = 10
+
+log = logging.getLogger(__name__)
+
+
+def requested(environ):
+    token = environ.get('HTTP_X_PROFILE')
+    if token is None:
+        query = environ.get('QUERY_STRING', '')
+        if 'profile=' not in query:
+            return False
+        token = parse_qs(query).get('profile', [''])[0]
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def frame_label(func):
+    filename, line, name = func
+    if filename == '~':
+        # Built-ins: ('~', 0, "<built-in method time.sleep>")
+        label = name
+    else:
+        label = f'{name} ({os.path.basename(filename)}:{line})'
+    # ';' separates frames and the last ' ' the count
+    return label.replace(';', ',')
+
+
+def collapse(stats):
+    """
+    pstats -> {'a;b;c': microseconds} for flame graphs. cProfile keeps only
+    caller -> callee edges, so a function's self time is split over the paths
+    leading to it in proportion to the time each edge spent in it.
+    """
+    callees = {}
+    for func, entry in stats.items():
+        for caller, edge in entry[4].items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    stacks = {}
+
+    def walk(func, path, share, visiting):
+        path = path + (frame_label(func),)
+        own = round(stats[func][2] * share * 1e6)
+        if own > 0:
+            key = ';'.join(path)
+            stacks[key] = stacks.get(key, 0) + own
+        if len(path) >= MAX_DEPTH:
+            return
+        for callee, edge_ct in callees.get(func, ()):
+            callee_ct = stats[callee][3]
+            # Recursion is folded into the outermost call
+            if callee_ct > 0 and callee not in visiting and share * edge_ct * 1e6 >= MIN_MICROS:
+                walk(callee, path, share * edge_ct / callee_ct, visiting | {callee})
+
+    for func, entry in stats.items():
+        if not entry[4]:
+            walk(func, (), 1.0, {func})
+    return stacks
+
+
+def prune():
+    ids = sorted(profile_ids(), reverse=True)
+    for profile_id in ids[PROFILE_KEEP:]:
+        for ext in ('json',) + tuple(KINDS):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, f'{profile_id}.{ext}'))
+            except FileNotFoundError:
+                pass
+
+
+def profile_ids():
+    try:
+        names = os.listdir(PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    return [name[:-5] for name in names if name.endswith('.json') and ID_PATTERN.match(name[:-5])]
+
+
+def save(profiler, profile_id, meta):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, profile_id)
+    profiler.dump_stats(base + '.prof')
+    stacks = collapse(pstats.Stats(profiler).stats)
+    with open(base + '.folded', 'w', encoding='utf-8') as f:
+        for stack, micros in sorted(stacks.items()):
+            f.write(f'{stack} {micros}\n')
+    # Written last: the listing only shows profiles whose files are complete
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    prune()
+
+
+def list_profiles():
+    profiles = []
+    for profile_id in sorted(profile_ids(), reverse=True):
+        try:
+            with open(os.path.join(PROFILE_DIR, profile_id + '.json'), encoding='utf-8') as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(profile_id, kind):
+    if kind not in KINDS or not ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f'{profile_id}.{kind}')
+    return path if os.path.exists(path) else None
+
+
+class ProfilingMiddleware:
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self._seq = itertools.count(1)
+
+    def __call__(self, environ, start_response):
+        if not requested(environ):
+            return self.wsgi_app(environ, start_response)
+
+        now = datetime.now()
+        profile_id = f"{now.strftime('%Y%m%dT%H%M%S-%f')}-{next(self._seq)}"
+        status = [500]
+
+        def capture(status_line, headers, exc_info=None):
+            status[0] = int(status_line[:3])
+            return start_response(status_line, headers + [('X-Profile-Id', profile_id)], exc_info)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active (Python 3.12+ allows one per process)
+            return self.wsgi_app(environ, start_response)
+        started = time.perf_counter()
+        try:
+            return self.wsgi_app(environ, capture)
+        finally:
+            profiler.disable()
+            meta = {
+                'id': profile_id,
+                'at': now.isoformat(timespec='milliseconds'),
+                'method': environ.get('REQUEST_METHOD'),
+                'path': environ.get('PATH_INFO'),
+                'status': status[0],
+                'ms': round((time.perf_counter() - started) * 1000, 2),
+                'files': {kind: f'/api/admin/profiles/{profile_id}.{kind}' for kind in KINDS},
+            }
+            try:
+                save(profiler, profile_id, meta)
+            except OSError:
+                log.exception('could not save profile %s', profile_id)
+
+
+def init_app(app):
+    if PROFILE_TOKEN:
+        app.wsgi_app = ProfilingMiddleware(app.wsgi_app)
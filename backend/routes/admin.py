@@ -1,6 +1,9 @@
-from flask import Blueprint, request, jsonify
-from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, send_file
+from datetime import date, datetime
+from backend import database, metrics, profiling, schedules, slowlog
 from backend.database import get_db
+from backend.cache import catalog
+from backend.routes.auth import password_matches
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -82,8 +85,9 @@ def admin_login():
     if not username or not password:
         return jsonify({'error': 'missing credentials'}), 400
     db = get_db()
-    row = db.execute('SELECT * FROM staff WHERE username = ? AND hash_password = ?', (username, password)).fetchone()
-    if not row:
+    # Unique username lookup; the password is compared here, not in the index
+    row = db.execute('SELECT * FROM staff WHERE username = ?', (username,)).fetchone()
+    if not row or not password_matches(row['hash_password'], password):
         return jsonify({'error': 'invalid credentials'}), 401
     
     user = dict(row)
@@ -126,6 +130,7 @@ def create_doctor():
             data.get('status_color', 'text-green-600')
         )
     )
+    schedules.replace_rules_from_text(db, cur.lastrowid, data.get('schedule'))
     db.commit()
     row = db.execute('SELECT * FROM doctors WHERE id_doctor = ?', (cur.lastrowid,)).fetchone()
     return jsonify(dict(row)), 201
@@ -157,6 +162,8 @@ def update_doctor(doctor_id):
     values.append(doctor_id)
 
     cur = db.execute(f"UPDATE doctors SET {set_clause} WHERE id_doctor = ?", values)
+    if cur.rowcount and 'schedule' in fields:
+        schedules.replace_rules_from_text(db, doctor_id, fields['schedule'])
     db.commit()
     if cur.rowcount == 0:
         return jsonify({'error': 'not found'}), 404
@@ -167,7 +174,74 @@ def update_doctor(doctor_id):
 def delete_doctor(doctor_id):
     db = get_db()
     cur = db.execute('DELETE FROM doctors WHERE id_doctor = ?', (doctor_id,))
+    db.execute('DELETE FROM doctor_schedules WHERE doctor_id = ?', (doctor_id,))
+    db.execute('DELETE FROM schedule_exceptions WHERE doctor_id = ?', (doctor_id,))
     db.commit()
     if cur.rowcount == 0:
         return jsonify({'error': 'not found'}), 404
     return jsonify({'status': 'deleted'}), 200
+
+@admin_bp.route('/doctors/<int:doctor_id>/schedule', methods=['PUT'])
+def update_doctor_schedule(doctor_id):
+    # {"rules": [{"days": [0..6] | "weekdays": mask, "start_time", "end_time", "slot_minutes", "capacity",
+    #             "valid_from", "valid_to"}], "exceptions": [{"date", "reason"}]}
+    data = request.get_json() or {}
+    db = get_db()
+    if not db.execute('SELECT 1 FROM doctors WHERE id_doctor = ?', (doctor_id,)).fetchone():
+        return jsonify({'error': 'not found'}), 404
+
+    rules = []
+    try:
+        for r in data.get('rules', []):
+            weekdays = r['weekdays'] if 'weekdays' in r else sum(1 << int(d) for d in r['days'])
+            start, end = schedules.clock(r['start_time']), schedules.clock(r['end_time'])
+            rule = {'weekdays': int(weekdays) & schedules.ALL_DAYS, 'start_time': start, 'end_time': end,
+                    'slot_minutes': int(r.get('slot_minutes') or schedules.DEFAULT_SLOT_MINUTES),
+                    'capacity': int(r.get('capacity') or schedules.DEFAULT_CAPACITY),
+                    'valid_from': r.get('valid_from'), 'valid_to': r.get('valid_to')}
+            # Validates the hours and the slot length
+            if not rule['weekdays'] or rule['slot_minutes'] <= 0 or not list(schedules.rule_times(rule)):
+                raise ValueError
+            rules.append(rule)
+        exceptions = [(doctor_id, date.fromisoformat(e['date']).isoformat(), e.get('reason')) for e in data.get('exceptions', [])]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'invalid schedule'}), 400
+
+    if 'rules' in data:
+        schedules.replace_rules(db, doctor_id, rules)
+    if 'exceptions' in data:
+        db.execute('DELETE FROM schedule_exceptions WHERE doctor_id = ?', (doctor_id,))
+        db.executemany('INSERT OR REPLACE INTO schedule_exceptions (doctor_id, exception_date, reason) VALUES (?,?,?)', exceptions)
+    db.commit()
+    rows = db.execute('SELECT * FROM doctor_schedules WHERE doctor_id = ? ORDER BY id', (doctor_id,)).fetchall()
+    return jsonify({'rules': [schedules.rule_to_dict(r) for r in rows], 'exceptions': len(exceptions)}), 200
+
+@admin_bp.route('/db/pool', methods=['GET'])
+def db_pool_stats():
+    return jsonify({'enabled': database.POOL_ENABLED, 'pools': database.pool_stats()})
+
+@admin_bp.route('/cache', methods=['GET'])
+def cache_stats():
+    return jsonify({'catalog': catalog.stats()})
+
+@admin_bp.route('/metrics', methods=['GET'])
+def metrics_text():
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+def slow_queries():
+    limit = max(1, min(request.args.get('limit', 20, type=int), slowlog.MAX_STATEMENTS))
+    threshold = slowlog.THRESHOLD * 1000 if slowlog.THRESHOLD != float('inf') else None
+    return jsonify({'threshold_ms': threshold, 'statements': slowlog.slow_log.top(limit)})
+
+@admin_bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    return jsonify({'enabled': bool(profiling.PROFILE_TOKEN), 'keep': profiling.PROFILE_KEEP,
+                    'profiles': profiling.list_profiles()})
+
+@admin_bp.route('/profiles/<profile_id>.<any(prof, folded):kind>', methods=['GET'])
+def download_profile(profile_id, kind):
+    path = profiling.profile_path(profile_id, kind)
+    if path is None:
+        return jsonify({'error': 'not found'}), 404
+    return send_file(path, mimetype=profiling.KINDS[kind], as_attachment=True, download_name=f'{profile_id}.{kind}')
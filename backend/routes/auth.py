@@ -1,36 +1,64 @@
 from flask import Blueprint, request, jsonify, g
 from datetime import datetime
-from backend.database import get_db
+import hmac
+import sqlite3
+from backend.database import get_db, normalize_identifier
+from backend import logins
 
 auth_bp = Blueprint('auth', __name__)
 
+# "UNIQUE constraint failed: users.<column>" -> message
+DUPLICATE_ERRORS = {
+    'email': 'Email already exists',
+    'tel': 'Phone already exists',
+    'card_id': 'ID card already exists',
+}
+
+USER_BY = {
+    'card_id': "SELECT * FROM users WHERE card_id = ?",
+    'tel': "SELECT * FROM users WHERE tel = ?",
+}
+
+def identifier_columns(identifier):
+    """Column to look the login identifier up in first: 13 digits is a Thai ID card, anything else a phone."""
+    if len(identifier) == 13 and identifier.isdigit():
+        return ('card_id', 'tel')
+    return ('tel', 'card_id')
+
+def filled(data, *fields):
+    """True when every field is a string with something other than whitespace in it."""
+    return all(isinstance(data.get(f), str) and data[f].strip() for f in fields)
+
+def password_matches(stored, given):
+    return hmac.compare_digest(str(stored or '').encode(), str(given).encode())
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json() or {}
     db = get_db()
     
     # Validation
-    if not data.get('email') or not data.get('password') or not data.get('phone'):
+    if not filled(data, 'email', 'password', 'phone') or not isinstance(data.get('idCard') or '', str):
         return jsonify({'error': 'Missing required fields'}), 400
 
-    # Check duplicates
-    cur = db.execute("SELECT ID_user FROM users WHERE email = ? OR tel = ?", (data.get('email'), data.get('phone')))
-    if cur.fetchone():
-         return jsonify({'error': 'Email or Phone already exists'}), 400
-
-    cur = db.execute(
-        "INSERT INTO users (firstname, lastname, email, tel, card_id, birth_day, hash_password, created_at) VALUES (?,?,?,?,?,?,?,?)",
-        (
-            data.get('firstName'),
-            data.get('lastName'),
-            data.get('email'),
-            data.get('phone'),
-            data.get('idCard'),
-            data.get('dob'),
-            data.get('password'),
-            datetime.utcnow().isoformat()
+    # Duplicates are caught by the unique indexes on email/tel/card_id
+    try:
+        cur = db.execute(
+            "INSERT INTO users (firstname, lastname, email, tel, card_id, birth_day, hash_password, created_at) VALUES (?,?,?,?,?,?,?,?)",
+            (
+                data.get('firstName'),
+                data.get('lastName'),
+                data.get('email').strip(),
+                normalize_identifier(data.get('phone')),
+                normalize_identifier(data.get('idCard')) or None,
+                data.get('dob'),
+                data.get('password'),
+                datetime.utcnow().isoformat()
+            )
         )
-    )
+    except sqlite3.IntegrityError as e:
+        db.rollback()
+        return jsonify({'error': DUPLICATE_ERRORS.get(str(e).rsplit('.', 1)[-1], 'Email or Phone already exists')}), 400
     db.commit()
     return jsonify({'status': 'success', 'id': cur.lastrowid}), 201
 
@@ -40,22 +68,30 @@ def login():
     identifier = data.get('identifier')
     password = data.get('password')
     
-    if not identifier or not password:
+    if not filled(data, 'identifier', 'password'):
          return jsonify({'error': 'Missing identifier or password'}), 400
 
     db = get_db()
-    # Check tel OR card_id and duplicate password check for security (should use hashing in prod)
-    row = db.execute(
-        "SELECT * FROM users WHERE (tel = ? OR card_id = ?) AND hash_password = ?", 
-        (identifier, identifier, password)
-    ).fetchone()
+    typed, identifier = identifier.strip(), normalize_identifier(identifier)
+    # One unique-index probe per column; the second only for older accounts
+    # whose card_id is not 13 digits. Several rows can only come back where
+    # the migration found duplicates it could not make unique. The string as
+    # typed is tried last, for formatted values the migration had to keep
+    # because the bare digits belong to another account.
+    probes = [(col, identifier) for col in identifier_columns(identifier)]
+    if typed != identifier:
+        probes += [(col, typed) for col in identifier_columns(identifier)]
+    row = None
+    for col, value in probes:
+        candidates = db.execute(USER_BY[col], (value,)).fetchall()
+        row = next((r for r in candidates if password_matches(r['hash_password'], password)), None)
+        if row:
+            break
     
     if row:
         user = dict(row)
-        # Update last_login
-        now_iso = datetime.now().isoformat()
-        db.execute("UPDATE users SET last_login = ? WHERE ID_user = ?", (now_iso, user['ID_user']))
-        db.commit()
+        # last_login and the login notification are written behind, in batches
+        logins.buffer.record(user['ID_user'], datetime.now(), user.get('firstname') or '', user.get('lastname') or '')
         
         if 'hash_password' in user:
             del user['hash_password'] # don't send password back
@@ -1,12 +1,105 @@
-from flask import Blueprint, request, jsonify, g
-from datetime import datetime
+from flask import Blueprint, Response, current_app, request, jsonify, g
+from datetime import date, datetime
+from functools import partial
+import base64
 import json
 import random
+import sqlite3
 import string
-from backend.database import get_db
+from backend.database import BOOKING_DETAIL_COLUMNS, connect, get_db, run_immediate, is_lock_error
+from backend import outbox, schedules
+from backend.cache import make_etag, not_modified, with_etag
+from backend.events import hub
 
 bookings_bp = Blueprint('bookings', __name__)
 
+def publish_booking(event, booking_id, user_id, status, slot_id, slot_date, start_time):
+    # Called after commit, so subscribers never see a change that was rolled back
+    try:
+        user_id = int(user_id) if user_id is not None else None
+    except (TypeError, ValueError):
+        user_id = None
+    hub.publish(event, {
+        'booking_id': booking_id,
+        'user_id': user_id,
+        'status': status,
+        'slot_id': slot_id,
+        'date': slot_date or '',
+        'time': start_time or '',
+    }, user_id=user_id)
+
+def normalize_day_time(day, time):
+    # slot_date/start_time are always 'YYYY-MM-DD'/'HH:MM' (or NULL) so they sort and index;
+    # a time range like '10:30 - 11:00' keeps its start
+    try:
+        day = date.fromisoformat(str(day).strip()).isoformat()
+    except ValueError:
+        day = None
+    try:
+        time = datetime.strptime(str(time).strip()[:5].strip(), '%H:%M').strftime('%H:%M')
+    except ValueError:
+        time = None
+    return day, time
+
+def booking_to_dict(row, detail_keys=True):
+    """
+    API shape of a bookings row. The detail fields come from their own columns
+    (see database.BOOKING_DETAIL_COLUMNS), so nothing is parsed from JSON here.
+    detail_keys also adds the camelCase keys the single-booking endpoints
+    have always returned.
+    """
+    d = dict(row)
+    d['status'] = d.get('booking_Status')
+    if d.get('slot_date'):
+        d['date'] = d['slot_date']
+        d['time'] = d.get('start_time') or ''
+    if detail_keys:
+        for key, col in BOOKING_DETAIL_COLUMNS.items():
+            d[key] = d[col]
+    return d
+
+def detail_json(details):
+    # detail is still written for older readers; the columns are the source of truth
+    return json.dumps(details, ensure_ascii=False)
+
+class BookingRejected(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def claim_slot(db, slot_id):
+    # Single conditional statement: the seat is only taken while the slot still has room
+    row = db.execute(
+        "UPDATE appointment_slots SET current_booking = COALESCE(current_booking, 0) + 1 WHERE slot_id = ? AND COALESCE(current_booking, 0) < max_capacity RETURNING slot_id, slot_date, start_time",
+        (slot_id,)
+    ).fetchone()
+    if not row:
+        if not db.execute("SELECT 1 FROM appointment_slots WHERE slot_id = ?", (slot_id,)).fetchone():
+            raise BookingRejected('Slot not found', 404)
+        raise BookingRejected('Slot is full')
+    return row
+
+def claim_slot_at(db, doc_id, slot_date, start_time):
+    row = db.execute("""
+        UPDATE appointment_slots SET current_booking = COALESCE(current_booking, 0) + 1
+        WHERE slot_id = (
+            SELECT slot_id FROM appointment_slots
+            WHERE doctor_id = ? AND slot_date = ? AND start_time = ?
+            AND COALESCE(current_booking, 0) < max_capacity
+            ORDER BY slot_id LIMIT 1
+        )
+        RETURNING slot_id, slot_date, start_time
+    """, (doc_id, slot_date, start_time)).fetchone()
+    if row:
+        return row
+    if db.execute(
+        "SELECT 1 FROM appointment_slots WHERE doctor_id = ? AND slot_date = ? AND start_time = ?",
+        (doc_id, slot_date, start_time)
+    ).fetchone():
+        raise BookingRejected('Slot is full')
+    raise BookingRejected('No available slot found for this time')
+
 @bookings_bp.route('', methods=['POST'])
 def create_booking():
     data = request.get_json() or {}
@@ -15,104 +108,86 @@ def create_booking():
     doctor_name = data.get('doctorName')
     slot_id = data.get('slot_id')
     user_id = data.get('userId')
-    
-    if not user_id: 
-         pass
-         
-    db = get_db()
-    
-    # Check for existing active booking
-    if user_id:
-        existing = db.execute("SELECT * FROM bookings WHERE id_users = ? AND booking_Status IN ('booked', 'pending', 'rescheduled', 'รอรับบริการ')", (user_id,)).fetchone()
-        if existing:
-            return jsonify({'error': 'ท่านมีรายการจองที่ยังไม่เสร็จสิ้น กรุณายกเลิกรายการเดิมก่อนจองใหม่'}), 400
-    
-    # Slot Validation
-    final_slot_id = None
-    
-    if slot_id:
-        slot = db.execute("SELECT * FROM appointment_slots WHERE slot_id = ?", (slot_id,)).fetchone()
-        if not slot:
-             return jsonify({'error': 'Slot not found'}), 404
-        
-        if slot['current_booking'] >= slot['max_capacity']:
-             return jsonify({'error': 'Slot is full'}), 400
-             
-        final_slot_id = slot_id
-        db.execute("UPDATE appointment_slots SET current_booking = current_booking + 1 WHERE slot_id = ?", (slot_id,))
-    
-    elif booking_date and booking_time and doctor_name:
-        doc = db.execute("SELECT id_doctor FROM doctors WHERE firstname || ' ' || lastname = ?", (doctor_name,)).fetchone()
-        if doc:
-            doc_id = doc['id_doctor']
-            slot = db.execute("""
-                SELECT * FROM appointment_slots 
-                WHERE doctor_id = ? AND slot_date = ? AND start_time = ?
-            """, (doc_id, booking_date, booking_time)).fetchone()
-            
-            if slot:
-                if slot['current_booking'] >= slot['max_capacity']:
-                     return jsonify({'error': 'Slot is full'}), 400
-                final_slot_id = slot['slot_id']
-                db.execute("UPDATE appointment_slots SET current_booking = current_booking + 1 WHERE slot_id = ?", (final_slot_id,))
-            else:
-                return jsonify({'error': 'No available slot found for this time'}), 400
-        else:
-             return jsonify({'error': 'Doctor not found'}), 400
-    else:
-        return jsonify({'error': 'Missing booking information'}), 400
-
 
-    # Cancel previous pending bookings
-    if user_id:
-        db.execute(
-            "UPDATE bookings SET booking_Status = 'ยกเลิก' WHERE id_users = ? AND booking_Status IN ('รอรับบริการ', 'booked')",
-            (user_id,)
-        )
-
-    # Create Booking
-    # Modify: Use user's card_id as qr_code if available
-    qr_code = ''.join(random.choices(string.digits, k=10)) # fallback
-    
-    if user_id:
-        user_row = db.execute("SELECT card_id FROM users WHERE ID_user = ?", (user_id,)).fetchone()
-        if user_row and user_row['card_id']:
-            qr_code = user_row['card_id']
+    if not slot_id and not (booking_date and booking_time and doctor_name):
+        return jsonify({'error': 'Missing booking information'}), 400
 
-    booking_at = f"{booking_date} {booking_time}"
-    
     detail_obj = {
         'symptoms': data.get('symptoms'),
         'doctorName': data.get('doctorName'),
         'departmentName': data.get('departmentName'), 
         'patientName': data.get('patientName')
     }
-    
-    detail_json = json.dumps(detail_obj, ensure_ascii=False)
-    
-    cur = db.execute(
-        "INSERT INTO bookings (id_users, slot_id, booking_at, booking_Status, detail, qr_code, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?)",
-        (
-            user_id,
-            final_slot_id,
-            booking_at,
-            'รอรับบริการ',
-            detail_json,
-            qr_code,
-            datetime.now().isoformat(),
-            datetime.now().isoformat()
-        ),
-    )
-    db.commit()
-    booking_id = cur.lastrowid
-    
+
+    def reserve(db):
+        # Everything below runs under the write lock taken by BEGIN IMMEDIATE,
+        # so the active-booking check and the seat claim cannot interleave with
+        # another request for the same user or slot.
+        if user_id:
+            existing = db.execute("SELECT 1 FROM bookings WHERE id_users = ? AND booking_Status IN ('booked', 'pending', 'rescheduled', 'รอรับบริการ')", (user_id,)).fetchone()
+            if existing:
+                raise BookingRejected('ท่านมีรายการจองที่ยังไม่เสร็จสิ้น กรุณายกเลิกรายการเดิมก่อนจองใหม่')
+
+        if slot_id:
+            slot = claim_slot(db, slot_id)
+        else:
+            doc = db.execute("SELECT id_doctor FROM doctors WHERE firstname || ' ' || lastname = ?", (doctor_name,)).fetchone()
+            if not doc:
+                raise BookingRejected('Doctor not found')
+            # Slots exist as schedule rules until the first booking persists them
+            day, time = normalize_day_time(booking_date, booking_time)
+            schedules.materialize(db, doc['id_doctor'], day, time)
+            slot = claim_slot_at(db, doc['id_doctor'], day or booking_date, time or booking_time)
+        # The claimed slot decides the day and time, not what the client echoed back
+        slot_date, start_time = normalize_day_time(slot['slot_date'], slot['start_time'])
+        booking_at = f"{slot_date} {start_time}"
+
+        # Cancel previous pending bookings
+        if user_id:
+            db.execute(
+                "UPDATE bookings SET booking_Status = 'ยกเลิก' WHERE id_users = ? AND booking_Status IN ('รอรับบริการ', 'booked')",
+                (user_id,)
+            )
+
+        # Modify: Use user's card_id as qr_code if available
+        qr_code = ''.join(random.choices(string.digits, k=10)) # fallback
+        if user_id:
+            user_row = db.execute("SELECT card_id FROM users WHERE ID_user = ?", (user_id,)).fetchone()
+            if user_row and user_row['card_id']:
+                qr_code = user_row['card_id']
+
+        now_iso = datetime.now().isoformat()
+        cur = db.execute(
+            """INSERT INTO bookings (id_users, slot_id, booking_at, booking_Status, detail, qr_code, created_at, updated_at,
+                                   patient_name, doctor_name, department_name, symptoms, slot_date, start_time)
+               VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+            (user_id, slot['slot_id'], booking_at, 'รอรับบริการ', detail_json(detail_obj), qr_code, now_iso, now_iso,
+             detail_obj['patientName'], detail_obj['doctorName'], detail_obj['departmentName'], detail_obj['symptoms'],
+             slot_date, start_time),
+        )
+        outbox.record_booking_event(
+            db, 'booked', cur.lastrowid, user_id, slot_date, start_time,
+            data.get('departmentName') or '-', data.get('patientName') or '-'
+        )
+        return cur.lastrowid, qr_code, slot['slot_id'], slot_date, start_time
+
+    try:
+        booking_id, qr_code, final_slot_id, slot_date, start_time = run_immediate(get_db(), reserve)
+    except BookingRejected as e:
+        return jsonify({'error': e.message}), e.status
+    except sqlite3.OperationalError as e:
+        if is_lock_error(e):
+            return jsonify({'error': 'ระบบมีผู้ใช้งานจำนวนมาก กรุณาลองใหม่อีกครั้ง'}), 503
+        raise
+
+    publish_booking('booking.created', booking_id, user_id, 'รอรับบริการ', final_slot_id, slot_date, start_time)
     return jsonify({
         'id': booking_id,
         'status': 'booked',
         'booking_Status': 'รอรับบริการ',
         'qr_code': qr_code,
-        'date': booking_date,
-        'time': booking_time,
+        'date': slot_date,
+        'time': start_time,
         'doctor_name': doctor_name,
         'department_name': data.get('departmentName'),
         'symptoms': data.get('symptoms')
@@ -141,73 +216,46 @@ def verify_booking_by_card(card_id):
         return jsonify({'error': 'No active booking found for this ID card'}), 404
         
     # Reuse the same response format as get_booking
-    d = dict(row)
-    try:
-        details = json.loads(d['detail'])
-        if isinstance(details, dict):
-            d.update(details) 
-            d['patient_name'] = details.get('patientName')
-            d['doctor_name'] = details.get('doctorName')
-            d['department_name'] = details.get('departmentName')
-            d['department_value'] = details.get('departmentValue')
-            d['symptoms'] = details.get('symptoms')
-    except:
-        d['symptoms'] = d['detail']
-
-    if d.get('booking_at'):
-         try:
-             parts = d['booking_at'].split(' ')
-             d['date'] = parts[0]
-             d['time'] = parts[1] if len(parts) > 1 else ''
-         except: pass
-
-    d['status'] = d.get('booking_Status')
-    return jsonify(d)
+    return jsonify(booking_to_dict(row))
 
 @bookings_bp.route('/<int:booking_id>', methods=['GET'])
 def get_booking(booking_id):
     db = get_db()
-    row = db.execute('SELECT * FROM bookings WHERE id = ?', (booking_id,)).fetchone()
-    if not row:
+    version = db.execute('SELECT row_version FROM bookings WHERE id = ?', (booking_id,)).fetchone()
+    if not version:
         return jsonify({'error': 'not found'}), 404
-    d = dict(row)
-    try:
-        details = json.loads(d['detail'])
-        if isinstance(details, dict):
-            d.update(details) 
-            d['patient_name'] = details.get('patientName')
-            d['doctor_name'] = details.get('doctorName')
-            d['department_name'] = details.get('departmentName')
-            d['department_value'] = details.get('departmentValue')
-            d['symptoms'] = details.get('symptoms')
-    except:
-        d['symptoms'] = d['detail']
-
-    if d.get('booking_at'):
-         try:
-             parts = d['booking_at'].split(' ')
-             d['date'] = parts[0]
-             d['time'] = parts[1] if len(parts) > 1 else ''
-         except: pass
-
-    d['status'] = d.get('booking_Status')
-    return jsonify(d)
+    etag = make_etag('booking', booking_id, version[0])
+    cached = not_modified(etag, 'private, no-cache')
+    if cached:
+        return cached
+    row = db.execute('SELECT * FROM bookings WHERE id = ?', (booking_id,)).fetchone()
+    return with_etag(jsonify(booking_to_dict(row)), etag, 'private, no-cache')
 
 @bookings_bp.route('/<int:booking_id>', methods=['DELETE'])
 def delete_booking(booking_id):
     db = get_db()
     
-    booking = db.execute('SELECT slot_id, booking_Status FROM bookings WHERE id = ?', (booking_id,)).fetchone()
-    if booking:
-        slot_id = booking['slot_id']
-        status = booking['booking_Status']
-        if slot_id and status not in ['ยกเลิก', 'cancelled']:
-             db.execute("UPDATE appointment_slots SET current_booking = MAX(0, current_booking - 1) WHERE slot_id = ?", (slot_id,))
-             
-    cur = db.execute("UPDATE bookings SET booking_Status = 'cancelled', updated_at = ? WHERE id = ?", (datetime.now().isoformat(), booking_id))
-    db.commit()
-    if cur.rowcount == 0:
+    booking = db.execute('SELECT slot_id, booking_Status, id_users, slot_date, start_time, department_name, patient_name FROM bookings WHERE id = ?', (booking_id,)).fetchone()
+    if not booking:
         return jsonify({'error': 'not found'}), 404
+
+    # Only the request that actually cancels frees the seat and tells anyone;
+    # repeating the DELETE (or racing another one) changes nothing
+    cur = db.execute(
+        "UPDATE bookings SET booking_Status = 'cancelled', updated_at = ? WHERE id = ? AND COALESCE(booking_Status, '') NOT IN ('ยกเลิก', 'cancelled')",
+        (datetime.now().isoformat(), booking_id)
+    )
+    if cur.rowcount == 0:
+        db.rollback()
+        return jsonify({'status': 'cancelled'}), 200
+    if booking['slot_id']:
+        db.execute("UPDATE appointment_slots SET current_booking = MAX(0, current_booking - 1) WHERE slot_id = ?", (booking['slot_id'],))
+    outbox.record_booking_event(
+        db, 'cancelled', booking_id, booking['id_users'], booking['slot_date'], booking['start_time'],
+        booking['department_name'] or '-', booking['patient_name'] or '-'
+    )
+    db.commit()
+    publish_booking('booking.cancelled', booking_id, booking['id_users'], 'cancelled', booking['slot_id'], booking['slot_date'], booking['start_time'])
     return jsonify({'status': 'cancelled'}), 200
 
 @bookings_bp.route('/<int:booking_id>', methods=['PUT'])
@@ -227,29 +275,17 @@ def update_booking(booking_id):
         return jsonify({'error': 'not found'}), 404
     
     current_dict = dict(current)
-    try:
-        current_details = json.loads(current_dict['detail'])
-    except:
-        current_details = {}
-
-    updated_details = current_details.copy()
-    
-    for k in ('departmentName', 'doctorName', 'symptoms', 'departmentValue', 'patientName'):
+    updated_details = {key: current_dict[col] for key, col in BOOKING_DETAIL_COLUMNS.items()}
+    for k in BOOKING_DETAIL_COLUMNS:
         if k in data:
             updated_details[k] = data[k]
     
-    current_booking_at = current_dict.get('booking_at', '')
-    try:
-        parts = current_booking_at.split(' ')
-        c_date = parts[0]
-        c_time = parts[1] if len(parts) > 1 else ''
-    except:
-        c_date = ''
-        c_time = ''
-        
-    new_date = data.get('date', c_date)
-    new_time = data.get('time', c_time)
-    new_booking_at = f"{new_date} {new_time}"
+    c_date, c_time = current_dict['slot_date'], current_dict['start_time']
+    new_date, new_time = c_date, c_time
+    new_booking_at = current_dict['booking_at']
+    if 'date' in data or 'time' in data:
+        new_date, new_time = normalize_day_time(data.get('date', c_date), data.get('time', c_time))
+        new_booking_at = f"{data.get('date', c_date)} {data.get('time', c_time)}"
     
     new_status = data.get('status')
     if new_status == 'booked': new_status_val = 'รอรับบริการ'
@@ -268,66 +304,153 @@ def update_booking(booking_id):
     if slot_id and is_active_old and is_cancelled_new:
          db.execute("UPDATE appointment_slots SET current_booking = MAX(0, current_booking - 1) WHERE slot_id = ?", (slot_id,))
     
-    new_detail_json = json.dumps(updated_details, ensure_ascii=False)
-    
+    columns = ', '.join(f"{col} = ?" for col in BOOKING_DETAIL_COLUMNS.values())
     db.execute(
-        "UPDATE bookings SET detail = ?, booking_at = ?, booking_Status = ?, updated_at = ? WHERE id = ?",
-        (new_detail_json, new_booking_at, new_status_val, datetime.now().isoformat(), booking_id)
+        f"UPDATE bookings SET detail = ?, booking_at = ?, slot_date = ?, start_time = ?, booking_Status = ?, updated_at = ?, {columns} WHERE id = ?",
+        (detail_json(updated_details), new_booking_at, new_date, new_time, new_status_val, datetime.now().isoformat(),
+         *updated_details.values(), booking_id)
     )
+
+    # Outbox event, committed together with the update
+    event = None
+    if is_active_old and is_cancelled_new:
+        event = 'cancelled'
+    elif new_status_val == 'arrived' and old_status != 'arrived':
+        event = 'arrived'
+    elif (new_date, new_time) != (c_date, c_time) and not is_cancelled_new:
+        event = 'rescheduled'
+    if event:
+        outbox.record_booking_event(
+            db, event, booking_id, current_dict.get('id_users'), new_date, new_time,
+            updated_details.get('departmentName') or '-', updated_details.get('patientName') or '-'
+        )
     db.commit()
 
+    live_event = {'cancelled': 'booking.cancelled', 'arrived': 'booking.checked_in'}.get(event, 'booking.updated')
+    publish_booking(live_event, booking_id, current_dict.get('id_users'), new_status_val, slot_id, new_date, new_time)
+
     row = db.execute('SELECT * FROM bookings WHERE id = ?', (booking_id,)).fetchone()
-    d = dict(row)
+    return jsonify(booking_to_dict(row))
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(last_id):
+    raw = json.dumps({'id': last_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
     try:
-        details = json.loads(d['detail'])
-        if isinstance(details, dict):
-            d.update(details) 
-            d['patient_name'] = details.get('patientName')
-            d['doctor_name'] = details.get('doctorName')
-            d['department_name'] = details.get('departmentName')
-            d['department_value'] = details.get('departmentValue')
-            d['symptoms'] = details.get('symptoms')
-    except:
-        d['symptoms'] = d['detail']
-
-    if d.get('booking_at'):
-         try:
-             parts = d['booking_at'].split(' ')
-             d['date'] = parts[0]
-             d['time'] = parts[1] if len(parts) > 1 else ''
-         except: pass
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return int(json.loads(raw)['id'])
+    except (ValueError, TypeError, KeyError):
+        raise ValueError('invalid cursor')
 
-    d['status'] = d.get('booking_Status')
-    return jsonify(d)
+def parse_day(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def bookings_query(args):
+    """
+    Builds the SELECT for GET /api/bookings from the query string.
+    Every filter maps onto an index (see database.INDEXES) and paging is
+    keyset-based on id, so a page costs the same no matter how many
+    bookings are behind it. Raises ValueError on malformed input.
+    """
+    clauses = []
+    params = []
+
+    user_id = args.get('user_id')
+    if user_id:
+        clauses.append('id_users = ?')
+        params.append(int(user_id))
+
+    statuses = [st for v in args.getlist('status') for st in v.split(',') if st]
+    if statuses:
+        clauses.append(f"booking_Status IN ({','.join('?' * len(statuses))})")
+        params.extend(statuses)
+
+    # slot_date is always 'YYYY-MM-DD', so a day range is a plain string range
+    if args.get('date_from'):
+        clauses.append('slot_date >= ?')
+        params.append(parse_day(args['date_from']).isoformat())
+    if args.get('date_to'):
+        clauses.append('slot_date <= ?')
+        params.append(parse_day(args['date_to']).isoformat())
+
+    doctor_id = args.get('doctor_id')
+    if doctor_id:
+        clauses.append('slot_id IN (SELECT slot_id FROM appointment_slots WHERE doctor_id = ?)')
+        params.append(int(doctor_id))
+
+    if args.get('doctor_name'):
+        clauses.append('doctor_name = ?')
+        params.append(args['doctor_name'])
+
+    after = args.get('after')
+    if after:
+        clauses.append('id < ?')
+        params.append(decode_cursor(after))
+
+    where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+    query = f'SELECT * FROM bookings{where} ORDER BY id DESC'
+
+    limit = None
+    if after or args.get('limit'):
+        limit = min(max(int(args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        # One extra row tells us whether there is a next page
+        query += ' LIMIT ?'
+        params.append(limit + 1)
+
+    return query, params, limit
+
+STREAM_BATCH_SIZE = 500
+
+def stream_listing(conn, query, params, dumps):
+    # Emits the same JSON array as jsonify, one fetchmany() batch at a time,
+    # so memory stays flat and the first bytes leave before the last row is read.
+    # The generator outlives the request context (and close_db), so it owns its connection.
+    try:
+        cur = conn.execute(query, params)
+        yield '['
+        first = True
+        while True:
+            rows = cur.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            chunk = ','.join(dumps(booking_to_dict(r, detail_keys=False)) for r in rows)
+            yield chunk if first else ',' + chunk
+            first = False
+        yield ']'
+    finally:
+        conn.close()
 
 @bookings_bp.route('', methods=['GET'])
 def list_bookings():
+    try:
+        query, params, limit = bookings_query(request.args)
+    except ValueError:
+        return jsonify({'error': 'invalid filter or cursor'}), 400
+
+    if request.args.get('stream') in ('1', 'true'):
+        # No look-ahead row here: streamed exports are read to the end
+        if limit is not None:
+            params[-1] = limit
+        dumps = partial(current_app.json.dumps, separators=(',', ':'))
+        body = stream_listing(connect(), query, params, dumps)
+        return Response(body, mimetype='application/json')
+
     db = get_db()
-    rows = db.execute('SELECT * FROM bookings ORDER BY id DESC').fetchall()
-    results = []
-    for r in rows:
-        d = dict(r)
-        d['status'] = d.get('booking_Status')
-        d['symptoms'] = d.get('detail')
-        if d.get('booking_at'):
-             try:
-                 parts = d['booking_at'].split(' ')
-                 d['date'] = parts[0]
-                 d['time'] = parts[1] if len(parts) > 1 else ''
-             except: pass
-             
-        try:
-            details = json.loads(d['detail'])
-            if isinstance(details, dict):
-                 d['doctor_name'] = details.get('doctorName')
-                 d['department_name'] = details.get('departmentName')
-                 d['patient_name'] = details.get('patientName')
-                 d['symptoms'] = details.get('symptoms')
-        except:
-            pass
-            
-        results.append(d)
-    return jsonify(results)
+    rows = db.execute(query, params).fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['id'])
+
+    resp = jsonify([booking_to_dict(r, detail_keys=False) for r in rows])
+    if next_cursor:
+        resp.headers['X-Next-Cursor'] = next_cursor
+    return resp
 
 @bookings_bp.route('/slots/<int:slot_id>', methods=['DELETE'])
 def delete_slot(slot_id):
@@ -1,5 +1,9 @@
 from flask import Blueprint, request, jsonify
-from backend.database import get_db
+import sqlite3
+from datetime import date, datetime, timedelta
+from backend.database import get_db, run_immediate, is_lock_error
+from backend import schedules
+from backend.cache import catalog, make_etag, not_modified, table_version, with_etag
 
 doctors_bp = Blueprint('doctors', __name__)
 
@@ -8,45 +12,125 @@ def list_doctors():
     department = request.args.get('department')
     specialist = request.args.get('specialist')
     db = get_db()
-    
-    if department:
-        rows = db.execute('SELECT * FROM doctors WHERE department = ?', (department,)).fetchall()
-    elif specialist:
-        rows = db.execute('SELECT * FROM doctors WHERE specialist = ?', (specialist,)).fetchall()
-    else:
-        rows = db.execute('SELECT * FROM doctors').fetchall()
-    
-    results = []
-    for r in rows:
-        d = dict(r)
-        d['name'] = f"{d.get('firstname', '')} {d.get('lastname', '')}".strip()
-        d['specialty'] = d.get('specialist')
-        results.append(d)
-        
-    return jsonify(results)
+
+    def load():
+        if department:
+            rows = db.execute('SELECT * FROM doctors WHERE department = ?', (department,)).fetchall()
+        elif specialist:
+            rows = db.execute('SELECT * FROM doctors WHERE specialist = ?', (specialist,)).fetchall()
+        else:
+            rows = db.execute('SELECT * FROM doctors').fetchall()
+
+        results = []
+        for r in rows:
+            d = dict(r)
+            d['name'] = f"{d.get('firstname', '')} {d.get('lastname', '')}".strip()
+            d['specialty'] = d.get('specialist')
+            results.append(d)
+        return results
+
+    key = ('department', department) if department else ('specialist', specialist) if specialist else ('all',)
+    version = table_version(db, 'doctors')
+    etag = make_etag('doctors', key, version)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return with_etag(jsonify(catalog.get(db, 'doctors', key, load, version)), etag)
 
 @doctors_bp.route('/departments', methods=['GET'])
 def list_departments():
     db = get_db()
-    rows = db.execute('SELECT * FROM departments').fetchall()
-    return jsonify([dict(r) for r in rows])
+    version = table_version(db, 'departments')
+    etag = make_etag('departments', version)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return with_etag(jsonify(catalog.get(
+        db, 'departments', ('all',),
+        lambda: [dict(r) for r in db.execute('SELECT * FROM departments').fetchall()],
+        version
+    )), etag)
+
+SLOT_WINDOW_DAYS = 30
+MAX_SLOT_WINDOW_DAYS = 92
 
 @doctors_bp.route('/doctors/<int:doctor_id>/slots', methods=['GET'])
 def list_doctor_slots(doctor_id):
+    # Expanded from the doctor's schedule for ?date= or ?from=&to= (default: the next 30 days);
+    # slots nobody booked yet have slot_id null and are created when booked
+    try:
+        if request.args.get('date'):
+            first = last = date.fromisoformat(request.args['date'])
+        else:
+            first = date.fromisoformat(request.args['from']) if request.args.get('from') else date.today()
+            last = date.fromisoformat(request.args['to']) if request.args.get('to') else first + timedelta(days=SLOT_WINDOW_DAYS - 1)
+    except ValueError:
+        return jsonify({'error': 'invalid date'}), 400
+    if last < first or (last - first).days >= MAX_SLOT_WINDOW_DAYS:
+        return jsonify({'error': f'date window must be 1-{MAX_SLOT_WINDOW_DAYS} days'}), 400
+
     db = get_db()
-    date = request.args.get('date')
-    
-    query = 'SELECT * FROM appointment_slots WHERE doctor_id = ?'
-    files = [doctor_id]
-    
-    if date:
-        query += ' AND slot_date = ?'
-        files.append(date)
-    
-    query += ' ORDER BY slot_date, start_time'
-    
-    rows = db.execute(query, files).fetchall()
-    return jsonify([dict(r) for r in rows])
+    # Bumped by triggers on this doctor's slots, rules and exceptions
+    etag = make_etag('slots', doctor_id, first, last, table_version(db, f'slots:{doctor_id}'))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return with_etag(jsonify(schedules.expand(db, doctor_id, first, last)), etag)
+
+AVAILABILITY_LIMIT = 20
+MAX_AVAILABILITY_LIMIT = 200
+
+@doctors_bp.route('/availability', methods=['GET'])
+def availability():
+    # Earliest open slots across doctors: ?department=&doctor=&from=&to=&limit=
+    # Only slots after now that still have room; a window of at most 92 days is expanded
+    now = datetime.now()
+    try:
+        first = max(date.fromisoformat(request.args['from']), now.date()) if request.args.get('from') else now.date()
+        last = date.fromisoformat(request.args['to']) if request.args.get('to') else first + timedelta(days=SLOT_WINDOW_DAYS - 1)
+        limit = min(int(request.args.get('limit', AVAILABILITY_LIMIT)), MAX_AVAILABILITY_LIMIT)
+        doctor = int(request.args['doctor']) if request.args.get('doctor') else None
+    except ValueError:
+        return jsonify({'error': 'invalid parameters'}), 400
+    if first > last and last < now.date():
+        return jsonify([])  # window already over
+    if limit <= 0 or last < first or (last - first).days >= MAX_SLOT_WINDOW_DAYS:
+        return jsonify({'error': f'date window must be 1-{MAX_SLOT_WINDOW_DAYS} days and limit 1-{MAX_AVAILABILITY_LIMIT}'}), 400
+
+    db = get_db()
+    department = request.args.get('department')
+    if doctor is not None:
+        rows = db.execute('SELECT * FROM doctors WHERE id_doctor = ?', (doctor,)).fetchall()
+    elif department:
+        rows = db.execute('SELECT * FROM doctors WHERE department = ?', (department,)).fetchall()
+    else:
+        rows = db.execute('SELECT * FROM doctors').fetchall()
+    doctors = {r['id_doctor']: r for r in rows}
+
+    slots = schedules.earliest_open(db, list(doctors), first, last, now.strftime('%Y-%m-%d %H:%M'), limit)
+    results = []
+    for slot in slots:
+        doc = doctors[slot['doctor_id']]
+        results.append({
+            **slot,
+            'doctor_name': f"{doc['firstname'] or ''} {doc['lastname'] or ''}".strip(),
+            'department': doc['department'],
+            'specialist': doc['specialist'],
+        })
+    return jsonify(results)
+
+@doctors_bp.route('/doctors/<int:doctor_id>/schedule', methods=['GET'])
+def get_doctor_schedule(doctor_id):
+    db = get_db()
+    rules = db.execute('SELECT * FROM doctor_schedules WHERE doctor_id = ? ORDER BY id', (doctor_id,)).fetchall()
+    exceptions = db.execute(
+        'SELECT exception_date, reason FROM schedule_exceptions WHERE doctor_id = ? AND exception_date >= ? ORDER BY exception_date',
+        (doctor_id, date.today().isoformat())
+    ).fetchall()
+    return jsonify({
+        'rules': [schedules.rule_to_dict(r) for r in rules],
+        'exceptions': [dict(e) for e in exceptions]
+    })
 
 @doctors_bp.route('/doctors/<int:doctor_id>/slots', methods=['POST'])
 def create_doctor_slot(doctor_id):
@@ -57,36 +141,101 @@ def create_doctor_slot(doctor_id):
     if not doc:
         return jsonify({'error': 'Doctor not found'}), 404
     
-    dept_code = doc['department']
-    dept_map_reverse = {
-        'med': 'อายุรกรรม',
-        'dent': 'ทันตกรรม',
-        'ortho': 'ศัลยกรรมกระดูก',
-        'pedia': 'กุมารเวชกรรม'
-    }
-    thai_name = dept_map_reverse.get(dept_code)
-    dept_id = 0
-    if thai_name:
-         d_row = db.execute('SELECT department_id FROM departments WHERE name LIKE ?', (f"%{thai_name}%",)).fetchone()
-         if d_row: dept_id = d_row['department_id']
+    dept_id = schedules.department_id_for(db, doc['department'])
     
-    cur = db.execute(
-        """
-        INSERT INTO appointment_slots (
-            doctor_id, department_id, slot_date, start_time, end_time, max_capacity, current_booking, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        (
-            doctor_id,
-            dept_id,
-            data.get('date'),
-            data.get('start_time'),
-            data.get('end_time'),
-            data.get('capacity', 1),
-            0, # current_booking
-            'available' 
+    try:
+        cur = db.execute(
+            """
+            INSERT INTO appointment_slots (
+                doctor_id, department_id, slot_date, start_time, end_time, max_capacity, current_booking, status
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                doctor_id,
+                dept_id,
+                data.get('date'),
+                data.get('start_time'),
+                data.get('end_time'),
+                data.get('capacity', 1),
+                0, # current_booking
+                'available' 
+            )
         )
-    )
+    except sqlite3.IntegrityError:
+        # ux_slots_doctor_date_time: one slot per doctor, date and start time
+        db.rollback()
+        existing = db.execute(
+            'SELECT slot_id FROM appointment_slots WHERE doctor_id = ? AND slot_date = ? AND start_time = ?',
+            (doctor_id, data.get('date'), data.get('start_time'))
+        ).fetchone()
+        return jsonify({'error': 'มี slot ของแพทย์ในวันและเวลานี้อยู่แล้ว', 'slot_id': existing['slot_id'] if existing else None}), 409
     db.commit()
     
     return jsonify({'status': 'success', 'slot_id': cur.lastrowid}), 201
+
+@doctors_bp.route('/doctors/<int:doctor_id>/slots/bulk', methods=['POST'])
+def create_doctor_slots_bulk(doctor_id):
+    # {"date_from", "date_to", "days": [0..6] (default: every day), "capacity",
+    #  "times": [{"start_time", "end_time"}] | "template": {"start_time", "end_time", "slot_minutes"}}
+    # Slots that already exist are skipped and listed under "conflicts"
+    data = request.get_json() or {}
+    try:
+        first = date.fromisoformat(data.get('date_from') or data['date'])
+        last = date.fromisoformat(data['date_to']) if data.get('date_to') else first
+        days = sum(1 << int(d) for d in data['days']) if data.get('days') else schedules.ALL_DAYS
+        template = data.get('template')
+        if template:
+            rule = {'start_time': schedules.clock(template['start_time']), 'end_time': schedules.clock(template['end_time']),
+                    'slot_minutes': int(template.get('slot_minutes') or schedules.DEFAULT_SLOT_MINUTES)}
+            if rule['slot_minutes'] <= 0:
+                raise ValueError
+            times = list(schedules.rule_times(rule))
+        else:
+            times = [(schedules.clock(t['start_time']), schedules.clock(t['end_time'])) for t in data['times']]
+        capacity = int(data.get('capacity') or 1)
+        if not times or capacity <= 0 or any(start >= end for start, end in times):
+            raise ValueError
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'invalid slot template'}), 400
+    if last < first or (last - first).days >= MAX_SLOT_WINDOW_DAYS:
+        return jsonify({'error': f'date window must be 1-{MAX_SLOT_WINDOW_DAYS} days'}), 400
+
+    db = get_db()
+    doc = db.execute('SELECT department FROM doctors WHERE id_doctor = ?', (doctor_id,)).fetchone()
+    if not doc:
+        return jsonify({'error': 'Doctor not found'}), 404
+    dept_id = schedules.department_id_for(db, doc['department'])
+
+    wanted = {}
+    for day in schedules.day_range(first, last):
+        if days >> day.weekday() & 1:
+            for start, end in times:
+                wanted.setdefault((day.isoformat(), start), end)
+
+    def insert(db):
+        existing = {(r['slot_date'], r['start_time']) for r in db.execute(
+            'SELECT slot_date, start_time FROM appointment_slots WHERE doctor_id = ? AND slot_date BETWEEN ? AND ?',
+            (doctor_id, first.isoformat(), last.isoformat())
+        )}
+        cur = db.executemany(
+            """
+            INSERT OR IGNORE INTO appointment_slots
+            (doctor_id, department_id, slot_date, start_time, end_time, max_capacity, current_booking, status)
+            VALUES (?, ?, ?, ?, ?, ?, 0, 'available')
+            """,
+            [(doctor_id, dept_id, d, start, end, capacity) for (d, start), end in wanted.items() if (d, start) not in existing]
+        )
+        return cur.rowcount, sorted(k for k in wanted if k in existing)
+
+    try:
+        created, conflicts = run_immediate(db, insert)
+    except sqlite3.OperationalError as e:
+        if is_lock_error(e):
+            return jsonify({'error': 'ระบบมีผู้ใช้งานจำนวนมาก กรุณาลองใหม่อีกครั้ง'}), 503
+        raise
+
+    return jsonify({
+        'created': created,
+        'skipped': len(wanted) - created,
+        'conflicts': [{'date': d, 'start_time': start} for d, start in conflicts]
+    }), 201 if created else 200
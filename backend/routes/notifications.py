@@ -1,229 +1,91 @@
-from flask import Blueprint, jsonify
-from datetime import datetime
-import json
+from flask import Blueprint, request, jsonify
+from datetime import datetime, timedelta
 from backend.database import get_db
+from backend import logins, outbox
 
 notifications_bp = Blueprint('notifications', __name__)
 
-@notifications_bp.route('', methods=['GET'])
-def get_notifications():
-    db = get_db()
-    # Fetch all active bookings (include arrived to show success message)
-    bookings = db.execute("SELECT * FROM bookings WHERE booking_Status NOT IN ('cancelled', 'completed')").fetchall()
-    
-    notifications = []
-    now = datetime.now()
-    
-    today_str = now.strftime("%Y-%m-%d")
-    
-    # 0. Login Success Notification (New)
-    # This is tricky because we need to know WHICH user is asking, or return for all.
-    # Current design returns ALL and frontend filters.
-    # So we fetch users who logged in recently (e.g., last 24 hours to be safe, frontend filters by user_id)
-    recent_users = db.execute("SELECT ID_user, firstname, lastname, last_login FROM users WHERE last_login IS NOT NULL").fetchall()
-    
-    for u in recent_users:
-        u_dict = dict(u)
-        last_login_str = u_dict['last_login']
-        try:
-            last_login = datetime.fromisoformat(last_login_str)
-            # If logged in within last 24 hours, show notification
-            # (Frontend should ideally show only if it's 'recent' or not read, but for now we follow the pattern)
-            if (now - last_login).total_seconds() < 86400:
-                notifications.append({
-                    'type': 'system',
-                    'title': 'เข้าสู่ระบบสำเร็จ',
-                    'message': f"ยินดีต้อนรับคุณ {u_dict['firstname']} เข้าสู่ระบบ",
-                    'date': last_login.strftime("%Y-%m-%d"),
-                    'time': last_login.strftime("%H:%M"),
-                    'patient_name': f"{u_dict['firstname']} {u_dict['lastname']}".strip(),
-                    'user_id': u_dict['ID_user'],
-                    'is_new': True,
-                    'meta': 'ระบบ'
-                })
-        except:
-             pass
+# Events (booked, rescheduled, checked in, cancelled, logged in) are read from the
+# outbox that the write routes fill; only the time-based reminders are still
+# derived, from bookings due within the next two days.
+USER_EVENTS_SQL = "SELECT * FROM notifications WHERE user_id = ? AND id > ? AND created_at >= ? ORDER BY id"
+ALL_EVENTS_SQL = "SELECT * FROM notifications WHERE created_at >= ? AND id > ? ORDER BY id"
+# Day window on the indexed (slot_date, start_time) pair: from now to the end of the day after tomorrow
+USER_DUE_SQL = """
+    SELECT * FROM bookings
+    WHERE id_users = ? AND slot_date BETWEEN ? AND ? AND (slot_date > ? OR start_time >= ?)
+    AND booking_Status NOT IN ('cancelled', 'ยกเลิก', 'completed', 'arrived')
+"""
+ALL_DUE_SQL = """
+    SELECT * FROM bookings
+    WHERE slot_date BETWEEN ? AND ? AND (slot_date > ? OR start_time >= ?)
+    AND booking_Status NOT IN ('cancelled', 'ยกเลิก', 'completed', 'arrived')
+"""
 
-    for row in bookings:
-        b = dict(row)
-        dept_name = '-'
-        patient_name = '-'
-        try:
-            details = json.loads(b['detail'])
-            if isinstance(details, dict):
-                dept_name = details.get('departmentName', '-')
-                patient_name = details.get('patientName', '-')
-        except:
-            pass
+def reminder_notifications(b, now):
+    dept_name, patient_name = b['department_name'] or '-', b['patient_name'] or '-'
+    date_str, time_str = b['slot_date'], b['start_time'] or ''
+    try:
+        # A booking without a time counts from midnight
+        booking_dt = datetime.fromisoformat(f"{date_str} {time_str or '00:00'}")
+    except ValueError:
+        return []
 
-        # Date/Time Parsing Logic
-        booking_dt = now
-        date_str = 'Unknown'
-        time_str = ''
-        
-        try:
-            raw_dt = b.get('booking_at')
-            if raw_dt:
-                dt_str = str(raw_dt).strip()
-                # Try standard format YYYY-MM-DD HH:MM
-                try:
-                    booking_dt = datetime.strptime(dt_str, "%Y-%m-%d %H:%M")
-                    parts = dt_str.split(' ')
-                    date_str = parts[0]
-                    time_str = parts[1]
-                except ValueError:
-                    # Try YYYY-MM-DD only
-                    try:
-                        booking_dt = datetime.strptime(dt_str, "%Y-%m-%d")
-                        date_str = dt_str.split(' ')[0]
-                        time_str = '' # No time specified
-                    except ValueError:
-                         # Keep defaults if all parsing fails
-                         date_str = dt_str
-                         pass
-            else:
-                 # Try to recover from detail if booking_at is missing
-                 # (Optional: implement if detail has date/time)
-                 pass
-                 
-        except Exception:
-            # Final safety net
-            pass
-            
-        diff = booking_dt - now
-        days = diff.days
-        total_seconds = diff.total_seconds()
-        
-        created_at = None
-        if 'created_at' in b.keys() and b['created_at']:
-             try: created_at = datetime.fromisoformat(b['created_at'])
-             except: pass
-             
-        updated_at = None
-        if 'updated_at' in b.keys() and b['updated_at']:
-             try: updated_at = datetime.fromisoformat(b['updated_at'])
-             except: pass
-        
-        # 1. Booking Success
-        if created_at and (now - created_at).total_seconds() < 86400 and b['booking_Status'] not in ['cancelled', 'ยกเลิก']:
-             notifications.append({
-                 'type': 'appointment',
-                 'title': 'จองคิวสำเร็จ',
-                 'message': f"คุณได้จองคิว {dept_name} เรียบร้อยแล้ว",
-                 'date': date_str,
-                 'time': time_str,
-                 'patient_name': patient_name,
-                 'user_id': b['id_users'],
-                 'is_new': True,
-                 'meta': 'จองเมื่อเร็วๆ นี้'
-             })
+    diff = booking_dt - now
+    days = diff.days
+    total_seconds = diff.total_seconds()
+    if not 0 <= days <= 1:
+        return []
 
-        # 2. Reschedule Success
-        if updated_at and (now - updated_at).total_seconds() < 86400 and b['booking_Status'] not in ['cancelled', 'ยกเลิก', 'arrived']:
-             if not created_at or (updated_at - created_at).total_seconds() > 60:
-                 notifications.append({
-                     'type': 'system', 
-                     'title': 'เลื่อนวันจองสำเร็จ',
-                     'message': f"การนัดหมาย {dept_name} เปลี่ยนเป็นวันที่ {date_str} เวลา {time_str}",
-                     'date': date_str,
-                     'time': time_str,
-                     'patient_name': patient_name,
-                     'user_id': b['id_users'],
-                     'is_new': True,
-                     'meta': 'แก้ไขล่าสุด'
-                 })
+    time_display = f"เวลา {time_str}" if time_str else ""
+    # "It's Time" Notification (Active within 30 mins)
+    if abs(total_seconds) < 1800:
+        title, msg, is_new, meta = 'ถึงเวลานัดหมาย', f"ถึงเวลานัดหมาย {dept_name} {time_display} กรุณาติดต่อจุดคัดกรอง", True, 'ถึงเวลาแล้ว'
+    # Normal reminders
+    elif days == 0:
+        title, msg, is_new, meta = 'นัดหมายวันนี้', f"คุณมีนัดหมาย {dept_name} {time_display} (อีก {int(total_seconds/3600)} ชม.)", False, 'แจ้งเตือน'
+    else:
+        title, msg, is_new, meta = 'เตือนนัดหมายพรุ่งนี้', f"พรุ่งนี้คุณมีนัดหมาย {dept_name} {time_display}", False, 'แจ้งเตือน'
+    return [{
+        'type': 'reminder',
+        'title': title,
+        'message': msg,
+        'date': date_str,
+        'time': time_str,
+        'patient_name': patient_name,
+        'user_id': b['id_users'],
+        'booking_id': b['id'],
+        'is_new': is_new,
+        'meta': meta
+    }]
 
-        # 3. Check-in Success (Arrived)
-        if b['booking_Status'] == 'arrived' and updated_at and (now - updated_at).total_seconds() < 86400:
-             notifications.append({
-                 'type': 'system',
-                 'title': 'เช็คอินสำเร็จ',
-                 'message': f"คุณได้เช็คอิน {dept_name} เรียบร้อยแล้ว",
-                 'date': date_str,
-                 'time': time_str,
-                 'patient_name': patient_name,
-                 'user_id': b['id_users'],
-                 'is_new': True,
-                 'meta': 'ใช้บริการแล้ว'
-             })
-                 
-        # 4. Reminder Logic (Today/Tomorrow)
-        if 0 <= days <= 1 and b['booking_Status'] not in ['cancelled', 'ยกเลิก', 'arrived']:
-            # 4.1 "It's Time" Notification (Active within +/- 30 mins)
-            # If difference is between -30 mins and +30 mins
-            if abs(total_seconds) < 1800: # 30 mins window
-                time_display = f"เวลา {time_str}" if time_str else ""
-                notifications.append({
-                    'type': 'reminder',
-                    'title': 'ถึงเวลานัดหมาย',
-                    'message': f"ถึงเวลานัดหมาย {dept_name} {time_display} กรุณาติดต่อจุดคัดกรอง",
-                    'date': date_str,
-                    'time': time_str,
-                    'patient_name': patient_name,
-                    'user_id': b['id_users'],
-                    'is_new': True,
-                    'meta': 'ถึงเวลาแล้ว'
-                })
-            
-            # Normal reminders
-            elif days == 0:
-                title = 'นัดหมายวันนี้'
-                time_display = f"เวลา {time_str}" if time_str else ""
-                msg = f"คุณมีนัดหมาย {dept_name} {time_display} (อีก {int(total_seconds/3600)} ชม.)"
-                notifications.append({
-                    'type': 'reminder',
-                    'title': title,
-                    'message': msg,
-                    'date': date_str,
-                    'time': time_str,
-                    'patient_name': patient_name,
-                    'user_id': b['id_users'],
-                    'is_new': False,
-                    'meta': 'แจ้งเตือน'
-                })
-            else:
-                title = 'เตือนนัดหมายพรุ่งนี้'
-                time_display = f"เวลา {time_str}" if time_str else ""
-                msg = f"พรุ่งนี้คุณมีนัดหมาย {dept_name} {time_display}"
-                notifications.append({
-                    'type': 'reminder',
-                    'title': title,
-                    'message': msg,
-                    'date': date_str,
-                    'time': time_str,
-                    'patient_name': patient_name,
-                    'user_id': b['id_users'],
-                    'is_new': False,
-                    'meta': 'แจ้งเตือน'
-                })
-            
-    # Cancelled notifications
-    cancelled_bookings = db.execute("SELECT * FROM bookings WHERE booking_Status IN ('cancelled', 'ยกเลิก')").fetchall()
-    
-    for row in cancelled_bookings:
-         b = dict(row)
-         updated_at = None
-         if 'updated_at' in b.keys() and b['updated_at']:
-             try: updated_at = datetime.fromisoformat(b['updated_at'])
-             except: pass
-         
-         if updated_at and (now - updated_at).total_seconds() < 86400: # 24h
-            try: details = json.loads(b['detail'])
-            except: details = {}
-            dept_name = details.get('departmentName', '-')
-            patient_name = details.get('patientName', '-')
-            
-            notifications.append({
-                 'type': 'system',
-                 'title': 'ยกเลิกสำเร็จ',
-                 'message': f"คุณได้ยกเลิกนัดหมาย {dept_name} เรียบร้อยแล้ว",
-                 'date': b['booking_at'].split(' ')[0] if b['booking_at'] else '', 
-                 'time': '', 
-                 'patient_name': patient_name,
-                 'user_id': b['id_users'],
-                 'is_new': True,
-                 'meta': 'ยกเลิกแล้ว'
-            })
+@notifications_bp.route('', methods=['GET'])
+def get_notifications():
+    try:
+        user_id = int(request.args['user_id']) if request.args.get('user_id') else None
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        return jsonify({'error': 'invalid user_id or after'}), 400
+
+    db = get_db()
+    now = datetime.now()
+    since = (now - timedelta(days=1)).isoformat()
+    # Reminders cover appointments from now until the end of tomorrow (diff.days in 0..1)
+    today, now_time = now.strftime("%Y-%m-%d"), now.strftime("%H:%M")
+    due_window = (today, (now + timedelta(days=2)).strftime("%Y-%m-%d"), today, now_time)
 
+    # Without ?user_id= this still answers for every patient (legacy callers filter client-side)
+    if user_id is not None:
+        events = db.execute(USER_EVENTS_SQL, (user_id, after, since)).fetchall()
+        due = db.execute(USER_DUE_SQL, (user_id, *due_window)).fetchall()
+    else:
+        events = db.execute(ALL_EVENTS_SQL, (since, after)).fetchall()
+        due = db.execute(ALL_DUE_SQL, due_window).fetchall()
 
+    # Outbox events carry a stable id; pass the highest one back as ?after= to get only new ones
+    notifications = [outbox.to_dict(e) for e in events]
+    # Logins from the last few seconds are still in memory (id None until written)
+    notifications.extend(logins.buffer.pending_notifications(user_id))
+    for b in due:
+        notifications.extend(reminder_notifications(dict(b), now))
     return jsonify(notifications)
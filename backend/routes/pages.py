@@ -1,30 +1,117 @@
-from flask import Blueprint, send_from_directory, current_app
+from flask import Blueprint, current_app, request
+import gzip
+import hashlib
+import mimetypes
 import os
+import threading
+import time
+from backend.cache import not_modified, with_etag
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
 
 pages_bp = Blueprint('pages', __name__)
 
-@pages_bp.route('/admin')
-def admin_page():
-    # Use current_app.root_path (which is backend/) to find ../Page
-    page_dir = os.path.abspath(os.path.join(current_app.root_path, '..', 'Page'))
-    return send_from_directory(page_dir, 'admin.html')
+PAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Page'))
+# Page URLs carry no content hash, so browsers keep a page for a few minutes
+# and then revalidate it with the ETag
+PAGE_MAX_AGE = int(os.environ.get('PAGE_MAX_AGE', 300))
+# Below this a compressed copy is not worth the CPU on the client
+MIN_COMPRESS_SIZE = 512
+# In debug mode Page/ is rescanned for edits at most this often
+PAGE_RELOAD_SECONDS = float(os.environ.get('PAGE_RELOAD_SECONDS', 2))
 
-@pages_bp.route('/admin/')
-def admin_page_slash():
-    page_dir = os.path.abspath(os.path.join(current_app.root_path, '..', 'Page'))
-    return send_from_directory(page_dir, 'admin.html')
 
+class StaticPage:
+    """One file of Page/ with its body, precompressed variants and ETags."""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.mtime = os.stat(path).st_mtime_ns
+        mimetype, _ = mimetypes.guess_type(path)
+        self.mimetype = mimetype or 'application/octet-stream'
+        digest = hashlib.sha1(body).hexdigest()[:20]
+        # encoding -> (bytes, etag); each variant needs its own strong ETag
+        self.variants = {'identity': (body, digest)}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.variants['gzip'] = (gzip.compress(body, 9, mtime=0), digest + '-gz')
+            if brotli is not None:
+                self.variants['br'] = (brotli.compress(body, quality=11), digest + '-br')
+
+    def variant(self, accept_encodings):
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accept_encodings.quality(encoding) > 0:
+                return encoding
+        return 'identity'
+
+
+class PageIndex:
+    """Page/ read once into memory; requests never touch the filesystem."""
+    def __init__(self, page_dir):
+        self.page_dir = page_dir
+        self._lock = threading.Lock()
+        self.pages = {}
+        self.refreshed_at = 0.0
+        self.refresh()
+
+    def refresh(self):
+        """(Re)loads new or changed files."""
+        with self._lock:
+            self.refreshed_at = time.monotonic()
+            found = {}
+            for root, _, files in os.walk(self.page_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    key = os.path.relpath(path, self.page_dir).replace(os.sep, '/')
+                    page = self.pages.get(key)
+                    if page is None or page.mtime != os.stat(path).st_mtime_ns:
+                        page = StaticPage(path)
+                    found[key] = page
+            self.pages = found
+
+    def refresh_if_stale(self, seconds):
+        # Debug mode only: picks up edits to Page/ without a walk per request
+        if time.monotonic() - self.refreshed_at >= seconds:
+            self.refresh()
+
+    def get(self, path):
+        # Unknown paths fall back to the SPA entry point
+        return self.pages.get(path) or self.pages.get('index.html')
+
+
+index = PageIndex(PAGE_DIR)
+
+
+def send_page(path):
+    if current_app.debug:
+        index.refresh_if_stale(PAGE_RELOAD_SECONDS)
+    page = index.get(path)
+    if page is None:
+        return 'Not Found', 404
+
+    encoding = page.variant(request.accept_encodings)
+    body, etag = page.variants[encoding]
+    cache_control = f'public, max-age={PAGE_MAX_AGE}'
+    response = not_modified(etag, cache_control)
+    if response is None:
+        response = with_etag(current_app.response_class(body, mimetype=page.mimetype), etag, cache_control)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    if len(page.variants) > 1:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+@pages_bp.route('/admin')
+@pages_bp.route('/admin/')
 @pages_bp.route('/admin.html')
-def admin_page_file():
-    page_dir = os.path.abspath(os.path.join(current_app.root_path, '..', 'Page'))
-    return send_from_directory(page_dir, 'admin.html')
+def admin_page():
+    return send_page('admin.html')
 
 # Catch-all
 @pages_bp.route('/', defaults={'path': 'index.html'})
 @pages_bp.route('/<path:path>')
 def serve_page(path):
-    page_dir = os.path.abspath(os.path.join(current_app.root_path, '..', 'Page'))
-    target = os.path.join(page_dir, path)
-    if os.path.exists(target) and os.path.isfile(target):
-        return send_from_directory(page_dir, path)
-    return send_from_directory(page_dir, 'index.html')
+    return send_page(path)
@@ -0,0 +1,52 @@
+from flask import Blueprint, Response, request, jsonify
+from backend.events import hub
+
+stream_bp = Blueprint('stream', __name__)
+
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 3000
+
+def last_event_id():
+    # EventSource sends the header on reconnect; the query flag is for the first connect
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if value is None or value == '':
+        return None
+    return int(value)
+
+def event_stream(sub):
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            ev = sub.get(timeout=HEARTBEAT_SECONDS)
+            if ev is None:
+                yield ": keepalive\n\n"
+                continue
+            yield ev.encode()
+            if ev.event == 'reset':
+                # The client refetches and reconnects from the reset id
+                return
+    finally:
+        hub.unsubscribe(sub)
+
+def sse_response(sub):
+    return Response(event_stream(sub), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@stream_bp.route('', methods=['GET'])
+def user_stream():
+    try:
+        user_id = int(request.args['user_id'])
+        since = last_event_id()
+    except (KeyError, ValueError):
+        return jsonify({'error': 'user_id is required'}), 400
+    return sse_response(hub.subscribe(user_id=user_id, last_event_id=since))
+
+@stream_bp.route('/admin', methods=['GET'])
+def admin_stream():
+    try:
+        since = last_event_id()
+    except ValueError:
+        return jsonify({'error': 'invalid Last-Event-ID'}), 400
+    return sse_response(hub.subscribe(last_event_id=since))
@@ -0,0 +1,245 @@
+"""
+Structured recurring schedules and on-demand slot expansion.
+
+Each doctor has rules in doctor_schedules (weekdays as a bitmask with Monday as
+bit 0, opening hours, slot length, capacity, optional validity range) plus
+whole-day exceptions in schedule_exceptions. Slots for a date window are
+expanded from those rules when asked for; appointment_slots only receives a
+row once somebody books it (or an admin creates one by hand).
+"""
+import re
+from datetime import date, datetime, timedelta
+
+DEFAULT_SLOT_MINUTES = 30
+DEFAULT_CAPACITY = 10
+ALL_DAYS = 0b1111111
+# What the old slot generator assumed for a schedule it could not read:
+# Monday to Friday, 09:00-17:00 with 11:00-13:00 closed for lunch
+FALLBACK_RULES = [(0b0011111, '09:00', '11:00'), (0b0011111, '13:00', '17:00')]
+
+# Longest names first so 'พฤ' wins over 'พ' and 'อา' over 'อ'
+DAY_NAMES = sorted({
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6,
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
+    'จ': 0, 'อ': 1, 'พ': 2, 'พฤ': 3, 'ศ': 4, 'ส': 5, 'อา': 6,
+    'จันทร์': 0, 'อังคาร': 1, 'พุธ': 2, 'พฤหัส': 3, 'พฤหัสบดี': 3, 'ศุกร์': 4, 'เสาร์': 5, 'อาทิตย์': 6,
+}.items(), key=lambda kv: -len(kv[0]))
+EVERY_DAY = ('ทุกวัน', 'every day', 'everyday', 'daily')
+
+# "<days> HH:MM-HH:MM", repeated; ',' or ';' may separate the segments
+SEGMENT = re.compile(r'([^\d;]*?)\s*(\d{1,2})[:.](\d{2})\s*-\s*(\d{1,2})[:.](\d{2})')
+
+RULE_COLUMNS = ('weekdays', 'start_time', 'end_time', 'slot_minutes', 'capacity', 'valid_from', 'valid_to')
+
+DEPARTMENT_NAMES = {
+    'med': 'อายุรกรรม',
+    'dent': 'ทันตกรรม',
+    'ortho': 'ศัลยกรรมกระดูก',
+    'pedia': 'กุมารเวชกรรม'
+}
+
+def day_index(token):
+    token = token.strip().lower()
+    for name, idx in DAY_NAMES:
+        if token == name:
+            return idx
+    raise ValueError(f'unknown day: {token}')
+
+def parse_days(text):
+    """'จ-ศ', 'จ,พ,ศ', 'พฤ', 'ทุกวัน', 'Mon-Fri' -> weekday bitmask."""
+    text = text.strip().strip(',').strip()
+    if not text or text.lower() in EVERY_DAY:
+        return ALL_DAYS
+    mask = 0
+    for part in re.split(r'[,\s]+', text):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = (day_index(p) for p in part.split('-', 1))
+            day = first
+            while True:
+                mask |= 1 << day
+                if day == last:
+                    break
+                day = (day + 1) % 7
+        else:
+            mask |= 1 << day_index(part)
+    return mask
+
+def parse_schedule(text):
+    """
+    Free-text schedule -> [(weekdays, start_time, end_time)]. Raises
+    ValueError when the text does not follow the '<days> HH:MM-HH:MM' form.
+    """
+    rules = []
+    for days, h1, m1, h2, m2 in SEGMENT.findall(text or ''):
+        start, end = f'{int(h1):02d}:{m1}', f'{int(h2):02d}:{m2}'
+        if start >= end:
+            raise ValueError(f'empty hours: {start}-{end}')
+        rules.append((parse_days(days), start, end))
+    if not rules:
+        raise ValueError(f'unreadable schedule: {text!r}')
+    return rules
+
+def rules_from_text(text):
+    try:
+        return parse_schedule(text)
+    except ValueError:
+        return list(FALLBACK_RULES)
+
+def replace_rules(db, doctor_id, rules):
+    """Replaces a doctor's rules. rules are dicts keyed by RULE_COLUMNS. Does not commit."""
+    db.execute("DELETE FROM doctor_schedules WHERE doctor_id = ?", (doctor_id,))
+    db.executemany(
+        f"INSERT INTO doctor_schedules (doctor_id, {', '.join(RULE_COLUMNS)}) VALUES (?,?,?,?,?,?,?,?)",
+        [(doctor_id, r['weekdays'], r['start_time'], r['end_time'],
+          r.get('slot_minutes') or DEFAULT_SLOT_MINUTES, r.get('capacity') or DEFAULT_CAPACITY,
+          r.get('valid_from'), r.get('valid_to')) for r in rules]
+    )
+
+def replace_rules_from_text(db, doctor_id, text):
+    replace_rules(db, doctor_id, [
+        {'weekdays': days, 'start_time': start, 'end_time': end} for days, start, end in rules_from_text(text)
+    ])
+
+def rule_to_dict(row):
+    d = dict(row)
+    d['days'] = [i for i in range(7) if d['weekdays'] >> i & 1]
+    return d
+
+def department_id_for(db, dept_code):
+    thai_name = DEPARTMENT_NAMES.get(dept_code)
+    if thai_name:
+        row = db.execute('SELECT department_id FROM departments WHERE name LIKE ?', (f"%{thai_name}%",)).fetchone()
+        if row:
+            return row['department_id']
+    return 0
+
+def clock(value):
+    """'9:00' / '09:00' -> '09:00'. Raises ValueError (TypeError for non-strings)."""
+    return datetime.strptime(value, '%H:%M').strftime('%H:%M')
+
+def day_range(first, last):
+    day = first
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+def rule_times(rule):
+    step = timedelta(minutes=rule['slot_minutes'] or DEFAULT_SLOT_MINUTES)
+    t = datetime.strptime(rule['start_time'], '%H:%M')
+    end = datetime.strptime(rule['end_time'], '%H:%M')
+    while t + step <= end:
+        yield t.strftime('%H:%M'), (t + step).strftime('%H:%M')
+        t += step
+
+def load_window(db, doctor_ids, first, last):
+    """
+    Rules, closed days and stored slots of doctor_ids for first..last, one
+    query each: ({doctor_id: [rules]}, {(doctor_id, day)}, {(doctor_id, day): {time: slot}}).
+    """
+    marks = ','.join('?' * len(doctor_ids))
+    window = (first.isoformat(), last.isoformat())
+    rules = {}
+    for r in db.execute(f"SELECT * FROM doctor_schedules WHERE doctor_id IN ({marks}) ORDER BY id", doctor_ids):
+        rules.setdefault(r['doctor_id'], []).append(r)
+    off = {(r['doctor_id'], r['exception_date']) for r in db.execute(
+        f"SELECT doctor_id, exception_date FROM schedule_exceptions WHERE doctor_id IN ({marks}) AND exception_date BETWEEN ? AND ?",
+        (*doctor_ids, *window)
+    )}
+    stored = {}
+    for r in db.execute(
+        f"SELECT * FROM appointment_slots WHERE doctor_id IN ({marks}) AND slot_date BETWEEN ? AND ?",
+        (*doctor_ids, *window)
+    ):
+        stored.setdefault((r['doctor_id'], r['slot_date']), {})[r['start_time']] = dict(r)
+    return rules, off, stored
+
+def day_slots(doctor_id, day, rules, off, stored):
+    """One doctor's slots on one day as {start_time: slot}; stored rows win over the rules."""
+    day_str = day.isoformat()
+    slots = dict(stored.get((doctor_id, day_str), {}))
+    if (doctor_id, day_str) in off:
+        return slots
+    for rule in rules.get(doctor_id, ()):
+        if not rule['weekdays'] >> day.weekday() & 1:
+            continue
+        if (rule['valid_from'] and day_str < rule['valid_from']) or (rule['valid_to'] and day_str > rule['valid_to']):
+            continue
+        for start, end in rule_times(rule):
+            slots.setdefault(start, {
+                'slot_id': None,
+                'doctor_id': doctor_id,
+                'department_id': None,
+                'slot_date': day_str,
+                'start_time': start,
+                'end_time': end,
+                'max_capacity': rule['capacity'] or DEFAULT_CAPACITY,
+                'current_booking': 0,
+                'status': 'available',
+            })
+    return slots
+
+def expand(db, doctor_id, first, last):
+    """
+    Slots of one doctor from `first` to `last` (dates, inclusive), sorted by day
+    and time. Rows already in appointment_slots (booked or created by hand) are
+    returned as they are; the rest come from the rules with slot_id None.
+    """
+    rules, off, stored = load_window(db, [doctor_id], first, last)
+    slots = []
+    for day in day_range(first, last):
+        found = day_slots(doctor_id, day, rules, off, stored)
+        slots.extend(found[k] for k in sorted(found))
+    return slots
+
+def is_open(slot):
+    return slot['status'] == 'available' and (slot['current_booking'] or 0) < (slot['max_capacity'] or 0)
+
+def earliest_open(db, doctor_ids, first, last, after='', limit=20):
+    """
+    The first `limit` bookable slots of several doctors between first and last,
+    ordered by day, time and doctor. Full or closed slots and anything starting
+    at or before `after` ('YYYY-MM-DD HH:MM') are left out.
+    """
+    if not doctor_ids:
+        return []
+    rules, off, stored = load_window(db, doctor_ids, first, last)
+    found = []
+    for day in day_range(first, last):
+        candidates = []
+        for doctor_id in doctor_ids:
+            for start, slot in day_slots(doctor_id, day, rules, off, stored).items():
+                if is_open(slot) and f"{slot['slot_date']} {start}" > after:
+                    candidates.append((start, doctor_id, slot))
+        candidates.sort(key=lambda c: c[:2])
+        found.extend(c[2] for c in candidates[:limit - len(found)])
+        if len(found) >= limit:
+            break
+    return found
+
+def materialize(db, doctor_id, slot_date, start_time):
+    """
+    Persists the scheduled slot at slot_date/start_time so it can be claimed.
+    Returns False when the schedule has no such slot. Runs inside the caller's
+    transaction (the booking's BEGIN IMMEDIATE) and does not commit.
+    """
+    try:
+        day = date.fromisoformat(slot_date)
+    except (TypeError, ValueError):
+        return False
+    slot = next((s for s in expand(db, doctor_id, day, day) if s['start_time'] == start_time), None)
+    if slot is None:
+        return False
+    if slot['slot_id'] is None:
+        doc = db.execute("SELECT department FROM doctors WHERE id_doctor = ?", (doctor_id,)).fetchone()
+        db.execute(
+            """
+            INSERT OR IGNORE INTO appointment_slots
+            (doctor_id, department_id, slot_date, start_time, end_time, max_capacity, current_booking, status)
+            VALUES (?, ?, ?, ?, ?, ?, 0, 'available')
+            """,
+            (doctor_id, department_id_for(db, doc['department'] if doc else None), slot['slot_date'],
+             slot['start_time'], slot['end_time'], slot['max_capacity'])
+        )
+    return True
@@ -0,0 +1,219 @@
+"""
+Slow-query log.
+
+database.Connection hands every statement whose execute() took at least
+SLOW_QUERY_MS (default 100; 0 turns the log off) to record(). An entry holds
+the SQL, the shape of its parameters (types only, never values), the rows it
+returned or changed, the route that ran it and its EXPLAIN QUERY PLAN, which
+is captured once per distinct statement. With SLOW_QUERY_LOG set (e.g.
+backend/logs/slow_queries.log), entries also go to that rotating file as one
+JSON object per line. GET /api/admin/slow-queries lists the statements with
+the most total slow time in this process.
+
+For a SELECT the rows are only known once the caller has fetched them, so a
+slow SELECT returns a SlowCursor that counts them (and adds the fetch time)
+and is logged when it runs out of rows or is dropped.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from flask import has_request_context, request
+
+_ms = float(os.environ.get('SLOW_QUERY_MS', 100))
+THRESHOLD = _ms / 1000 if _ms > 0 else float('inf')
+# Off unless asked for, so tests and scripts don't write into the source tree
+LOG_PATH = os.environ.get('SLOW_QUERY_LOG', '')
+LOG_MAX_BYTES = 5 * 2**20
+LOG_BACKUPS = 3
+# Distinct statements kept for the admin listing and the plan cache
+MAX_STATEMENTS = 500
+
+log = logging.getLogger(__name__)
+
+
+def normalize(sql):
+    return re.sub(r'\s+', ' ', sql).strip()
+
+def param_shape(parameters, many=False):
+    """(1, 'a', None) -> '(int, str, NoneType)'; {'id': 1} -> '{id: int}'; executemany -> 'N x (...)'."""
+    if many:
+        # A generator is used up by the time we get here
+        if not isinstance(parameters, (list, tuple)):
+            return 'iterable'
+        return f'{len(parameters)} x {param_shape(parameters[0])}' if parameters else '0 x ()'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in parameters.items()) + '}'
+    return '(' + ', '.join(type(v).__name__ for v in parameters) + ')'
+
+def format_plan(rows):
+    """EXPLAIN QUERY PLAN rows (id, parent, notused, detail) -> indented lines, like the sqlite3 shell."""
+    depth = {0: -1}
+    lines = []
+    for row in rows:
+        depth[row[0]] = depth.get(row[1], -1) + 1
+        lines.append('  ' * depth[row[0]] + row[3])
+    return lines
+
+
+class SlowQueryLog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handler = None
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            # normalized sql -> aggregate; plans survive until clear()
+            self.statements = {}
+            if self._handler is not None:
+                log.removeHandler(self._handler)
+                self._handler.close()
+                self._handler = None
+
+    def _file(self):
+        if self._handler is None and LOG_PATH:
+            os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+            self._handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding='utf-8')
+            self._handler.setFormatter(logging.Formatter('%(message)s'))
+            log.addHandler(self._handler)
+            log.setLevel(logging.INFO)
+            log.propagate = False
+        return self._handler
+
+    def plan(self, conn, sql, parameters, many):
+        """EXPLAIN QUERY PLAN of sql, run once per distinct statement on the connection that ran it."""
+        key = normalize(sql)
+        stats = self.statements.get(key)
+        if stats is not None and stats['plan'] is not None:
+            return stats['plan']
+        if many:
+            rows = parameters if isinstance(parameters, (list, tuple)) else []
+            parameters = rows[0] if rows else ()
+        try:
+            # Bypasses Connection.execute so the EXPLAIN is neither counted nor logged
+            return format_plan(sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters).fetchall())
+        except Exception as e:
+            return [f'(no plan: {e})']
+
+    def add(self, sql, shape, rows, seconds, route, plan):
+        key = normalize(sql)
+        entry = {
+            'at': datetime.now().isoformat(timespec='milliseconds'),
+            'ms': round(seconds * 1000, 2),
+            'route': route,
+            'sql': key,
+            'params': shape,
+            'rows': rows,
+            'plan': plan,
+        }
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                if len(self.statements) >= MAX_STATEMENTS:
+                    # Drop the statement with the least slow time to make room
+                    del self.statements[min(self.statements, key=lambda k: self.statements[k]['total_ms'])]
+                stats = self.statements[key] = {'sql': key, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                'routes': {}, 'params': shape, 'rows': rows, 'plan': plan, 'last_at': None}
+            stats['count'] += 1
+            stats['total_ms'] += entry['ms']
+            stats['max_ms'] = max(stats['max_ms'], entry['ms'])
+            if route:
+                stats['routes'][route] = stats['routes'].get(route, 0) + 1
+            stats['params'], stats['rows'], stats['last_at'] = shape, rows, entry['at']
+            if stats['plan'] is None:
+                stats['plan'] = plan
+            handler = self._file()
+        if handler is not None:
+            log.info(json.dumps(entry, ensure_ascii=False))
+
+    def top(self, limit=20):
+        with self._lock:
+            ranked = sorted(self.statements.values(), key=lambda s: s['total_ms'], reverse=True)[:limit]
+            return [dict(s, total_ms=round(s['total_ms'], 2), avg_ms=round(s['total_ms'] / s['count'], 2),
+                         routes=dict(s['routes'])) for s in ranked]
+
+
+slow_log = SlowQueryLog()
+
+
+def current_route():
+    if has_request_context():
+        return f'{request.method} {request.endpoint or request.path}'
+    return None
+
+
+class SlowCursor:
+    """Stands in for the cursor of a slow SELECT until its rows have been fetched."""
+    def __init__(self, cursor, entry):
+        self._cursor = cursor
+        self._entry = entry
+        self._rows = 0
+        self._logged = False
+
+    def _fetched(self, started, count, done):
+        self._entry['seconds'] += time.perf_counter() - started
+        self._rows += count
+        if done:
+            self._log()
+
+    def _log(self):
+        if not self._logged:
+            self._logged = True
+            e = self._entry
+            slow_log.add(e['sql'], e['shape'], self._rows, e['seconds'], e['route'], e['plan'])
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size or self._cursor.arraysize)
+        self._fetched(started, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        self._log()
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __del__(self):
+        try:
+            self._log()
+        except Exception:
+            pass
+
+
+def record(conn, sql, parameters, cursor, seconds, many=False):
+    """Logs one slow statement. Returns the cursor to hand back to the caller."""
+    shape = param_shape(parameters, many)
+    route = current_route()
+    plan = slow_log.plan(conn, sql, parameters, many)
+    if cursor.description is None:
+        # Not a query: rowcount is final (-1 for statements such as BEGIN)
+        slow_log.add(sql, shape, cursor.rowcount if cursor.rowcount >= 0 else None, seconds, route, plan)
+        return cursor
+    return SlowCursor(cursor, {'sql': sql, 'shape': shape, 'seconds': seconds, 'route': route, 'plan': plan})
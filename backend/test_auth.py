@@ -0,0 +1,83 @@
+import unittest
+from app import app
+from backend import database, logins
+from backend.testing import DatabaseTestCase
+
+
+class AuthTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db = database.get_db()
+            db.execute("INSERT INTO staff (username, hash_password) VALUES ('admin', 'รหัส1234')")
+            # Older accounts have card numbers that are not 13 digits
+            db.execute("INSERT INTO users (firstname, tel, email, card_id, hash_password) VALUES ('เก่า', '0811111111', 'old@x', '11770969665', 'pw')")
+            db.commit()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        logins.buffer.flush()
+
+    def register(self, **fields):
+        data = {'firstName': 'ก', 'email': 'a@x', 'phone': '0812345678', 'idCard': '1234567890123', 'password': 'secret'}
+        data.update(fields)
+        return self.client.post('/api/register', json=data)
+
+    def login(self, identifier, password='secret'):
+        return self.client.post('/api/login', json={'identifier': identifier, 'password': password})
+
+    def test_duplicates_are_rejected_by_constraint(self):
+        self.assertEqual(self.register().status_code, 201)
+        for fields, message in (({'email': 'a@x', 'phone': '0899999999', 'idCard': ''}, 'Email already exists'),
+                                ({'email': 'b@x', 'phone': '081-234-5678', 'idCard': ''}, 'Phone already exists'),
+                                ({'email': 'b@x', 'phone': '0899999999'}, 'ID card already exists')):
+            res = self.register(**fields)
+            self.assertEqual((res.status_code, res.get_json()['error']), (400, message))
+        # Without an ID card, card_id stays NULL and never collides
+        self.assertEqual(self.register(email='c@x', phone='0822222222', idCard='').status_code, 201)
+        self.assertEqual(self.register(email='d@x', phone='0833333333', idCard=' ').status_code, 201)
+
+    def test_missing_or_non_string_fields(self):
+        for fields in ({'email': None}, {'email': 5}, {'phone': ' '}, {'phone': ['0812345678']}, {'password': ''}, {'idCard': 1234567890123}):
+            res = self.register(**fields)
+            self.assertEqual((res.status_code, res.get_json()['error']), (400, 'Missing required fields'), fields)
+        for body in ({'password': 'secret'}, {'identifier': 812345678, 'password': 'secret'},
+                     {'identifier': '  ', 'password': 'secret'}, {'identifier': '0812345678', 'password': 1}):
+            res = self.client.post('/api/login', json=body)
+            self.assertEqual((res.status_code, res.get_json()['error']), (400, 'Missing identifier or password'), body)
+        self.assertEqual(self.client.post('/api/login', data='[]', content_type='application/json').status_code, 400)
+
+    def test_login_by_phone_or_card(self):
+        self.register()
+        self.assertEqual(self.login('0812345678').get_json()['email'], 'a@x')
+        self.assertEqual(self.login('081-234-5678').status_code, 200)
+        self.assertEqual(self.login('1 2345 67890 12 3').get_json()['email'], 'a@x')
+        self.assertEqual(self.login('11770969665', 'pw').get_json()['firstname'], 'เก่า')
+        self.assertEqual(self.login('0812345678', 'wrong').status_code, 401)
+        self.assertEqual(self.login('0800000000').status_code, 401)
+
+    def test_formatted_accounts_from_before_the_migration(self):
+        with app.app_context():
+            db = database.get_db()
+            db.execute("INSERT INTO users (tel, email, card_id, hash_password) VALUES ('081-234-5678', 'f@x', '1-2345-67890-12-3', 'pw')")
+            # Normalizing this one would take the bare number of the account below
+            db.execute("INSERT INTO users (tel, email, hash_password) VALUES ('082 222 2222', 'g@x', 'pw2')")
+            db.execute("INSERT INTO users (tel, email, hash_password) VALUES ('0822222222', 'h@x', 'pw3')")
+            db.execute(f"PRAGMA user_version = {database.MIGRATIONS.index(database.migrate_unique_user_identifiers)}")
+            db.commit()
+            with self.assertLogs('backend.database', 'WARNING'):
+                database.migrate(db)
+            self.assertEqual(tuple(db.execute("SELECT tel, card_id FROM users WHERE email = 'f@x'").fetchone()), ('0812345678', '1234567890123'))
+        for identifier in ('081-234-5678', '0812345678', '1-2345-67890-12-3', '1234567890123'):
+            self.assertEqual(self.login(identifier, 'pw').get_json()['email'], 'f@x', identifier)
+        self.assertEqual(self.login('082 222 2222', 'pw2').get_json()['email'], 'g@x')
+        self.assertEqual(self.login('0822222222', 'pw3').get_json()['email'], 'h@x')
+
+    def test_admin_login(self):
+        self.assertEqual(self.client.post('/api/admin/login', json={'username': 'admin', 'password': 'รหัส1234'}).status_code, 200)
+        self.assertEqual(self.client.post('/api/admin/login', json={'username': 'admin', 'password': 'x'}).status_code, 401)
+        self.assertEqual(self.client.post('/api/admin/login', json={'username': 'nobody', 'password': 'x'}).status_code, 401)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import threading
+import unittest
+from app import app
+from backend import database
+from backend.testing import DatabaseTestCase
+
+
+class BookingConcurrencyTestCase(DatabaseTestCase):
+    THREADS = 40
+    CAPACITY = 5
+
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+
+        with app.app_context():
+            db = database.get_db()
+            cur = db.execute(
+                "INSERT INTO appointment_slots (doctor_id, department_id, slot_date, start_time, end_time, max_capacity, current_booking, status) VALUES (?,?,?,?,?,?,?,?)",
+                (1, 1, '2026-03-01', '09:00', '09:30', self.CAPACITY, 0, 'available')
+            )
+            self.slot_id = cur.lastrowid
+            db.commit()
+
+    def test_slot_never_overbooks(self):
+        results = [None] * self.THREADS
+        barrier = threading.Barrier(self.THREADS)
+
+        def book(i):
+            client = app.test_client()
+            barrier.wait()
+            res = client.post('/api/bookings', json={
+                'slot_id': self.slot_id,
+                'userId': 1000 + i,
+                'date': '2026-03-01',
+                'time': '09:00',
+                'patientName': f'Patient {i}'
+            })
+            results[i] = res.status_code
+
+        threads = [threading.Thread(target=book, args=(i,)) for i in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results.count(201), self.CAPACITY)
+        self.assertEqual(results.count(400), self.THREADS - self.CAPACITY)
+
+        with app.app_context():
+            db = database.get_db()
+            slot = db.execute("SELECT current_booking FROM appointment_slots WHERE slot_id = ?", (self.slot_id,)).fetchone()
+            booked = db.execute("SELECT count(*) FROM bookings WHERE slot_id = ?", (self.slot_id,)).fetchone()[0]
+        self.assertEqual(slot['current_booking'], self.CAPACITY)
+        self.assertEqual(booked, self.CAPACITY)
+
+    def test_user_cannot_hold_two_active_bookings(self):
+        client = app.test_client()
+        payload = {'slot_id': self.slot_id, 'userId': 7, 'date': '2026-03-01', 'time': '09:00'}
+        self.assertEqual(client.post('/api/bookings', json=payload).status_code, 201)
+        self.assertEqual(client.post('/api/bookings', json=payload).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
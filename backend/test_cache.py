@@ -0,0 +1,91 @@
+import unittest
+from unittest import mock
+from app import app
+from backend import database, schedules
+from backend.cache import catalog
+from backend.testing import DatabaseTestCase
+
+
+class CatalogCacheTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+        catalog.clear()
+        self.client = app.test_client()
+
+    def test_repeat_reads_hit(self):
+        first = self.client.get('/api/doctors?department=med').get_json()
+        self.assertEqual(self.client.get('/api/doctors?department=med').get_json(), first)
+        self.client.get('/api/doctors?department=dent')
+        self.client.get('/api/departments')
+        self.client.get('/api/departments')
+        stats = self.client.get('/api/admin/cache').get_json()['catalog']
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 3, 3))
+
+    def test_admin_write_invalidates(self):
+        self.client.get('/api/doctors')
+        self.client.put('/api/admin/doctors/1', json={'firstname': 'สมหญิง'})
+        names = [d['firstname'] for d in self.client.get('/api/doctors').get_json()]
+        self.assertIn('สมหญิง', names)
+
+    def test_write_from_another_process_invalidates(self):
+        self.assertEqual(len(self.client.get('/api/departments').get_json()), 4)
+        # A separate connection stands in for another worker or the sqlite3 shell
+        other = database.connect(database.DB_PATH)
+        other.execute("INSERT INTO departments (name) VALUES ('จักษุ')")
+        other.commit()
+        other.close()
+        self.assertEqual(len(self.client.get('/api/departments').get_json()), 5)
+        self.assertEqual(catalog.stats()['hits'], 0)
+
+
+class ConditionalGetTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        again = self.client.get(url, headers={'If-None-Match': first.headers['ETag']})
+        return first, again
+
+    def test_catalog(self):
+        first, again = self.revalidate('/api/doctors?department=med')
+        self.assertEqual((again.status_code, again.data), (304, b''))
+        self.assertEqual(again.headers['ETag'], first.headers['ETag'])
+        self.assertNotEqual(self.client.get('/api/doctors?department=dent').headers['ETag'], first.headers['ETag'])
+
+        self.client.put('/api/admin/doctors/1', json={'status': 'คิวเต็มวันนี้'})
+        after = self.client.get('/api/doctors?department=med', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(after.status_code, 200)
+
+        _, again = self.revalidate('/api/departments')
+        self.assertEqual(again.status_code, 304)
+
+    def test_slots_change_per_doctor(self):
+        url = '/api/doctors/5/slots?date=2030-03-04'
+        first, again = self.revalidate(url)
+        other = self.client.get('/api/doctors/1/slots?date=2030-03-04').headers['ETag']
+        # A 304 answers from the counter alone
+        with mock.patch.object(schedules, 'expand', side_effect=AssertionError):
+            self.assertEqual(self.client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code, 304)
+
+        self.client.post('/api/bookings', json={'doctorName': 'กระดูก แข็งแรง', 'date': '2030-03-04', 'time': '09:00'})
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code, 200)
+        self.assertEqual(self.client.get('/api/doctors/1/slots?date=2030-03-04', headers={'If-None-Match': other}).status_code, 304)
+
+    def test_booking(self):
+        booking_id = self.client.post('/api/bookings', json={'doctorName': 'กระดูก แข็งแรง', 'date': '2030-03-04', 'time': '09:00'}).get_json()['id']
+        first, again = self.revalidate(f'/api/bookings/{booking_id}')
+        self.assertEqual(again.status_code, 304)
+        self.assertIn('private', again.headers['Cache-Control'])
+
+        self.client.put(f'/api/bookings/{booking_id}', json={'symptoms': 'ไข้'})
+        after = self.client.get(f'/api/bookings/{booking_id}', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(self.client.get('/api/bookings/9999').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import unittest
+from app import app
+from backend import database
+from backend.testing import DatabaseTestCase
+
+
+class ConnectionPoolTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+        self.pool = database.get_pool()
+        self.client = app.test_client()
+
+    def test_requests_reuse_connections(self):
+        for _ in range(20):
+            self.assertEqual(self.client.get('/api/doctors').status_code, 200)
+        stats = self.pool.stats()
+        self.assertEqual(stats['opened'], 1)
+        self.assertEqual(stats['in_use'], 0)
+        # The first request opens the connection, the rest reuse it
+        self.assertGreaterEqual(stats['reused'], 19)
+
+    def test_connections_are_tuned(self):
+        conn = self.pool.acquire()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+        self.pool.release(conn)
+
+    def test_broken_connection_is_replaced_on_checkout(self):
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        conn.close()
+        fresh = self.pool.acquire()
+        self.assertIsNot(fresh, conn)
+        self.assertEqual(fresh.execute("SELECT 1").fetchone()[0], 1)
+        self.assertEqual(self.pool.stats()['health_failures'], 1)
+
+    def test_uncommitted_work_is_rolled_back_on_release(self):
+        with app.app_context():
+            database.get_db().execute("INSERT INTO departments (name) VALUES ('ไม่ได้ commit')")
+        with app.app_context():
+            row = database.get_db().execute("SELECT 1 FROM departments WHERE name = 'ไม่ได้ commit'").fetchone()
+        self.assertIsNone(row)
+
+    def test_pool_is_keyed_by_database_path(self):
+        other = os.path.join(self.tmpdir, 'other.db')
+        self.assertIsNot(database.get_pool(other), self.pool)
+        self.assertIs(database.get_pool(), self.pool)
+
+    def test_stats_endpoint(self):
+        self.client.get('/api/doctors')
+        body = self.client.get('/api/admin/db/pool').get_json()
+        self.assertTrue(body['enabled'])
+        self.assertIn(database.DB_PATH, [p['path'] for p in body['pools']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import threading
+import time
+import tracemalloc
+import unittest
+from app import app
+from backend import database
+from backend.events import EventHub, hub
+from backend.routes.stream import event_stream
+from backend.testing import DatabaseTestCase
+
+
+class EventHubTestCase(unittest.TestCase):
+    def test_user_and_admin_filtering(self):
+        h = EventHub()
+        mine, other, admin = h.subscribe(user_id=1), h.subscribe(user_id=2), h.subscribe()
+        h.publish('booking.created', {'booking_id': 10}, user_id=1)
+        self.assertEqual(mine.get(0).data, {'booking_id': 10})
+        self.assertEqual(admin.get(0).event, 'booking.created')
+        self.assertIsNone(other.get(0))
+
+    def test_reconnect_replays_missed_events(self):
+        h = EventHub()
+        first = h.publish('booking.created', {}, user_id=1)
+        h.publish('booking.updated', {}, user_id=2)
+        third = h.publish('booking.cancelled', {}, user_id=1)
+        sub = h.subscribe(user_id=1, last_event_id=first.id)
+        self.assertEqual(sub.get(0).id, third.id)
+        self.assertIsNone(sub.get(0))
+
+    def test_unknown_last_event_id_resets(self):
+        h = EventHub(history_size=2)
+        for _ in range(5):
+            h.publish('booking.created', {}, user_id=1)
+        self.assertEqual(h.subscribe(user_id=1, last_event_id=1).get(0).event, 'reset')      # fell out of history
+        self.assertEqual(h.subscribe(user_id=1, last_event_id=999).get(0).event, 'reset')    # from before a restart
+        self.assertEqual(h.subscribe(user_id=1, last_event_id=999).get(0).id, 5)
+
+    def test_slow_subscriber_is_dropped_not_blocking(self):
+        h = EventHub()
+        sub = h.subscribe()
+        for _ in range(sub.queue.maxsize + 10):
+            h.publish('booking.created', {})
+        self.assertEqual(h.subscriber_count(), 0)
+        events = [sub.get(0) for _ in range(sub.queue.maxsize)]
+        self.assertEqual(events[-1].event, 'reset')
+
+    def test_overflow_survives_a_racing_publisher(self):
+        h = EventHub()
+        sub = h.subscribe()
+        for _ in range(sub.queue.maxsize):
+            h.publish('booking.created', {})
+        drain = sub.queue.get_nowait
+
+        def racing_get():
+            # Another publisher refills the slot the overflow just freed
+            item = drain()
+            sub.queue.get_nowait = drain
+            sub.queue.put_nowait(item)
+            return item
+
+        sub.queue.get_nowait = racing_get
+        last = h.publish('booking.created', {})
+        self.assertEqual(h.subscriber_count(), 0)
+        events = [sub.get(0) for _ in range(sub.queue.maxsize)]
+        self.assertEqual((events[-1].event, events[-1].id), ('reset', last.id))
+
+    def test_idle_subscribers_latency_and_memory(self):
+        h = EventHub()
+        count = 1000
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        subs = [h.subscribe(user_id=None) for _ in range(count)]
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        per_sub = sum(s.size_diff for s in after.compare_to(before, 'filename')) / count
+
+        received = [None] * count
+        ready = threading.Barrier(count + 1)
+
+        def listen(i):
+            ready.wait()
+            if subs[i].get(timeout=10) is not None:
+                received[i] = time.perf_counter()
+
+        threads = [threading.Thread(target=listen, args=(i,)) for i in range(count)]
+        for t in threads:
+            t.start()
+        ready.wait()
+        time.sleep(0.2)  # let every listener block on its queue
+        sent = time.perf_counter()
+        h.publish('booking.created', {'booking_id': 1})
+        for t in threads:
+            t.join()
+
+        self.assertNotIn(None, received)
+        latencies = sorted(r - sent for r in received)
+        self.assertLess(latencies[-1], 2.0)
+        print(f"\n[TEST] {count} subscribers: delivery p50 {latencies[count // 2] * 1000:.2f} ms, "
+              f"max {latencies[-1] * 1000:.2f} ms, ~{per_sub / 1024:.1f} KiB per subscription")
+
+
+class StreamEndpointTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db = database.get_db()
+            self.slot_id = db.execute(
+                "INSERT INTO appointment_slots (doctor_id, slot_date, start_time, max_capacity, current_booking) VALUES (1, '2026-03-01', '09:00', 5, 0)"
+            ).lastrowid
+            db.commit()
+        self.client = app.test_client()
+
+    def test_booking_is_pushed_to_user_stream(self):
+        res = self.client.get('/api/stream?user_id=42', buffered=False)
+        self.assertEqual(res.mimetype, 'text/event-stream')
+        chunks = iter(res.response)
+        self.assertTrue(next(chunks).decode().startswith('retry:'))
+
+        self.client.post('/api/bookings', json={'slot_id': self.slot_id, 'userId': '42', 'date': '2026-03-01', 'time': '09:00'})
+        frame = next(chunks).decode()
+        self.assertIn('event: booking.created', frame)
+        self.assertIn('"user_id": 42', frame)
+        res.close()
+
+    def test_stream_requires_user(self):
+        self.assertEqual(self.client.get('/api/stream').status_code, 400)
+
+    def test_closing_stream_unsubscribes(self):
+        sub = hub.subscribe(user_id=7)
+        gen = event_stream(sub)
+        next(gen)
+        start = hub.subscriber_count()
+        gen.close()
+        self.assertEqual(hub.subscriber_count(), start - 1)
+
+if __name__ == '__main__':
+    unittest.main()
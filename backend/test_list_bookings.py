@@ -0,0 +1,129 @@
+import unittest
+from unittest import mock
+from werkzeug.datastructures import MultiDict
+from app import app
+from backend import database
+from backend.routes.bookings import bookings_query
+from backend.testing import DatabaseTestCase
+
+
+class ListBookingsTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+        self.context = app.app_context()
+        self.context.push()
+        self.client = app.test_client()
+
+        db = database.get_db()
+        db.execute("INSERT INTO appointment_slots (slot_id, doctor_id, slot_date, start_time, max_capacity) VALUES (1, 1, '2026-03-01', '09:00', 99)")
+        db.execute("INSERT INTO appointment_slots (slot_id, doctor_id, slot_date, start_time, max_capacity) VALUES (2, 2, '2026-03-02', '10:00', 99)")
+        rows = []
+        for i in range(30):
+            user_id = 1 if i % 3 == 0 else 2
+            slot_id = 1 if i % 2 == 0 else 2
+            day = '2026-03-01' if slot_id == 1 else '2026-03-02'
+            status = 'cancelled' if i % 5 == 0 else 'รอรับบริการ'
+            detail = 'ปวดหัว' if i == 29 else f'{{"patientName": "P", "doctorName": "D{slot_id}"}}'
+            rows.append((slot_id, user_id, f'{day} 09:00', status, detail))
+        # Rows the way older versions stored them: fields only inside detail
+        db.executemany("INSERT INTO bookings (slot_id, id_users, booking_at, booking_Status, detail) VALUES (?,?,?,?,?)", rows)
+        db.commit()
+        database.backfill_booking_columns(db, batch_size=7)
+        database.backfill_booking_times(db, batch_size=7)
+
+    def tearDown(self):
+        self.context.pop()
+
+    def test_unpaginated_listing_is_unchanged(self):
+        res = self.client.get('/api/bookings')
+        ids = [b['id'] for b in res.get_json()]
+        self.assertEqual(len(ids), 30)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertNotIn('X-Next-Cursor', res.headers)
+
+    def test_filters(self):
+        mine = self.client.get('/api/bookings?user_id=1').get_json()
+        self.assertEqual(len(mine), 10)
+        self.assertTrue(all(b['id_users'] == 1 for b in mine))
+
+        active = self.client.get('/api/bookings?user_id=2&status=รอรับบริการ,booked').get_json()
+        self.assertTrue(all(b['status'] == 'รอรับบริการ' for b in active))
+
+        day = self.client.get('/api/bookings?date_from=2026-03-02&date_to=2026-03-02').get_json()
+        self.assertEqual(len(day), 15)
+        self.assertTrue(all(b['date'] == '2026-03-02' for b in day))
+
+        doctor = self.client.get('/api/bookings?doctor_id=1').get_json()
+        self.assertTrue(doctor and all(b['slot_id'] == 1 for b in doctor))
+
+    def test_keyset_pagination_walks_every_row_once(self):
+        seen = []
+        url = '/api/bookings?limit=7'
+        while url:
+            res = self.client.get(url)
+            page = res.get_json()
+            self.assertLessEqual(len(page), 7)
+            seen.extend(b['id'] for b in page)
+            cursor = res.headers.get('X-Next-Cursor')
+            url = f'/api/bookings?limit=7&after={cursor}' if cursor else None
+        self.assertEqual(seen, sorted(set(seen), reverse=True))
+        self.assertEqual(len(seen), 30)
+
+    def test_stream_matches_buffered_listing(self):
+        buffered = self.client.get('/api/bookings?user_id=2').get_json()
+        res = self.client.get('/api/bookings?user_id=2&stream=1')
+        self.assertEqual(res.mimetype, 'application/json')
+        self.assertEqual(res.get_json(), buffered)
+        self.assertEqual(self.client.get('/api/bookings?user_id=999&stream=1').get_json(), [])
+        self.assertEqual(len(self.client.get('/api/bookings?limit=4&stream=1').get_json()), 4)
+
+    def test_detail_fields_are_backfilled_columns(self):
+        with mock.patch('json.loads', side_effect=AssertionError('detail parsed in Python')):
+            res = self.client.get('/api/bookings')
+        listing = res.get_json()
+        self.assertEqual(listing[0]['symptoms'], 'ปวดหัว')  # non-JSON detail stays readable
+        self.assertIsNone(listing[0]['patient_name'])
+        self.assertTrue(all(b['patient_name'] == 'P' for b in listing[1:]))
+
+        by_doctor = self.client.get('/api/bookings?doctor_name=D1').get_json()
+        self.assertEqual(len(by_doctor), 15)
+        self.assertTrue(all(b['slot_id'] == 1 for b in by_doctor))
+
+        one = self.client.get(f"/api/bookings/{listing[1]['id']}").get_json()
+        self.assertEqual((one['patientName'], one['patient_name'], one['doctor_name']), ('P', 'P', 'D1'))
+
+    def test_day_and_time_columns(self):
+        db = database.get_db()
+        legacy = [(1, "None None"), (2, '2026-03-05 10:30 - 11:00'), (None, ''), (2, '2026-02-13 \n')]
+        ids = [db.execute("INSERT INTO bookings (slot_id, id_users, booking_at, booking_Status) VALUES (?, 3, ?, 'arrived')", row).lastrowid
+               for row in legacy]
+        db.commit()
+        database.backfill_booking_times(db)
+        got = [tuple(db.execute("SELECT slot_date, start_time FROM bookings WHERE id = ?", (i,)).fetchone()) for i in ids]
+        # A date without a usable time takes the slot's time
+        self.assertEqual(got, [('2026-03-01', '09:00'), ('2026-03-05', '10:30'), (None, None), ('2026-02-13', '10:00')])
+
+        moved = self.client.put(f'/api/bookings/{ids[0]}', json={'date': '2026-03-09', 'time': '8:15'}).get_json()
+        self.assertEqual((moved['date'], moved['time']), ('2026-03-09', '08:15'))
+        day = self.client.get('/api/bookings?date_from=2026-03-09&date_to=2026-03-09').get_json()
+        self.assertEqual([b['id'] for b in day], [ids[0]])
+
+    def test_bad_input_is_rejected(self):
+        self.assertEqual(self.client.get('/api/bookings?after=not-a-cursor').status_code, 400)
+        self.assertEqual(self.client.get('/api/bookings?date_from=01/03/2026').status_code, 400)
+        self.assertEqual(self.client.get('/api/bookings?user_id=abc').status_code, 400)
+
+    def test_filtered_pages_use_indexes(self):
+        db = database.get_db()
+        for qs in ({'user_id': '1', 'limit': '20'},
+                   {'user_id': '1', 'status': 'รอรับบริการ,booked'},
+                   {'date_from': '2026-03-01', 'date_to': '2026-03-01', 'limit': '20'},
+                   {'doctor_id': '1', 'limit': '20'},
+                   {'doctor_name': 'D1', 'limit': '20'}):
+            query, params, _ = bookings_query(MultiDict(qs))
+            plan = ' / '.join(r['detail'] for r in db.execute('EXPLAIN QUERY PLAN ' + query, params))
+            self.assertNotIn('SCAN bookings', plan, f'{qs}: {plan}')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+from app import app
+from backend import database, logins
+from backend.testing import DatabaseTestCase
+
+
+class LoginBufferTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+        self.db = database.connect()
+        self.db.execute("INSERT INTO users (ID_user, firstname, lastname, tel, hash_password) VALUES (1, 'ก', 'ข', '0811111111', 'pw')")
+        self.db.commit()
+        # Interval long enough that only the explicit flush() calls below write
+        self.buffer = logins.LoginBuffer(interval=3600)
+        self.client = app.test_client()
+
+    def tearDown(self):
+        logins.buffer.flush()
+        self.db.close()
+
+    def last_login(self):
+        return self.db.execute("SELECT last_login FROM users WHERE ID_user = 1").fetchone()[0]
+
+    def test_latest_login_wins_and_is_written_once(self):
+        self.buffer.record(1, datetime(2026, 3, 2, 8, 0), 'ก', 'ข')
+        self.buffer.record(1, datetime(2026, 3, 2, 8, 5), 'ก', 'ข')
+        self.assertIsNone(self.last_login())
+        self.assertEqual([n['time'] for n in self.buffer.pending_notifications(1)], ['08:05'])
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.last_login(), '2026-03-02T08:05:00')
+        self.assertEqual(self.db.execute("SELECT count(*) FROM notifications WHERE event = 'login'").fetchone()[0], 1)
+        self.assertEqual(self.buffer.pending_notifications(1), [])
+
+        # A late flush of an older login never moves last_login back
+        self.buffer.record(1, datetime(2026, 3, 2, 7, 0))
+        self.buffer.flush()
+        self.assertEqual(self.last_login(), '2026-03-02T08:05:00')
+
+    def test_login_stays_visible_while_it_is_written(self):
+        self.buffer.record(1, datetime(2026, 3, 2, 8, 0), 'ก', 'ข')
+        seen = []
+        run_immediate = database.run_immediate
+
+        def waiting_for_lock(conn, work):
+            # Neither in the buffer nor committed yet
+            seen.append([n['time'] for n in self.buffer.pending_notifications(1)])
+            return run_immediate(conn, work)
+
+        with mock.patch.object(database, 'run_immediate', waiting_for_lock):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(seen, [['08:00']])
+        self.assertEqual(self.buffer.pending_notifications(), [])
+
+    def test_login_does_not_write(self):
+        self.assertEqual(self.client.post('/api/login', json={'identifier': '0811111111', 'password': 'pw'}).status_code, 200)
+        self.assertIsNone(self.last_login())
+        # The notification shows up before the flush
+        notes = self.client.get('/api/notifications?user_id=1').get_json()
+        self.assertEqual([(n['title'], n['id']) for n in notes], [('เข้าสู่ระบบสำเร็จ', None)])
+
+        logins.buffer.flush()
+        self.assertIsNotNone(self.last_login())
+        notes = self.client.get('/api/notifications?user_id=1').get_json()
+        self.assertEqual(len(notes), 1)
+        self.assertIsNotNone(notes[0]['id'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from unittest import mock
+from app import app
+from backend import database, metrics
+from backend.testing import DatabaseTestCase
+
+
+class MetricsTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+        metrics.registry.clear()
+        self.client = app.test_client()
+
+    def request(self, method, path, **kwargs):
+        # Metrics are recorded when the body is closed, as a server does after sending it
+        with self.client.open(path, method=method, **kwargs) as res:
+            return res
+
+    def scrape(self):
+        res = self.request('GET', '/api/admin/metrics')
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.content_type.startswith('text/plain; version=0.0.4'))
+        return dict(line.rsplit(' ', 1) for line in res.get_data(as_text=True).splitlines() if not line.startswith('#'))
+
+    def test_requests_by_endpoint_and_status(self):
+        self.request('GET', '/api/doctors')
+        self.request('GET', '/api/doctors')
+        self.request('GET', '/api/bookings/9999')
+        self.request('DELETE', '/api/doctors')
+        samples = self.scrape()
+        self.assertEqual(samples['http_requests_total{method="GET",endpoint="doctors.list_doctors",status="200"}'], '2')
+        self.assertEqual(samples['http_requests_total{method="GET",endpoint="bookings.get_booking",status="404"}'], '1')
+        self.assertEqual(samples['http_request_duration_seconds_count{method="GET",endpoint="doctors.list_doctors"}'], '2')
+        self.assertEqual(samples['http_request_duration_seconds_bucket{method="GET",endpoint="doctors.list_doctors",le="+Inf"}'], '2')
+        self.assertIn('http_requests_total{method="DELETE",endpoint="unmatched",status="405"}', samples)
+        # The scrape itself is the only request in flight
+        self.assertEqual(samples['http_requests_in_flight{method="GET"}'], '1')
+        self.assertEqual(samples['http_requests_in_flight{method="DELETE"}'], '0')
+
+    def test_sql_per_request(self):
+        booking = self.request('POST', '/api/bookings', json={'doctorName': 'กระดูก แข็งแรง', 'date': '2030-03-04', 'time': '09:00'})
+        self.assertEqual(booking.status_code, 201)
+        self.request('GET', '/')
+        samples = self.scrape()
+        key = 'method="POST",endpoint="bookings.create_booking"'
+        self.assertEqual(samples[f'http_request_sql_statements_count{{{key}}}'], '1')
+        self.assertGreater(float(samples[f'http_request_sql_statements_sum{{{key}}}']), 3)
+        self.assertGreater(float(samples[f'http_request_sql_seconds_sum{{{key}}}']), 0)
+        # Pages never open a connection
+        self.assertEqual(samples['http_request_sql_statements_bucket{method="GET",endpoint="pages.serve_page",le="0"}'], '1')
+
+    def test_streamed_response_is_recorded_when_closed(self):
+        self.request('POST', '/api/bookings', json={'doctorName': 'กระดูก แข็งแรง', 'date': '2030-03-04', 'time': '09:00'})
+        res = self.client.get('/api/bookings?stream=1')
+        key = 'method="GET",endpoint="bookings.list_bookings"'
+        samples = self.scrape()
+        self.assertEqual(samples['http_requests_in_flight{method="GET"}'], '2')
+        self.assertNotIn(f'http_request_duration_seconds_count{{{key}}}', samples)
+
+        res.close()
+        # Not interleaved with another request this time, as on a real server
+        res = self.client.get('/api/bookings?stream=1')
+        self.assertEqual(len(res.get_json()), 1)
+        res.close()
+        samples = self.scrape()
+        self.assertEqual(samples['http_requests_in_flight{method="GET"}'], '1')
+        self.assertEqual(samples[f'http_requests_total{{{key},status="200"}}'], '2')
+        self.assertGreaterEqual(float(samples[f'http_request_sql_statements_sum{{{key}}}']), 1)
+
+    def test_failing_view_counts_as_500(self):
+        with mock.patch.object(database.Connection, 'execute', side_effect=RuntimeError('boom')):
+            app.config['PROPAGATE_EXCEPTIONS'] = False
+            try:
+                self.assertEqual(self.request('GET', '/api/bookings/1').status_code, 500)
+            finally:
+                app.config['PROPAGATE_EXCEPTIONS'] = None
+        samples = self.scrape()
+        self.assertEqual(samples['http_requests_total{method="GET",endpoint="bookings.get_booking",status="500"}'], '1')
+        self.assertEqual(samples['http_requests_in_flight{method="GET"}'], '1')
+
+if __name__ == '__main__':
+    unittest.main()
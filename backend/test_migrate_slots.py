@@ -0,0 +1,58 @@
+import datetime
+import unittest
+from backend import database, migrate_slots, schedules
+from backend.testing import DatabaseTestCase
+
+
+class MigrateSlotsTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db = database.connect()
+        self.today = datetime.date(2026, 3, 2)  # a Monday
+
+    def tearDown(self):
+        self.db.close()
+
+    def count(self):
+        return self.db.execute("SELECT count(*) FROM appointment_slots").fetchone()[0]
+
+    def scheduled(self, days):
+        last = self.today + datetime.timedelta(days=days - 1)
+        return sum(len(schedules.expand(self.db, r[0], self.today, last)) for r in self.db.execute("SELECT id_doctor FROM doctors"))
+
+    def test_extend_is_idempotent_and_incremental(self):
+        week = self.scheduled(7)
+        created = migrate_slots.extend_horizon(self.db, days=7, today=self.today, batch_size=50)
+        self.assertEqual(created, week)
+        self.assertEqual(migrate_slots.extend_horizon(self.db, days=7, today=self.today), 0)
+
+        more = migrate_slots.extend_horizon(self.db, days=14, today=self.today)
+        self.assertEqual(more, self.scheduled(14) - week)
+        self.assertEqual(self.count(), created + more)
+
+    def test_slots_follow_the_rules_and_exceptions(self):
+        doctor_id = self.db.execute("INSERT INTO doctors (firstname, department, schedule) VALUES ('อังคาร', 'อายุรกรรม', 'อ-พฤ 10:00-14:00')").lastrowid
+        schedules.replace_rules_from_text(self.db, doctor_id, 'อ-พฤ 10:00-14:00')
+        self.db.execute("INSERT INTO schedule_exceptions (doctor_id, exception_date) VALUES (?, '2026-03-04')", (doctor_id,))
+        self.db.commit()
+        migrate_slots.extend_horizon(self.db, days=7, today=self.today)
+
+        rows = self.db.execute("SELECT slot_date, start_time FROM appointment_slots WHERE doctor_id = ? ORDER BY slot_date, start_time", (doctor_id,)).fetchall()
+        # Tuesday and Thursday only: Wednesday is off, 14:00 is closing time
+        self.assertEqual(sorted({r['slot_date'] for r in rows}), ['2026-03-03', '2026-03-05'])
+        self.assertEqual((rows[0]['start_time'], rows[-1]['start_time']), ('10:00', '13:30'))
+        self.assertEqual(len(rows), 2 * 8)
+
+    def test_prune_keeps_booked_slots(self):
+        created = migrate_slots.extend_horizon(self.db, days=7, today=self.today)
+        booked = self.db.execute("SELECT slot_id FROM appointment_slots ORDER BY slot_id LIMIT 1").fetchone()[0]
+        self.db.execute("INSERT INTO bookings (slot_id, id_users, booking_Status) VALUES (?, 1, 'cancelled')", (booked,))
+        self.db.commit()
+
+        pruned = migrate_slots.prune_past(self.db, today=self.today + datetime.timedelta(days=7))
+        self.assertEqual(pruned, created - 1)
+        self.assertEqual(self.count(), 1)
+        self.assertIsNotNone(self.db.execute("SELECT 1 FROM appointment_slots WHERE slot_id = ?", (booked,)).fetchone())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from unittest import mock
+from backend import database, schedules
+from backend.testing import DatabaseTestCase
+
+
+class MigrationsTestCase(DatabaseTestCase):
+    MIGRATE = False
+
+    def setUp(self):
+        super().setUp()
+        self.db = database.connect()
+
+    def tearDown(self):
+        self.db.close()
+
+    def tables(self):
+        return {r['name'] for r in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    def test_fresh_database(self):
+        self.assertEqual(database.migrate(self.db), len(database.MIGRATIONS))
+        self.assertEqual(database.schema_version(self.db), len(database.MIGRATIONS))
+        self.assertTrue({'bookings', 'users', 'notifications', 'appointment_slots'} <= self.tables())
+        self.assertEqual(self.db.execute("SELECT count(*) FROM doctors").fetchone()[0], 8)
+
+    def test_current_schema_costs_one_statement(self):
+        database.migrate(self.db)
+        statements = []
+        self.db.set_trace_callback(statements.append)
+        self.assertEqual(database.migrate(self.db), 0)
+        self.assertEqual(statements, ['PRAGMA user_version'])
+
+    def test_legacy_tables_keep_their_rows(self):
+        # Shapes that the old init_db answered with DROP TABLE
+        self.db.executescript("""
+            CREATE TABLE bookings (id INTEGER PRIMARY KEY AUTOINCREMENT, slot_id INTEGER, id_users INTEGER, booking_at TEXT, detail TEXT);
+            INSERT INTO bookings (id_users, booking_at, detail) VALUES (1, '2026-03-01 09:00', '{"patientName": "ก"}');
+            CREATE TABLE staff (id_admin INTEGER PRIMARY KEY AUTOINCREMENT, full_name TEXT, username TEXT);
+            INSERT INTO staff (full_name, username) VALUES ('ผู้ดูแล', 'admin');
+            CREATE TABLE users (ID_user INTEGER PRIMARY KEY AUTOINCREMENT, first_name TEXT, tel TEXT);
+            INSERT INTO users (first_name, tel) VALUES ('สมชาย', '0811111111');
+            CREATE TABLE doctors (id_doctor INTEGER PRIMARY KEY AUTOINCREMENT, firstname TEXT, lastname TEXT);
+            INSERT INTO doctors (firstname, lastname) VALUES ('เดิม', 'อยู่');
+        """)
+        database.migrate(self.db)
+
+        booking = self.db.execute("SELECT * FROM bookings").fetchone()
+        self.assertEqual((booking['patient_name'], booking['slot_date'], booking['start_time']), ('ก', '2026-03-01', '09:00'))
+        self.assertIsNone(booking['booking_Status'])
+        self.assertEqual(self.db.execute("SELECT full_name, role FROM staff").fetchone()['full_name'], 'ผู้ดูแล')
+        self.assertEqual(self.db.execute("SELECT first_name, last_login FROM users").fetchone()['first_name'], 'สมชาย')
+        doctors = self.db.execute("SELECT firstname, department, status FROM doctors").fetchall()
+        self.assertEqual([(d['firstname'], d['status']) for d in doctors], [('เดิม', 'ว่างวันนี้')])  # not re-seeded
+
+    def test_schedule_rules_do_not_follow_the_live_parser(self):
+        self.db.executescript("""
+            CREATE TABLE doctors (id_doctor INTEGER PRIMARY KEY AUTOINCREMENT, firstname TEXT, schedule TEXT);
+            INSERT INTO doctors (firstname, schedule) VALUES ('อ่านได้', 'จ,พ,ศ 09:00-12:00'), ('อ่านไม่ได้', 'นัดล่วงหน้า');
+        """)
+        with mock.patch.object(schedules, 'parse_schedule', side_effect=ValueError), \
+                mock.patch.object(schedules, 'FALLBACK_RULES', [(0b1, '10:00', '11:00')]):
+            database.migrate(self.db)
+        rules = self.db.execute("SELECT doctor_id, weekdays, start_time, end_time, slot_minutes, capacity FROM doctor_schedules ORDER BY id").fetchall()
+        self.assertEqual([tuple(r) for r in rules], [(1, 0b0010101, '09:00', '12:00', 30, 10),
+                                                     (2, 0b0011111, '09:00', '11:00', 30, 10),
+                                                     (2, 0b0011111, '13:00', '17:00', 30, 10)])
+
+    def test_failed_step_rolls_everything_back(self):
+        def broken(db):
+            raise RuntimeError('boom')
+
+        with mock.patch.object(database, 'MIGRATIONS', database.MIGRATIONS + [broken]):
+            with self.assertRaises(RuntimeError):
+                database.migrate(self.db)
+        self.assertEqual(database.schema_version(self.db), 0)
+        self.assertEqual(self.tables(), set())
+
+    def test_only_pending_steps_run(self):
+        database.migrate(self.db)
+        step = mock.Mock()
+        with mock.patch.object(database, 'MIGRATIONS', database.MIGRATIONS + [step]):
+            self.assertEqual(database.migrate(self.db), 1)
+        step.assert_called_once_with(self.db)
+        self.assertEqual(database.schema_version(self.db), len(database.MIGRATIONS) + 1)
+
+    def test_duplicate_identifiers_keep_a_plain_index(self):
+        database.migrate(self.db)
+        self.db.executescript("""
+            DROP INDEX ux_users_card_id;
+            INSERT INTO users (tel, email, card_id) VALUES ('0800000001', 'a@x', '1234567890123'), ('0800000002', 'b@x', '1234567890123'), ('', '', '');
+            PRAGMA user_version = 0;
+        """)
+        with self.assertLogs('backend.database', 'WARNING'):
+            database.migrate(self.db)
+        indexes = {r['name'] for r in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'users'")}
+        self.assertTrue({'ux_users_tel', 'ux_users_email', 'idx_users_card_id'} <= indexes)
+        self.assertNotIn('ux_users_card_id', indexes)
+        self.assertEqual(self.db.execute("SELECT count(*) FROM users WHERE tel IS NULL AND email IS NULL AND card_id IS NULL").fetchone()[0], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from datetime import datetime, timedelta
+from app import app
+from backend import database, logins, outbox
+from backend.events import hub
+from backend.testing import DatabaseTestCase
+
+
+class NotificationsTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+        self.context = app.app_context()
+        self.context.push()
+        self.client = app.test_client()
+
+        due = datetime.now() + timedelta(days=1, hours=2)
+        self.due_date, self.due_time = due.strftime('%Y-%m-%d'), due.strftime('%H:%M')
+
+        db = database.get_db()
+        db.execute("INSERT INTO users (ID_user, firstname, lastname, tel, hash_password) VALUES (1, 'ก', 'ข', '0811111111', 'pw')")
+        db.execute("INSERT INTO users (ID_user, firstname, lastname, tel, hash_password) VALUES (2, 'ค', 'ง', '0822222222', 'pw')")
+        cur = db.execute(
+            "INSERT INTO appointment_slots (doctor_id, slot_date, start_time, max_capacity, current_booking) VALUES (1, ?, ?, 10, 0)",
+            (self.due_date, self.due_time)
+        )
+        self.slot_id = cur.lastrowid
+        db.commit()
+
+    def tearDown(self):
+        self.context.pop()
+
+    def book(self, user_id):
+        res = self.client.post('/api/bookings', json={
+            'slot_id': self.slot_id, 'userId': user_id, 'date': self.due_date, 'time': self.due_time,
+            'departmentName': 'อายุรกรรม', 'patientName': f'ผู้ป่วย {user_id}'
+        })
+        self.assertEqual(res.status_code, 201)
+        return res.get_json()['id']
+
+    def test_events_are_written_by_mutations(self):
+        self.assertEqual(self.client.post('/api/login', json={'identifier': '0811111111', 'password': 'pw'}).status_code, 200)
+        logins.buffer.flush()  # the login is written behind
+        booking_id = self.book(1)
+        self.client.put(f'/api/bookings/{booking_id}', json={'time': '23:59'})
+        self.client.delete(f'/api/bookings/{booking_id}')
+
+        notes = self.client.get('/api/notifications?user_id=1').get_json()
+        self.assertEqual([n['title'] for n in notes], ['เข้าสู่ระบบสำเร็จ', 'จองคิวสำเร็จ', 'เลื่อนวันจองสำเร็จ', 'ยกเลิกสำเร็จ'])
+        self.assertTrue(all(n['user_id'] == 1 for n in notes))
+        ids = [n['id'] for n in notes]
+        self.assertEqual(ids, sorted(ids))
+
+        newer = self.client.get(f'/api/notifications?user_id=1&after={ids[1]}').get_json()
+        self.assertEqual([n['id'] for n in newer], ids[2:])
+
+    def test_cancelling_twice_notifies_once(self):
+        booking_id = self.book(1)
+        sub = hub.subscribe(user_id=1)
+        self.addCleanup(hub.unsubscribe, sub)
+        for _ in range(2):
+            res = self.client.delete(f'/api/bookings/{booking_id}')
+            self.assertEqual((res.status_code, res.get_json()), (200, {'status': 'cancelled'}))
+        self.assertEqual(self.client.delete('/api/bookings/999').status_code, 404)
+
+        notes = self.client.get('/api/notifications?user_id=1').get_json()
+        self.assertEqual([n['title'] for n in notes], ['จองคิวสำเร็จ', 'ยกเลิกสำเร็จ'])
+        self.assertEqual(sub.get(0).event, 'booking.cancelled')
+        self.assertIsNone(sub.get(0))
+        slot = database.get_db().execute("SELECT current_booking FROM appointment_slots WHERE slot_id = ?", (self.slot_id,)).fetchone()
+        self.assertEqual(slot['current_booking'], 0)
+
+    def test_reminders_are_derived_per_user(self):
+        self.book(2)
+        notes = self.client.get('/api/notifications?user_id=2').get_json()
+        self.assertEqual([n['title'] for n in notes], ['จองคิวสำเร็จ', 'เตือนนัดหมายพรุ่งนี้'])
+        self.assertEqual(self.client.get('/api/notifications?user_id=1').get_json(), [])
+
+    def test_unscoped_returns_everyone(self):
+        self.book(1)
+        self.book(2)
+        notes = self.client.get('/api/notifications').get_json()
+        self.assertEqual(sorted({n['user_id'] for n in notes}), [1, 2])
+        self.assertEqual(len(notes), 4)
+
+    def test_invalid_user_id(self):
+        self.assertEqual(self.client.get('/api/notifications?user_id=x').status_code, 400)
+
+    def test_prune_in_batches(self):
+        db = database.get_db()
+        old = (datetime.now() - timedelta(days=outbox.RETENTION_DAYS + 1)).isoformat()
+        db.executemany("INSERT INTO notifications (user_id, title, created_at) VALUES (1, 'old', ?)", [(old,)] * 25)
+        self.book(1)
+        self.assertEqual(outbox.prune(db, batch_size=10), 25)
+        self.assertEqual(db.execute("SELECT title FROM notifications").fetchall()[0]['title'], 'จองคิวสำเร็จ')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import gzip
+import os
+import unittest
+from unittest import mock
+from app import app
+from backend.routes import pages
+
+
+class PagesTestCase(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        self.client = app.test_client()
+        with open(os.path.join(pages.PAGE_DIR, 'admin.html'), 'rb') as f:
+            self.admin = f.read()
+
+    def test_admin_aliases_and_encodings(self):
+        for url in ('/admin', '/admin/', '/admin.html'):
+            res = self.client.get(url)
+            self.assertEqual(res.data, self.admin)
+            self.assertNotIn('Content-Encoding', res.headers)
+
+        res = self.client.get('/admin', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.data), self.admin)
+        self.assertIn('Accept-Encoding', res.headers['Vary'])
+        self.assertNotEqual(res.headers['ETag'], self.client.get('/admin').headers['ETag'])
+
+    def test_revalidation(self):
+        etag = self.client.get('/booking.html').headers['ETag']
+        res = self.client.get('/booking.html', headers={'If-None-Match': etag})
+        self.assertEqual((res.status_code, res.data), (304, b''))
+        self.assertIn('max-age', res.headers['Cache-Control'])
+
+    def test_fallback_stays_in_memory(self):
+        with mock.patch.object(pages.os, 'stat', side_effect=AssertionError), \
+                mock.patch.object(pages.os, 'walk', side_effect=AssertionError):
+            res = self.client.get('/some/client/route')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.headers['ETag'], self.client.get('/').headers['ETag'])
+
+    def test_debug_rescans_at_most_every_few_seconds(self):
+        app.debug = True
+        try:
+            pages.index.refreshed_at = 0.0
+            with mock.patch.object(pages.os, 'walk', wraps=os.walk) as walk:
+                for _ in range(5):
+                    self.assertEqual(self.client.get('/booking.html').status_code, 200)
+            self.assertEqual(walk.call_count, 1)
+        finally:
+            app.debug = False
+
+if __name__ == '__main__':
+    unittest.main()
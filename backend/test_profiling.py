@@ -0,0 +1,81 @@
+import os
+import pstats
+import unittest
+from unittest import mock
+from app import create_app
+from backend import database, profiling
+from backend.testing import DatabaseTestCase
+
+
+class ProfilingTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile_dir = os.path.join(self.tmpdir, 'profiles')
+        patches = [mock.patch.object(profiling, 'PROFILE_TOKEN', 'secret'),
+                   mock.patch.object(profiling, 'PROFILE_DIR', self.profile_dir)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+
+    def profiles(self):
+        return self.client.get('/api/admin/profiles').get_json()['profiles']
+
+    def test_unflagged_requests_are_not_profiled(self):
+        for headers in ({}, {'X-Profile': 'wrong'}):
+            res = self.client.get('/api/doctors', headers=headers)
+            self.assertEqual(res.status_code, 200)
+            self.assertNotIn('X-Profile-Id', res.headers)
+        self.client.get('/api/doctors?profile=wrong')
+        self.assertEqual(self.profiles(), [])
+        self.assertFalse(os.path.exists(self.profile_dir))
+
+    def test_flagged_request_is_profiled_and_downloadable(self):
+        res = self.client.get('/api/bookings/1', headers={'X-Profile': 'secret'})
+        self.assertEqual(res.status_code, 404)
+        profile_id = res.headers['X-Profile-Id']
+
+        [profile] = self.profiles()
+        self.assertEqual((profile['id'], profile['method'], profile['path'], profile['status']),
+                         (profile_id, 'GET', '/api/bookings/1', 404))
+
+        prof = self.client.get(profile['files']['prof'])
+        self.assertEqual(prof.status_code, 200)
+        stats = pstats.Stats(os.path.join(self.profile_dir, profile_id + '.prof'))
+        self.assertTrue(any(name == 'get_booking' for _, _, name in stats.stats))
+
+        folded = self.client.get(profile['files']['folded']).get_data(as_text=True).splitlines()
+        self.assertTrue(folded)
+        stack, micros = folded[0].rsplit(' ', 1)
+        self.assertGreater(int(micros), 0)
+        self.assertTrue(any('get_booking (bookings.py:' in line for line in folded))
+
+    def test_query_flag(self):
+        res = self.client.get('/api/doctors?profile=secret')
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('X-Profile-Id', res.headers)
+
+    def test_directory_is_bounded(self):
+        with mock.patch.object(profiling, 'PROFILE_KEEP', 2):
+            ids = [self.client.get('/api/doctors', headers={'X-Profile': 'secret'}).headers['X-Profile-Id'] for _ in range(3)]
+        self.assertEqual([p['id'] for p in self.profiles()], ids[:0:-1])
+        self.assertEqual(len(os.listdir(self.profile_dir)), 2 * 3)
+
+    def test_unknown_or_malformed_profile_is_404(self):
+        self.assertEqual(self.client.get('/api/admin/profiles/20300101T000000-000000-1.prof').status_code, 404)
+        self.assertEqual(self.client.get('/api/admin/profiles/bookings.prof').status_code, 404)
+        self.assertIsNone(profiling.profile_path('../bookings', 'prof'))
+
+    def test_nothing_installed_without_token(self):
+        with mock.patch.object(profiling, 'PROFILE_TOKEN', ''):
+            app = create_app()
+            self.assertFalse(app.test_client().get('/api/admin/profiles').get_json()['enabled'])
+        wrapper = app.wsgi_app
+        while hasattr(wrapper, 'wsgi_app'):
+            self.assertNotIsInstance(wrapper, profiling.ProfilingMiddleware)
+            wrapper = wrapper.wsgi_app
+
+if __name__ == '__main__':
+    unittest.main()
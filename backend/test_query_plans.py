@@ -0,0 +1,139 @@
+import ast
+import glob
+import os
+import re
+import unittest
+from unittest import mock
+from app import app
+from backend import database
+from backend.testing import DatabaseTestCase
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+ROUTES_DIR = os.path.join(BACKEND_DIR, 'routes')
+# Modules outside routes/ whose queries run on every request
+REQUEST_MODULES = [os.path.join(BACKEND_DIR, 'schedules.py')]
+SQL_START = re.compile(r'^\s*(SELECT|UPDATE|DELETE|INSERT|WITH)\s+\S', re.IGNORECASE)
+SCAN = re.compile(r'\bSCAN (\w+)')
+
+# Statements that read a whole table on purpose (small catalogs and admin listings).
+# Anything else that plans a SCAN is a regression.
+ALLOWED_SCANS = {
+    'SELECT * FROM staff ORDER BY id_admin DESC',
+    'SELECT * FROM doctors',
+    'SELECT * FROM departments',
+    'SELECT department_id FROM departments WHERE name LIKE ?',
+    # An unfiltered keyset page walks the rowid backwards and stops after LIMIT
+    # rows, so it reads one page however large the table is
+    'SELECT * FROM bookings ORDER BY id DESC LIMIT ?',
+}
+
+# Requests whose SQL is put together at run time: list_bookings filters and
+# cursor, the SET lists of the update routes and the IN (...) lists of
+# schedules.load_window. Every statement they run is planned with the
+# parameters it ran with.
+BUILT_REQUESTS = [
+    ('GET', '/api/bookings?user_id=1&limit=20', None),
+    ('GET', '/api/bookings?user_id=1&status=รอรับบริการ,booked', None),
+    ('GET', '/api/bookings?status=รอรับบริการ&date_from=2026-03-01&date_to=2026-03-01&limit=20', None),
+    ('GET', '/api/bookings?doctor_id=1&limit=20', None),
+    ('GET', '/api/bookings?doctor_name=D1&limit=20', None),
+    ('GET', '/api/bookings?limit=20', None),
+    ('GET', '/api/bookings?limit=1&after={cursor}', None),
+    ('PUT', '/api/bookings/1', {'status': 'arrived', 'patientName': 'C'}),
+    ('PUT', '/api/admin/staff/1', {'firstname': 'C', 'role': 'admin'}),
+    ('PUT', '/api/admin/doctors/1', {'name': 'C D', 'schedule': 'จ-ศ 09:00-12:00'}),
+    ('GET', '/api/availability?department=med&limit=5', None),
+    ('GET', '/api/doctors/1/slots?from=2026-03-01&to=2026-03-07', None),
+]
+
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+
+def route_statements():
+    """
+    Yields (location, sql) for every SQL statement written out as a string
+    literal in backend/routes and REQUEST_MODULES. Statements built with
+    f-strings are left to BUILT_REQUESTS.
+    """
+    for path in sorted(glob.glob(os.path.join(ROUTES_DIR, '*.py'))) + REQUEST_MODULES:
+        tree = ast.parse(open(path, encoding='utf-8').read())
+        in_fstring = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.JoinedStr):
+                in_fstring.update(id(v) for v in node.values)
+        for node in ast.walk(tree):
+            if (isinstance(node, ast.Constant) and isinstance(node.value, str)
+                    and id(node) not in in_fstring and SQL_START.match(node.value)):
+                yield f"{os.path.basename(path)}:{node.lineno}", node.value
+
+
+class QueryPlanTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.context = app.app_context()
+        self.context.push()
+        self.db = database.get_db()
+        self.db.execute("INSERT INTO users (firstname, lastname, tel, email, card_id, hash_password) VALUES ('A', 'B', '0800000000', 'a@b.c', '1234567890123', 'x')")
+        self.db.execute("INSERT INTO appointment_slots (doctor_id, department_id, slot_date, start_time, end_time, max_capacity) VALUES (1, 1, '2026-03-01', '09:00', '09:30', 5)")
+        self.db.execute("INSERT INTO bookings (slot_id, id_users, booking_at, booking_Status, detail) VALUES (1, 1, '2026-03-01 09:00', 'รอรับบริการ', '{}')")
+        self.db.execute("INSERT INTO bookings (slot_id, id_users, booking_at, booking_Status, detail) VALUES (1, 1, '2026-03-01 09:30', 'รอรับบริการ', '{}')")
+        self.db.execute("INSERT INTO staff (firstname, username, hash_password) VALUES ('A', 'admin', 'x')")
+        self.db.commit()
+
+    def tearDown(self):
+        self.context.pop()
+
+    def test_statements_are_collected(self):
+        self.assertGreater(len(list(route_statements())), 20)
+
+    def scans(self, sql, params):
+        plan = self.db.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+        return [r['detail'] for r in plan if SCAN.search(r['detail']) and 'CONSTANT ROW' not in r['detail']]
+
+    def test_hot_queries_do_not_scan(self):
+        failures = []
+        for where, sql in route_statements():
+            scans = self.scans(sql, [None] * sql.count('?'))
+            if scans and normalize(sql) not in ALLOWED_SCANS:
+                failures.append(f"{where}: {normalize(sql)}\n    -> {'; '.join(scans)}")
+        self.assertFalse(failures, 'Queries fell back to a table scan:\n' + '\n'.join(failures))
+
+    def built_statements(self):
+        """{normalized sql: (request, params)} for everything BUILT_REQUESTS executes."""
+        ran = {}
+        execute, executemany = database.Connection.execute, database.Connection.executemany
+
+        def record(request, sql, params):
+            if SQL_START.match(sql):
+                ran.setdefault(normalize(sql), (request, sql, params))
+
+        client = app.test_client()
+        cursor = client.get('/api/bookings?limit=1').headers['X-Next-Cursor']
+        for method, url, body in BUILT_REQUESTS:
+            request = f'{method} {url}'
+            with mock.patch.object(database.Connection, 'execute', autospec=True,
+                                   side_effect=lambda conn, sql, params=(): record(request, sql, params) or execute(conn, sql, params)), \
+                    mock.patch.object(database.Connection, 'executemany', autospec=True,
+                                      side_effect=lambda conn, sql, rows: record(request, sql, next(iter(list(rows)), ())) or executemany(conn, sql, rows)):
+                res = client.open(url.format(cursor=cursor), method=method, json=body)
+            self.assertLess(res.status_code, 400, request)
+        return ran
+
+    def test_built_queries_do_not_scan(self):
+        with mock.patch.object(database, 'METRICS_ENABLED', True):
+            # Pooled connections have to come from the recording Connection class
+            database.close_pools()
+            ran = self.built_statements()
+        database.close_pools()
+        self.assertTrue(any('IN (?,' in sql for sql in ran), 'load_window was not reached')
+        failures = []
+        for key, (request, sql, params) in ran.items():
+            scans = self.scans(sql, params)
+            if scans and key not in ALLOWED_SCANS:
+                failures.append(f"{request}: {key}\n    -> {'; '.join(scans)}")
+        self.assertFalse(failures, 'Built queries fell back to a table scan:\n' + '\n'.join(failures))
+
+if __name__ == '__main__':
+    unittest.main()
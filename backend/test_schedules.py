@@ -0,0 +1,126 @@
+import unittest
+from datetime import date
+from app import app
+from backend import database, schedules
+from backend.testing import DatabaseTestCase
+
+
+class ParseScheduleTestCase(unittest.TestCase):
+    def test_seeded_formats(self):
+        self.assertEqual(schedules.parse_schedule('จ-ศ 09:00-16:00'), [(0b0011111, '09:00', '16:00')])
+        self.assertEqual(schedules.parse_schedule('อ-พฤ 10:00-14:00'), [(0b0001110, '10:00', '14:00')])
+        self.assertEqual(schedules.parse_schedule('จ,พ,ศ 09:00-12:00'), [(0b0010101, '09:00', '12:00')])
+        self.assertEqual(schedules.parse_schedule('พฤ 09:00-16:00'), [(0b0001000, '09:00', '16:00')])
+        self.assertEqual(schedules.parse_schedule('ทุกวัน 08:00-20:00'), [(0b1111111, '08:00', '20:00')])
+
+    def test_several_segments_and_wraparound(self):
+        self.assertEqual(schedules.parse_schedule('จ-ศ 09:00-12:00, ส 9.00-11.00'),
+                         [(0b0011111, '09:00', '12:00'), (0b0100000, '09:00', '11:00')])
+        self.assertEqual(schedules.parse_schedule('ส-จ 10:00-12:00'), [(0b1100001, '10:00', '12:00')])
+
+    def test_unreadable(self):
+        for text in ('', 'ตามนัด', 'จ-ศ 16:00-09:00', 'xyz 09:00-10:00'):
+            with self.assertRaises(ValueError):
+                schedules.parse_schedule(text)
+        self.assertEqual(schedules.rules_from_text('ตามนัด'), schedules.FALLBACK_RULES)
+        times = [t for days, start, end in schedules.FALLBACK_RULES
+                 for t, _ in schedules.rule_times({'start_time': start, 'end_time': end, 'slot_minutes': None})]
+        self.assertEqual((len(times), '11:00' in times, '12:30' in times), (12, False, False))
+
+
+class ExpandTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+        self.context = app.app_context()
+        self.context.push()
+        self.db = database.get_db()
+        # Doctor 5 is seeded as 'จ,พ,ศ 09:00-12:00'
+        self.doctor_id = 5
+        self.client = app.test_client()
+
+    def tearDown(self):
+        self.context.pop()
+
+    def test_window_follows_rules_and_exceptions(self):
+        self.db.execute("INSERT INTO schedule_exceptions (doctor_id, exception_date) VALUES (?, '2026-03-04')", (self.doctor_id,))
+        slots = schedules.expand(self.db, self.doctor_id, date(2026, 3, 2), date(2026, 3, 8))
+        self.assertEqual(sorted({s['slot_date'] for s in slots}), ['2026-03-02', '2026-03-06'])  # Mon, Fri; Wed is off
+        self.assertEqual([s['start_time'] for s in slots[:6]], ['09:00', '09:30', '10:00', '10:30', '11:00', '11:30'])
+        self.assertTrue(all(s['slot_id'] is None and s['max_capacity'] == schedules.DEFAULT_CAPACITY for s in slots))
+
+    def test_only_booked_slots_are_stored(self):
+        res = self.client.get(f'/api/doctors/{self.doctor_id}/slots?date=2026-03-02')
+        self.assertEqual(len(res.get_json()), 6)
+        self.assertEqual(self.db.execute("SELECT count(*) FROM appointment_slots").fetchone()[0], 0)
+
+        booked = self.client.post('/api/bookings', json={
+            'doctorName': 'กระดูก แข็งแรง', 'date': '2026-03-02', 'time': '10:30', 'patientName': 'ก'
+        })
+        self.assertEqual(booked.status_code, 201)
+        stored = self.db.execute("SELECT slot_date, start_time, end_time, current_booking FROM appointment_slots").fetchall()
+        self.assertEqual([tuple(r) for r in stored], [('2026-03-02', '10:30', '11:00', 1)])
+
+        slots = self.client.get(f'/api/doctors/{self.doctor_id}/slots?date=2026-03-02').get_json()
+        self.assertEqual(len(slots), 6)
+        self.assertEqual([s['current_booking'] for s in slots if s['slot_id']], [1])
+
+        # Outside the schedule (Tuesday) nothing is created
+        off = self.client.post('/api/bookings', json={'doctorName': 'กระดูก แข็งแรง', 'date': '2026-03-03', 'time': '10:30'})
+        self.assertEqual(off.status_code, 400)
+        self.assertEqual(self.db.execute("SELECT count(*) FROM appointment_slots").fetchone()[0], 1)
+
+    def test_admin_replaces_rules(self):
+        res = self.client.put(f'/api/admin/doctors/{self.doctor_id}/schedule', json={
+            'rules': [{'days': [1], 'start_time': '13:00', 'end_time': '14:00', 'slot_minutes': 20, 'capacity': 3}],
+            'exceptions': [{'date': '2026-03-10', 'reason': 'ประชุม'}]
+        })
+        self.assertEqual(res.status_code, 200)
+        slots = self.client.get(f'/api/doctors/{self.doctor_id}/slots?from=2026-03-02&to=2026-03-10').get_json()
+        self.assertEqual([(s['slot_date'], s['start_time'], s['max_capacity']) for s in slots],
+                         [('2026-03-03', '13:00', 3), ('2026-03-03', '13:20', 3), ('2026-03-03', '13:40', 3)])
+        bad = self.client.put(f'/api/admin/doctors/{self.doctor_id}/schedule', json={'rules': [{'days': [1], 'start_time': '14:00', 'end_time': '13:00'}]})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_bulk_create_reports_conflicts(self):
+        self.client.post('/api/bookings', json={'doctorName': 'กระดูก แข็งแรง', 'date': '2026-03-02', 'time': '09:00'})
+        res = self.client.post(f'/api/doctors/{self.doctor_id}/slots/bulk', json={
+            'date_from': '2026-03-02', 'date_to': '2026-03-08', 'days': [0, 1, 2, 3, 4],
+            'template': {'start_time': '09:00', 'end_time': '10:00', 'slot_minutes': 30}, 'capacity': 4
+        })
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.get_json(), {'created': 9, 'skipped': 1, 'conflicts': [{'date': '2026-03-02', 'start_time': '09:00'}]})
+        self.assertEqual(self.db.execute("SELECT count(*) FROM appointment_slots WHERE max_capacity = 4").fetchone()[0], 9)
+
+        again = self.client.post(f'/api/doctors/{self.doctor_id}/slots/bulk', json={
+            'date': '2026-03-03', 'times': [{'start_time': '9:00', 'end_time': '9:30'}], 'capacity': 4
+        })
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.get_json()['skipped'], 1)
+
+        bad = self.client.post(f'/api/doctors/{self.doctor_id}/slots/bulk', json={'date': '2026-03-03', 'times': [{'start_time': '10:00', 'end_time': '09:00'}]})
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(self.client.post('/api/doctors/9999/slots/bulk', json={'date': '2026-03-03', 'times': [{'start_time': '09:00', 'end_time': '09:30'}]}).status_code, 404)
+
+    def test_availability_across_department(self):
+        # Doctors 1 (จ-ศ 09:00-16:00) and 2 (อ-พฤ 10:00-14:00) are 'med'; 2030-03-05 is a Tuesday
+        self.db.execute("INSERT INTO appointment_slots (doctor_id, department_id, slot_date, start_time, end_time, max_capacity, current_booking) VALUES (1, 1, '2030-03-05', '09:00', '09:30', 2, 2)")
+        self.db.commit()
+        res = self.client.get('/api/availability?department=med&from=2030-03-05&to=2030-03-06&limit=4')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([(s['doctor_id'], s['slot_date'], s['start_time']) for s in res.get_json()],
+                         [(1, '2030-03-05', '09:30'), (1, '2030-03-05', '10:00'), (2, '2030-03-05', '10:00'), (1, '2030-03-05', '10:30')])
+        self.assertEqual(res.get_json()[2]['doctor_name'], 'วารี รักษา')
+
+        later = schedules.earliest_open(self.db, [1, 2], date(2030, 3, 5), date(2030, 3, 6), after='2030-03-05 15:00', limit=3)
+        self.assertEqual([(s['slot_date'], s['start_time']) for s in later], [('2030-03-05', '15:30'), ('2030-03-06', '09:00'), ('2030-03-06', '09:30')])
+
+        self.assertEqual(self.client.get('/api/availability?from=2020-01-01&to=2020-01-31').get_json(), [])
+        self.assertEqual(self.client.get('/api/availability?limit=0').status_code, 400)
+
+    def test_window_is_bounded(self):
+        self.assertEqual(self.client.get(f'/api/doctors/{self.doctor_id}/slots?from=2026-01-01&to=2026-12-31').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/doctors/{self.doctor_id}/slots?date=03/02/2026').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
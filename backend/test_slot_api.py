@@ -1,31 +1,24 @@
-import sqlite3
 import unittest
-import json
-import os
-from app import app, init_db, get_db
+from app import app
+from backend import database
+from backend.testing import DatabaseTestCase
 
-class SlotApiTestCase(unittest.TestCase):
+class SlotApiTestCase(DatabaseTestCase):
     def setUp(self):
+        super().setUp()
         app.config['TESTING'] = True
         self.context = app.app_context()
         self.context.push()
-        init_db()
         self.client = app.test_client()
 
-        # Create a dummy doctor for testing
-        db = get_db()
-        # Check if doctor exists, if not create one
+        # A doctor without schedule rules, so only created slots are listed
+        db = database.get_db()
         cur = db.execute("INSERT INTO doctors (firstname, lastname, department, doctor_id) VALUES (?, ?, ?, ?)", 
                          ('Test', 'Doc', 'med', 'T001'))
         self.doctor_id = cur.lastrowid
         db.commit()
 
     def tearDown(self):
-        # Clean up
-        db = get_db()
-        db.execute("DELETE FROM doctors WHERE id_doctor = ?", (self.doctor_id,))
-        db.execute("DELETE FROM appointment_slots WHERE doctor_id = ?", (self.doctor_id,))
-        db.commit()
         self.context.pop()
 
     def test_create_and_list_slots(self):
@@ -39,25 +32,31 @@ class SlotApiTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 201)
         data = res.get_json()
         slot_id = data['slot_id']
-        print(f"\n[TEST] Created slot_id: {slot_id}")
 
         # 2. List Slots
-        res = self.client.get(f'/api/doctors/{self.doctor_id}/slots')
+        res = self.client.get(f'/api/doctors/{self.doctor_id}/slots?date=2026-03-01')
         self.assertEqual(res.status_code, 200)
         slots = res.get_json()
         self.assertEqual(len(slots), 1)
         self.assertEqual(slots[0]['slot_id'], slot_id)
-        print(f"[TEST] Slots found: {slots}")
 
         # 3. Delete Slot
-        res = self.client.delete(f'/api/slots/{slot_id}')
+        res = self.client.delete(f'/api/bookings/slots/{slot_id}')
         self.assertEqual(res.status_code, 200)
         
         # Verify deletion
-        res = self.client.get(f'/api/doctors/{self.doctor_id}/slots')
+        res = self.client.get(f'/api/doctors/{self.doctor_id}/slots?date=2026-03-01')
         slots = res.get_json()
         self.assertEqual(len(slots), 0)
-        print("[TEST] Slot deleted successfully")
+
+    def test_duplicate_slot_is_a_conflict(self):
+        body = {'date': '2026-03-01', 'start_time': '09:00', 'end_time': '10:00', 'capacity': 5}
+        first = self.client.post(f'/api/doctors/{self.doctor_id}/slots', json=body)
+        self.assertEqual(first.status_code, 201)
+        again = self.client.post(f'/api/doctors/{self.doctor_id}/slots', json=body)
+        self.assertEqual(again.status_code, 409)
+        self.assertEqual(again.get_json()['slot_id'], first.get_json()['slot_id'])
+        self.assertEqual(len(self.client.get(f'/api/doctors/{self.doctor_id}/slots?date=2026-03-01').get_json()), 1)
 
 if __name__ == '__main__':
     unittest.main()
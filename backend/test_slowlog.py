@@ -0,0 +1,68 @@
+import json
+import os
+import unittest
+from unittest import mock
+from app import app
+from backend import database, slowlog
+from backend.testing import DatabaseTestCase
+
+
+class SlowQueryLogTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        app.config['TESTING'] = True
+        self.log_path = os.path.join(self.tmpdir, 'logs', 'slow.log')
+        patches = [mock.patch.object(slowlog, 'LOG_PATH', self.log_path),
+                   # Every statement counts as slow
+                   mock.patch.object(slowlog, 'THRESHOLD', 0.0)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        slowlog.slow_log.clear()
+        self.addCleanup(slowlog.slow_log.clear)
+        self.client = app.test_client()
+
+    def statement(self, fragment):
+        found = [s for s in self.client.get('/api/admin/slow-queries?limit=500').get_json()['statements'] if fragment in s['sql']]
+        self.assertEqual(len(found), 1, fragment)
+        return found[0]
+
+    def test_select_with_plan_rows_and_route(self):
+        self.client.post('/api/bookings', json={'doctorName': 'กระดูก แข็งแรง', 'date': '2030-03-04', 'time': '09:00'})
+        self.client.get('/api/bookings/1')
+        self.client.get('/api/bookings/1')
+
+        stats = self.statement('SELECT row_version FROM bookings WHERE id = ?')
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['rows'], 1)
+        self.assertEqual(stats['params'], '(int)')
+        self.assertEqual(stats['routes'], {'GET bookings.get_booking': 2})
+        self.assertTrue(any('USING INTEGER PRIMARY KEY' in line for line in stats['plan']), stats['plan'])
+
+        update = self.statement('UPDATE appointment_slots SET current_booking')
+        self.assertEqual(update['rows'], 1)
+        self.assertEqual(update['routes'], {'POST bookings.create_booking': 1})
+
+    def test_top_offenders_by_total_time(self):
+        self.client.get('/api/doctors')
+        statements = self.client.get('/api/admin/slow-queries?limit=3').get_json()['statements']
+        self.assertLessEqual(len(statements), 3)
+        totals = [s['total_ms'] for s in statements]
+        self.assertEqual(totals, sorted(totals, reverse=True))
+
+    def test_file_gets_one_json_line_per_statement(self):
+        self.client.get('/api/bookings/987654')
+        with open(self.log_path, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        entry = next(e for e in entries if 'FROM bookings WHERE id = ?' in e['sql'])
+        self.assertEqual((entry['route'], entry['rows'], entry['params']), ('GET bookings.get_booking', 0, '(int)'))
+        self.assertNotIn('987654', json.dumps(entry))
+
+    def test_fast_statements_are_not_logged(self):
+        with mock.patch.object(slowlog, 'THRESHOLD', 60.0):
+            self.client.get('/api/doctors')
+        self.assertEqual(self.client.get('/api/admin/slow-queries').get_json()['statements'], [])
+        self.assertFalse(os.path.exists(self.log_path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,30 @@
+"""Shared fixture for the backend tests."""
+import os
+import shutil
+import tempfile
+import unittest
+from backend import database
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Runs each test against a throwaway database: database.DB_PATH points at
+    bookings.db in self.tmpdir, migrated unless MIGRATE is False. Afterwards
+    the pooled connections to it are closed, DB_PATH is put back and the
+    directory removed. These are cleanups, so they run after a subclass's
+    tearDown and even when its setUp fails half way.
+    """
+    MIGRATE = True
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        self.addCleanup(setattr, database, 'DB_PATH', database.DB_PATH)
+        self.addCleanup(database.close_pools)
+        database.DB_PATH = os.path.join(self.tmpdir, 'bookings.db')
+        if self.MIGRATE:
+            db = database.connect()
+            try:
+                database.migrate(db)
+            finally:
+                db.close()
@@ -0,0 +1,73 @@
+"""Shared helpers for the benchmark scripts: build a throwaway database and seed it."""
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend import database  # noqa: E402
+
+STATUSES = ['รอรับบริการ', 'arrived', 'completed', 'cancelled']
+
+
+def use_database(path=None):
+    """Points the app at a database file (a fresh temp file by default) and returns its path."""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bookings.db')
+    database.DB_PATH = path
+    return path
+
+
+def get_app():
+    from backend.app import app
+    app.config['TESTING'] = True
+    return app
+
+
+def init_schema(app):
+    with app.app_context():
+        database.init_db()
+
+
+def seed_bookings(app, count, users=1000, start=None, batch=10000, seed=1):
+    """Inserts `count` bookings spread over `users` users and ~one year of dates."""
+    rnd = random.Random(seed)
+    start = start or date.today() - timedelta(days=300)
+    with app.app_context():
+        db = database.get_db()
+        rows = []
+        for i in range(count):
+            day = start + timedelta(days=rnd.randrange(365))
+            at = f"{day.isoformat()} {rnd.choice(['09:00', '09:30', '10:00', '13:00', '14:30'])}"
+            created = datetime.combine(day - timedelta(days=rnd.randrange(1, 30)), datetime.min.time()).isoformat()
+            detail = json.dumps({
+                'symptoms': 'ไข้ ไอ เจ็บคอ',
+                'doctorName': 'สมชาย ใจดี',
+                'departmentName': 'อายุรกรรม',
+                'patientName': f'ผู้ป่วย {i % users}',
+            }, ensure_ascii=False)
+            rows.append((None, rnd.randrange(1, users + 1), at, rnd.choice(STATUSES), detail,
+                         str(1000000000000 + i), created, created))
+            if len(rows) >= batch:
+                db.executemany("INSERT INTO bookings (slot_id, id_users, booking_at, booking_Status, detail, qr_code, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?)", rows)
+                rows = []
+        if rows:
+            db.executemany("INSERT INTO bookings (slot_id, id_users, booking_at, booking_Status, detail, qr_code, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?)", rows)
+        db.commit()
+        database.backfill_booking_columns(db)
+        database.backfill_booking_times(db)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
@@ -0,0 +1,94 @@
+"""
+Requests/sec of GET /api/doctors and POST /api/bookings with three connection
+setups, each in its own process on its own fresh database:
+
+    baseline  new connection per request, SQLite defaults (rollback journal)
+    pragmas   new connection per request, WAL and the tuned PRAGMAS
+    pool      pooled connections (database.ConnectionPool) with the tuned PRAGMAS
+
+    python benchmarks/bench_connections.py --seconds 5 --threads 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import _common
+from backend import database
+
+MODES = ('baseline', 'pragmas', 'pool')
+
+
+def hammer(app, seconds, threads, request):
+    counts = [0] * threads
+    errors = []
+    deadline = time.perf_counter() + seconds
+
+    def loop(i):
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            status = request(client)
+            if status >= 500:
+                errors.append(status)
+            counts[i] += 1
+
+    workers = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sum(counts) / seconds, len(errors)
+
+
+def run_worker(mode, seconds, threads):
+    if mode == 'baseline':
+        database.PRAGMAS = ()
+    database.POOL_ENABLED = mode == 'pool'
+    _common.use_database()
+    app = _common.get_app()
+    _common.init_schema(app)
+    with app.app_context():
+        db = database.get_db()
+        slot_id = db.execute(
+            "INSERT INTO appointment_slots (doctor_id, slot_date, start_time, max_capacity, current_booking) VALUES (1, '2030-01-01', '09:00', 100000000, 0)"
+        ).lastrowid
+        db.commit()
+
+    body = {'slot_id': slot_id, 'date': '2030-01-01', 'time': '09:00', 'departmentName': 'อายุรกรรม', 'patientName': 'bench'}
+    doctors_rps, doctors_err = hammer(app, seconds, threads, lambda c: c.get('/api/doctors').status_code)
+    bookings_rps, bookings_err = hammer(app, seconds, threads, lambda c: c.post('/api/bookings', json=body).status_code)
+    print(json.dumps({
+        'mode': mode,
+        'doctors_rps': round(doctors_rps, 1),
+        'bookings_rps': round(bookings_rps, 1),
+        'errors': doctors_err + bookings_err,
+        'pool': database.pool_stats(),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.seconds, args.threads)
+        return
+
+    results = []
+    for mode in MODES:
+        out = subprocess.check_output([
+            sys.executable, os.path.abspath(__file__), '--worker', mode,
+            '--seconds', str(args.seconds), '--threads', str(args.threads),
+        ])
+        results.append(json.loads(out.decode().strip().splitlines()[-1]))
+    print(json.dumps({'benchmark': 'connections', 'threads': args.threads, 'results': results}, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
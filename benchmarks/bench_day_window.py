@@ -0,0 +1,67 @@
+"""
+Cost of the day-window queries (today's appointments, tomorrow's reminders)
+on the indexed bookings(slot_date, start_time) pair, and of the batched
+backfill that fills that pair for existing rows.
+
+    python benchmarks/bench_day_window.py --sizes 100000 1000000
+"""
+import argparse
+import json
+import time
+from datetime import date, timedelta
+
+import _common
+from backend import database
+from backend.routes.notifications import ALL_DUE_SQL
+
+TODAY_SQL = "SELECT * FROM bookings WHERE slot_date = ? ORDER BY start_time"
+
+
+def timed(db, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        db.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        _common.use_database()
+        app = _common.get_app()
+        _common.init_schema(app)
+        _common.seed_bookings(app, size)
+        with app.app_context():
+            db = database.get_db()
+            db.execute("UPDATE bookings SET slot_date = NULL, start_time = NULL")
+            db.commit()
+            started = time.perf_counter()
+            database.backfill_booking_times(db)
+            backfill_s = time.perf_counter() - started
+
+            day = date.today()
+            today = timed(db, TODAY_SQL, (day.isoformat(),), args.repeat)
+            window = (day.isoformat(), (day + timedelta(days=2)).isoformat(), day.isoformat(), '00:00')
+            due = timed(db, ALL_DUE_SQL, window, args.repeat)
+            plan = ' / '.join(r['detail'] for r in db.execute('EXPLAIN QUERY PLAN ' + ALL_DUE_SQL, window))
+        results.append({
+            'bookings': size,
+            'backfill_s': round(backfill_s, 2),
+            'today_p50_ms': round(_common.percentile(today, 50), 3),
+            'today_p99_ms': round(_common.percentile(today, 99), 3),
+            'reminders_p50_ms': round(_common.percentile(due, 50), 3),
+            'reminders_p99_ms': round(_common.percentile(due, 99), 3),
+            'reminders_plan': plan,
+        })
+    print(json.dumps({'benchmark': 'day_window', 'results': results}, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
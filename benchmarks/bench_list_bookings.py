@@ -0,0 +1,80 @@
+"""
+Compares the buffered and streaming modes of GET /api/bookings.
+
+Each mode runs in its own process so peak RSS is not polluted by the other.
+Reports time-to-first-byte, total time, response size and peak RSS as JSON.
+
+    python benchmarks/bench_list_bookings.py --rows 200000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import _common
+
+MODES = {
+    'buffered': '/api/bookings',
+    'stream': '/api/bookings?stream=1',
+}
+
+
+def run_worker(mode, db_path):
+    _common.use_database(db_path)
+    app = _common.get_app()
+    client = app.test_client()
+    client.get('/api/bookings?limit=1')  # warm imports and the page cache
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    started = time.perf_counter()
+    res = client.get(MODES[mode], buffered=False)
+    chunks = iter(res.response)
+    first = next(chunks)
+    ttfb = time.perf_counter() - started
+    size = len(first)
+    for chunk in chunks:
+        size += len(chunk)
+    res.close()
+    total = time.perf_counter() - started
+
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        'mode': mode,
+        'ttfb_ms': round(ttfb * 1000, 1),
+        'total_ms': round(total * 1000, 1),
+        'bytes': size,
+        'peak_rss_mb': round(rss_peak / 1024, 1),
+        'rss_growth_mb': round((rss_peak - rss_before) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--db', help='reuse an existing database instead of seeding a new one')
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.db)
+        return
+
+    db_path = args.db
+    if not db_path:
+        db_path = _common.use_database()
+        app = _common.get_app()
+        _common.init_schema(app)
+        _common.seed_bookings(app, args.rows)
+
+    results = []
+    for mode in MODES:
+        out = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--worker', mode, '--db', db_path])
+        results.append(json.loads(out.decode().strip().splitlines()[-1]))
+    print(json.dumps({'benchmark': 'list_bookings', 'rows': args.rows, 'results': results}, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
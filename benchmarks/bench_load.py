@@ -0,0 +1,248 @@
+"""
+Load test of the booking API over real HTTP.
+
+Seeds a throwaway database, serves the app with werkzeug's threaded WSGI
+server on a free local port and drives one or more request mixes from
+--threads client threads, each over its own keep-alive connection:
+
+    rush     the 07:00 booking rush: POST /api/bookings from fresh patients
+             onto a few slots until they are full (then 400 "full")
+    poll     patients polling GET /api/notifications?user_id= and
+             GET /api/bookings?user_id=&limit=20
+    checkin  admin check-in: GET /api/bookings/verify/<card_id>, then
+             PUT /api/bookings/<id> {"status": "arrived"}
+    mixed    70% poll, 20% rush, 10% checkin
+
+Each mix prints latency percentiles, throughput and status counts as JSON,
+overall and per endpoint. Runs are reproducible for a given --seed; compare
+the output across commits.
+
+    python benchmarks/bench_load.py --mix all --seconds 10 --threads 16 --out load.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import random
+import subprocess
+import threading
+import time
+from datetime import date, timedelta
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+import _common
+from backend import database
+
+MIXES = ('rush', 'poll', 'checkin', 'mixed')
+RUSH_TIMES = ('07:00', '07:30', '08:00')
+
+
+class KeepAliveHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def seed(app, users, rush_users, history, rush_capacity):
+    """Patients 1..users have history and one active booking each; users+1.. are fresh for the rush."""
+    with app.app_context():
+        db = database.get_db()
+        db.executemany(
+            "INSERT INTO users (ID_user, firstname, lastname, tel, email, card_id, hash_password) VALUES (?,?,?,?,?,?,?)",
+            [(i, f'ผู้ป่วย{i}', 'ทดสอบ', f'08{i:08d}', f'u{i}@bench', str(1100000000000 + i), 'pw')
+             for i in range(1, users + rush_users + 1)]
+        )
+        db.commit()
+    if history:
+        _common.seed_bookings(app, history, users=users)
+
+    today = date.today().isoformat()
+    tomorrow = (date.today() + timedelta(days=1)).isoformat()
+    with app.app_context():
+        db = database.get_db()
+        # Whatever the random history left active is cancelled, so that each
+        # patient has exactly the one active booking below
+        db.execute("UPDATE bookings SET booking_Status = 'cancelled' WHERE booking_Status = 'รอรับบริการ'")
+        db.executemany(
+            """INSERT INTO bookings (id_users, booking_at, booking_Status, patient_name, department_name, doctor_name, slot_date, start_time, qr_code)
+               VALUES (?, ?, 'รอรับบริการ', ?, 'อายุรกรรม', 'สมชาย ใจดี', ?, '09:00', ?)""",
+            [(i, f'{today} 09:00', f'ผู้ป่วย{i}', today, str(1100000000000 + i)) for i in range(1, users + 1)]
+        )
+        slot_ids = [db.execute(
+            "INSERT INTO appointment_slots (doctor_id, department_id, slot_date, start_time, end_time, max_capacity, current_booking, status) VALUES (1, 1, ?, ?, ?, ?, 0, 'available')",
+            (tomorrow, t, t, rush_capacity)
+        ).lastrowid for t in RUSH_TIMES]
+        db.commit()
+    return slot_ids, tomorrow
+
+
+class Driver:
+    """Request functions of the mixes; each returns [(endpoint, status, seconds)]."""
+    def __init__(self, users, rush_users, slot_ids, rush_date):
+        self.users = users
+        self.slot_ids = slot_ids
+        self.rush_date = rush_date
+        self._next_patient = iter(range(users + 1, users + rush_users + 1))
+        self._lock = threading.Lock()
+
+    def call(self, conn, method, path, endpoint, body=None):
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            res = conn.getresponse()
+            data = res.read()
+            status = res.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            return (endpoint, 'error', time.perf_counter() - started), None
+        return (endpoint, status, time.perf_counter() - started), data
+
+    def rush(self, conn, rnd):
+        with self._lock:
+            user_id = next(self._next_patient, None)
+        slot_id = rnd.choice(self.slot_ids)
+        body = {'slot_id': slot_id, 'userId': user_id, 'date': self.rush_date, 'time': '07:00',
+                'departmentName': 'อายุรกรรม', 'doctorName': 'สมชาย ใจดี', 'patientName': f'ผู้ป่วย{user_id}'}
+        result, _ = self.call(conn, 'POST', '/api/bookings', 'POST /api/bookings', body)
+        return [result]
+
+    def poll(self, conn, rnd):
+        user_id = rnd.randint(1, self.users)
+        return [
+            self.call(conn, 'GET', f'/api/notifications?user_id={user_id}', 'GET /api/notifications')[0],
+            self.call(conn, 'GET', f'/api/bookings?user_id={user_id}&limit=20', 'GET /api/bookings')[0],
+        ]
+
+    def checkin(self, conn, rnd):
+        card_id = 1100000000000 + rnd.randint(1, self.users)
+        result, data = self.call(conn, 'GET', f'/api/bookings/verify/{card_id}', 'GET /api/bookings/verify')
+        results = [result]
+        if result[1] == 200:
+            booking_id = json.loads(data)['id']
+            results.append(self.call(conn, 'PUT', f'/api/bookings/{booking_id}', 'PUT /api/bookings/<id>', {'status': 'arrived'})[0])
+        return results
+
+    def mixed(self, conn, rnd):
+        pick = rnd.random()
+        if pick < 0.7:
+            return self.poll(conn, rnd)
+        if pick < 0.9:
+            return self.rush(conn, rnd)
+        return self.checkin(conn, rnd)
+
+
+def summarize(results, seconds):
+    latencies = [r[2] * 1000 for r in results]
+    statuses = {}
+    for r in results:
+        statuses[str(r[1])] = statuses.get(str(r[1]), 0) + 1
+    errors = sum(n for s, n in statuses.items() if s == 'error' or s.startswith('5'))
+    rejected = sum(n for s, n in statuses.items() if s.startswith('4'))
+    total = len(results)
+    return {
+        'requests': total,
+        'throughput_rps': round(total / seconds, 1),
+        'latency_ms': {
+            'p50': round(_common.percentile(latencies, 50), 2),
+            'p95': round(_common.percentile(latencies, 95), 2),
+            'p99': round(_common.percentile(latencies, 99), 2),
+            'max': round(max(latencies), 2) if latencies else 0.0,
+        },
+        'status': dict(sorted(statuses.items())),
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'rejected_rate': round(rejected / total, 4) if total else 0.0,
+    }
+
+
+def run_mix(name, driver, port, seconds, threads, seed_value):
+    results = [[] for _ in range(threads)]
+    deadline = time.perf_counter() + seconds
+
+    def loop(i):
+        rnd = random.Random(seed_value * 1000 + i)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        work = getattr(driver, name)
+        while time.perf_counter() < deadline:
+            results[i].extend(work(conn, rnd))
+        conn.close()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    flat = [r for rs in results for r in rs]
+    by_endpoint = {}
+    for r in flat:
+        by_endpoint.setdefault(r[0], []).append(r)
+    return {
+        'mix': name,
+        **summarize(flat, elapsed),
+        'endpoints': {ep: summarize(rs, elapsed) for ep, rs in sorted(by_endpoint.items())},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=_common.ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mix', choices=MIXES + ('all',), default='all')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--users', type=int, default=5000, help='patients with history and an active booking')
+    parser.add_argument('--rush-users', type=int, default=20000, help='fresh patients for the booking rush')
+    parser.add_argument('--rush-capacity', type=int, default=30, help='seats per rush slot (3 slots)')
+    parser.add_argument('--history', type=int, default=100000, help='past bookings to seed')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    path = _common.use_database()
+    app = _common.get_app()
+    _common.init_schema(app)
+    slot_ids, rush_date = seed(app, args.users, args.rush_users, args.history, args.rush_capacity)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        # Mixes run one after another on the same database: seats and check-ins
+        # used by an earlier mix stay used, and rush patients are not reused
+        driver = Driver(args.users, args.rush_users, slot_ids, rush_date)
+        mixes = MIXES if args.mix == 'all' else (args.mix,)
+        runs = [run_mix(name, driver, server.server_port, args.seconds, args.threads, args.seed) for name in mixes]
+    finally:
+        server.shutdown()
+
+    report = {
+        'benchmark': 'load',
+        'commit': git_commit(),
+        'threads': args.threads,
+        'seconds': args.seconds,
+        'users': args.users,
+        'history': args.history,
+        'seed': args.seed,
+        'database': path,
+        'runs': runs,
+    }
+    out = json.dumps(report, indent=2, ensure_ascii=False)
+    print(out)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(out + '\n')
+
+
+if __name__ == '__main__':
+    main()
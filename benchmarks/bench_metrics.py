@@ -0,0 +1,104 @@
+"""
+Cost of the request/SQL metrics (backend/metrics.py): requests/sec of a few
+endpoints served by an app built with metrics on and one built with METRICS=0.
+Both run in the same process on the same database, in bursts of --burst
+requests that alternate in random order. The overhead is the median over
+bursts of (time with metrics / time without) - 1, so drift in the machine's
+speed and the order of the bursts cancel out.
+
+    python benchmarks/bench_metrics.py --seconds 10
+
+GET /api/doctors is served from the catalog cache and is the worst case: the
+cheaper the request, the larger the share the metrics take.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+import _common
+from backend import database
+
+MODES = ('on', 'off')
+
+
+def build_apps():
+    from backend.app import create_app
+    apps = {}
+    for mode in MODES:
+        database.METRICS_ENABLED = mode == 'on'
+        apps[mode] = create_app()
+        apps[mode].config['TESTING'] = True
+    return apps
+
+
+def use_mode(mode):
+    # Pooled connections are created with or without the counting factory
+    database.METRICS_ENABLED = mode == 'on'
+    database.close_pools()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10, help='per endpoint, both modes together')
+    parser.add_argument('--burst', type=int, default=200, help='requests per mode before switching')
+    parser.add_argument('--history', type=int, default=20000, help='past bookings to seed')
+    parser.add_argument('--seed', type=int, default=1, help='order of the bursts')
+    args = parser.parse_args()
+
+    _common.use_database()
+    apps = build_apps()
+    _common.init_schema(apps['off'])
+    if args.history:
+        _common.seed_bookings(apps['off'], args.history, users=1000)
+    with apps['off'].app_context():
+        db = database.get_db()
+        slot_id = db.execute(
+            "INSERT INTO appointment_slots (doctor_id, slot_date, start_time, max_capacity, current_booking) VALUES (1, '2030-01-01', '09:00', 100000000, 0)"
+        ).lastrowid
+        db.commit()
+
+    body = {'slot_id': slot_id, 'date': '2030-01-01', 'time': '09:00', 'departmentName': 'อายุรกรรม', 'patientName': 'bench'}
+    requests = {
+        'GET /api/doctors': lambda c, i: c.get('/api/doctors'),
+        'GET /api/bookings?user_id=': lambda c, i: c.get(f'/api/bookings?user_id={i % 1000 + 1}&limit=20'),
+        'POST /api/bookings': lambda c, i: c.post('/api/bookings', json=body),
+    }
+    clients = {mode: app.test_client() for mode, app in apps.items()}
+    rnd = random.Random(args.seed)
+    results = {}
+    for name, request in requests.items():
+        spent = dict.fromkeys(MODES, 0.0)
+        ratios = []
+        deadline = time.perf_counter() + args.seconds
+        while time.perf_counter() < deadline:
+            burst = {}
+            for mode in rnd.sample(MODES, len(MODES)):
+                use_mode(mode)
+                # First request of a burst opens the connection; not timed
+                request(clients[mode], 0).close()
+                started = time.perf_counter()
+                for i in range(args.burst):
+                    res = request(clients[mode], i)
+                    # Metrics are recorded when the server closes the body
+                    res.close()
+                    if res.status_code >= 500:
+                        raise SystemExit(f'{name}: {res.status_code}')
+                burst[mode] = time.perf_counter() - started
+                spent[mode] += burst[mode]
+            ratios.append(burst['on'] / burst['off'])
+        done = args.burst * len(ratios)
+        results[name] = {
+            'rps_on': round(done / spent['on'], 1),
+            'rps_off': round(done / spent['off'], 1),
+            'overhead_pct': round((statistics.median(ratios) - 1) * 100, 2),
+            'bursts': len(ratios),
+        }
+
+    print(json.dumps({'benchmark': 'metrics', 'seconds': args.seconds, 'burst': args.burst, 'results': results},
+                     indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
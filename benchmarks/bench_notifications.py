@@ -0,0 +1,57 @@
+"""
+Latency of GET /api/notifications?user_id= as the bookings table grows.
+
+Every size keeps ~20 bookings per user, so a flat p50 means the endpoint costs
+what one user's bookings cost, not what the table costs.
+
+    python benchmarks/bench_notifications.py --sizes 10000 100000 500000
+"""
+import argparse
+import json
+import random
+import time
+
+import _common
+
+
+def measure(client, users, requests):
+    rnd = random.Random(7)
+    timings = []
+    for _ in range(requests):
+        uid = rnd.randrange(1, users + 1)
+        started = time.perf_counter()
+        res = client.get(f'/api/notifications?user_id={uid}')
+        timings.append((time.perf_counter() - started) * 1000)
+        assert res.status_code == 200, res.status_code
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 500000])
+    parser.add_argument('--per-user', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        _common.use_database()
+        app = _common.get_app()
+        _common.init_schema(app)
+        users = max(1, size // args.per_user)
+        _common.seed_bookings(app, size, users=users)
+        client = app.test_client()
+        measure(client, users, 20)  # warm-up
+        timings = measure(client, users, args.requests)
+        results.append({
+            'bookings': size,
+            'users': users,
+            'p50_ms': round(_common.percentile(timings, 50), 3),
+            'p95_ms': round(_common.percentile(timings, 95), 3),
+            'p99_ms': round(_common.percentile(timings, 99), 3),
+        })
+    print(json.dumps({'benchmark': 'notifications', 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Time to materialize a slot horizon with migrate_slots.extend_horizon.
+
+Runs the generator twice on a fresh database: the first run inserts every
+slot, the second only hits the unique index (what a daily job costs).
+
+    python benchmarks/bench_slots.py --doctors 500 --days 365
+"""
+import argparse
+import json
+import time
+
+import _common
+from backend import database, migrate_slots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doctors', type=int, default=500)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    path = _common.use_database()
+    conn = database.connect(path)
+    database.migrate(conn)
+    conn.executemany(
+        "INSERT INTO doctors (firstname, lastname, department, schedule) VALUES (?, ?, 'อายุรกรรม', 'จ-ศ 09:00-17:00')",
+        [(f'หมอ{i}', 'ทดสอบ') for i in range(args.doctors)]
+    )
+    conn.commit()
+
+    started = time.perf_counter()
+    created = migrate_slots.extend_horizon(conn, days=args.days)
+    first_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    again = migrate_slots.extend_horizon(conn, days=args.days)
+    rerun_s = time.perf_counter() - started
+    conn.close()
+
+    print(json.dumps({
+        'benchmark': 'slots',
+        'doctors': args.doctors,
+        'days': args.days,
+        'created': created,
+        'first_run_s': round(first_s, 2),
+        'rerun_created': again,
+        'rerun_s': round(rerun_s, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
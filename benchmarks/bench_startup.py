@@ -0,0 +1,53 @@
+"""
+Startup cost of database.init_db on a large bookings table.
+
+    current    schema already at the latest user_version (every normal start)
+    migration  user_version reset to 0, so every step and backfill runs again
+               in one transaction (the one-off upgrade of an old database)
+
+    python benchmarks/bench_startup.py --rows 1000000
+"""
+import argparse
+import json
+import time
+
+import _common
+from backend import database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    _common.use_database()
+    app = _common.get_app()
+    _common.init_schema(app)
+    _common.seed_bookings(app, args.rows)
+
+    with app.app_context():
+        db = database.get_db()
+        db.execute("PRAGMA user_version = 0")
+        started = time.perf_counter()
+        database.init_db()
+        migration_s = time.perf_counter() - started
+
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            database.init_db()
+            timings.append((time.perf_counter() - started) * 1e6)
+
+    print(json.dumps({
+        'benchmark': 'startup',
+        'rows': args.rows,
+        'steps': len(database.MIGRATIONS),
+        'migration_s': round(migration_s, 2),
+        'current_p50_us': round(_common.percentile(timings, 50), 1),
+        'current_p99_us': round(_common.percentile(timings, 99), 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
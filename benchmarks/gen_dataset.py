@@ -0,0 +1,271 @@
+"""
+Populates a fresh database file with production-sized, reproducible data.
+
+    python benchmarks/gen_dataset.py --db /tmp/big.db
+    python benchmarks/gen_dataset.py --db /tmp/small.db --users 5000 --doctors 50 --bookings 100000 --skew 0
+
+On top of the schema and catalog that init_db creates it adds:
+
+    users       --users patients with unique tel/email/card_id; the password of
+                everyone is "password123"; about a third logged in recently
+    doctors     up to --doctors in total, spread over the four departments,
+                each with one of the stock weekly schedules as rules
+    bookings    --bookings over --days days starting --start, with the detail
+                JSON and its columns filled in. Past days are 'arrived',
+                'cancelled' or 'ยกเลิก'; future days 'รอรับบริการ' (at most one
+                per patient, like create_booking enforces) or 'ยกเลิก'
+    slots       the appointment_slots rows those bookings hold, with matching
+                current_booking; --all-slots also writes every other slot the
+                schedules open in the window, as the old eager generator did
+
+Doctor popularity follows a Zipf law with exponent --skew (0 = uniform), so a
+few doctors are hot. Hot doctors fill up to capacity and further demand spills
+to the others. The same arguments give the same database; pin --today to
+reproduce one on another day.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from array import array
+from bisect import bisect
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+import _common
+from backend import database, schedules
+
+FIRST_NAMES = ['สมชาย', 'สมหญิง', 'วิชัย', 'สุดา', 'ประเสริฐ', 'มาลี', 'อนันต์', 'กนกวรรณ', 'ธนากร', 'พิมพ์ชนก',
+               'ศักดิ์ชัย', 'รัตนา', 'ณัฐพล', 'จันทร์เพ็ญ', 'กิตติ', 'อรุณี', 'ชัยวัฒน์', 'นภา', 'วรวุฒิ', 'ปิยะนุช']
+LAST_NAMES = ['ใจดี', 'รักษา', 'สุขสันต์', 'ทองดี', 'ศรีสุข', 'แก้วมณี', 'บุญมา', 'วงศ์ไทย', 'เจริญผล', 'มีสุข',
+              'พรหมมา', 'สายบุญ', 'ชัยมงคล', 'อินทร์แก้ว', 'ปัญญาดี', 'ศรีวงศ์', 'คงเจริญ', 'ทรัพย์มาก', 'นาคสวัสดิ์', 'รุ่งเรือง']
+SPECIALISTS = {
+    'med': ['อายุรกรรมทั่วไป', 'อายุรกรรมโรคหัวใจ', 'อายุรกรรมโรคไต', 'อายุรกรรมระบบทางเดินหายใจ'],
+    'dent': ['ทันตกรรมทั่วไป', 'ทันตกรรมจัดฟัน', 'ศัลยกรรมช่องปาก'],
+    'ortho': ['ศัลยกรรมกระดูก', 'ศัลยกรรมกระดูกและข้อ', 'เวชศาสตร์การกีฬา'],
+    'pedia': ['กุมารเวชกรรม', 'ทารกแรกเกิด', 'กุมารเวชกรรมโรคภูมิแพ้'],
+}
+# The stock schedules of seed_catalog; each is a single rule
+SCHEDULES = ['จ-ศ 09:00-16:00', 'อ-พฤ 10:00-14:00', 'จ-ส 09:00-17:00', 'จ-ศ 13:00-19:00',
+             'จ,พ,ศ 09:00-12:00', 'พฤ 09:00-16:00', 'ทุกวัน 08:00-20:00', 'จ-ศ 08:00-16:00']
+IMAGES = ['https://cdn-icons-png.flaticon.com/512/3774/3774299.png', 'https://cdn-icons-png.flaticon.com/512/3774/3774293.png']
+SYMPTOMS = ['ไข้ ไอ เจ็บคอ', 'ปวดหัว เวียนศีรษะ', 'ปวดท้อง', 'ตรวจสุขภาพประจำปี', 'ปวดฟัน', 'ขูดหินปูน',
+            'ปวดเข่า', 'ปวดหลัง', 'ผื่นคัน', 'ติดตามอาการ', 'ฉีดวัคซีน', 'ความดันสูง']
+PASSWORD = 'password123'
+# A slot with at least one seat left
+HAS_SEAT = re.compile(b'[^\x00]')
+
+
+class Doctor:
+    """One doctor's slots in the window: remaining seats and assigned slot_id per (day, time) cell."""
+    def __init__(self, row, department_id, window, capacity):
+        self.id = row['id_doctor']
+        self.department_id = department_id
+        self.name = f"{row['firstname']} {row['lastname']}"
+        self.department_name = schedules.DEPARTMENT_NAMES.get(row['department'], row['department'])
+        weekdays, start, end = schedules.rules_from_text(row['schedule'])[0]
+        self.days = [d.isoformat() for d in window if weekdays >> d.weekday() & 1]
+        self.times = list(schedules.rule_times({'start_time': start, 'end_time': end, 'slot_minutes': None}))
+        cells = len(self.days) * len(self.times)
+        self.capacity = capacity
+        self.seats = bytearray([capacity]) * cells
+        self.left = capacity * cells
+        self.slot_ids = array('i', bytes(4 * cells))
+
+    def cell(self, rnd, need_seat):
+        """A random (day, time) cell; with need_seat one that still has a seat, which it takes."""
+        cells = len(self.seats)
+        i = rnd.randrange(cells)
+        if need_seat and not self.seats[i]:
+            m = HAS_SEAT.search(self.seats, i) or HAS_SEAT.search(self.seats)
+            i = m.start()
+        if need_seat:
+            self.seats[i] -= 1
+            self.left -= 1
+        return i
+
+    def slot_rows(self, all_slots):
+        per_day = len(self.times)
+        for i, slot_id in enumerate(self.slot_ids):
+            if slot_id or all_slots:
+                start, end = self.times[i % per_day]
+                yield (slot_id or None, self.id, self.department_id, self.days[i // per_day], start, end,
+                       self.capacity, self.capacity - self.seats[i], 'available')
+
+
+def add_users(db, rnd, count, today, batch):
+    names = []
+    rows = []
+    for i in range(1, count + 1):
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+        names.append(f'{first} {last}')
+        born = date(1940, 1, 1) + timedelta(days=rnd.randrange(365 * 80))
+        created = datetime.combine(today - timedelta(days=rnd.randrange(1, 1500)), datetime.min.time())
+        last_login = None
+        if rnd.random() < 0.35:
+            last_login = (datetime.combine(today, datetime.min.time()) - timedelta(minutes=rnd.randrange(60 * 24 * 60))).isoformat()
+        rows.append((i, first, last, f'0{800000000 + i}', f'patient{i}@example.com', str(1100000000000 + i),
+                     PASSWORD, born.isoformat(), created.isoformat(), last_login))
+        if len(rows) >= batch:
+            db.executemany("INSERT INTO users (ID_user, firstname, lastname, tel, email, card_id, hash_password, birth_day, created_at, last_login) VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+            rows = []
+    db.executemany("INSERT INTO users (ID_user, firstname, lastname, tel, email, card_id, hash_password, birth_day, created_at, last_login) VALUES (?,?,?,?,?,?,?,?,?,?)", rows)
+    return names
+
+
+def add_doctors(db, rnd, total):
+    have = db.execute("SELECT count(*) FROM doctors").fetchone()[0]
+    codes = sorted(SPECIALISTS)
+    for n in range(have + 1, total + 1):
+        code, schedule = rnd.choice(codes), rnd.choice(SCHEDULES)
+        cur = db.execute(
+            "INSERT INTO doctors (firstname, lastname, doctor_id, department, specialist, status, schedule, image, status_color) VALUES (?,?,?,?,?,?,?,?,?)",
+            (rnd.choice(FIRST_NAMES), f'{rnd.choice(LAST_NAMES)} {n}', f'D{n:03d}', code, rnd.choice(SPECIALISTS[code]),
+             'ว่างวันนี้', schedule, rnd.choice(IMAGES), 'text-green-600')
+        )
+        schedules.replace_rules_from_text(db, cur.lastrowid, schedule)
+
+
+def add_bookings(db, rnd, doctors, names, count, today, skew, batch):
+    """Returns the number of bookings written (less than count only if every seat is taken)."""
+    # Popularity rank is independent of insertion order; a doctor who never
+    # works inside the window cannot be booked at all
+    ranked = [d for d in doctors if d.seats]
+    rnd.shuffle(ranked)
+    open_docs = ranked[:]
+    cum_weights = list(accumulate(1 / (rank + 1) ** skew for rank in range(len(ranked))))
+    today_iso = today.isoformat()
+    next_slot_id = 1
+    active_users = set()
+    rows = []
+    written = 0
+    sql = """INSERT INTO bookings (id_users, slot_id, booking_at, booking_Status, detail, qr_code, created_at, updated_at,
+                                   patient_name, doctor_name, department_name, symptoms, slot_date, start_time)
+             VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)"""
+    while written < count:
+        user_id = rnd.randrange(1, len(names) + 1)
+        cancelled = rnd.random() < 0.2
+        doc = ranked[bisect(cum_weights, rnd.random() * cum_weights[-1])]
+        if not cancelled and not doc.left:
+            # Full doctor: the patient settles for anyone with a free seat
+            if not open_docs:
+                break
+            doc = rnd.choice(open_docs)
+        i = doc.cell(rnd, need_seat=not cancelled)
+        if not doc.left and doc in open_docs:
+            open_docs.remove(doc)
+        if not doc.slot_ids[i]:
+            doc.slot_ids[i] = next_slot_id
+            next_slot_id += 1
+        slot_date = doc.days[i // len(doc.times)]
+        start_time = doc.times[i % len(doc.times)][0]
+
+        if cancelled:
+            status = rnd.choice(('cancelled', 'ยกเลิก'))
+        elif slot_date < today_iso:
+            status = 'arrived'
+        elif user_id in active_users:
+            # Booking again cancels the previous active booking
+            status = 'ยกเลิก'
+        else:
+            status = 'รอรับบริการ'
+            active_users.add(user_id)
+
+        created = datetime.fromisoformat(f'{slot_date}T{start_time}') - timedelta(minutes=rnd.randrange(60, 60 * 24 * 30))
+        symptoms = rnd.choice(SYMPTOMS)
+        detail = {'symptoms': symptoms, 'doctorName': doc.name, 'departmentName': doc.department_name,
+                  'patientName': names[user_id - 1]}
+        rows.append((user_id, doc.slot_ids[i], f'{slot_date} {start_time}', status, json.dumps(detail, ensure_ascii=False),
+                     str(1100000000000 + user_id), created.isoformat(), created.isoformat(),
+                     names[user_id - 1], doc.name, doc.department_name, symptoms, slot_date, start_time))
+        written += 1
+        if len(rows) >= batch:
+            db.executemany(sql, rows)
+            rows = []
+    db.executemany(sql, rows)
+    return written
+
+
+def add_slots(db, doctors, all_slots, batch):
+    rows = []
+    written = 0
+    for doc in doctors:
+        for row in doc.slot_rows(all_slots):
+            rows.append(row)
+            if len(rows) >= batch:
+                db.executemany("INSERT INTO appointment_slots (slot_id, doctor_id, department_id, slot_date, start_time, end_time, max_capacity, current_booking, status) VALUES (?,?,?,?,?,?,?,?,?)", rows)
+                written += len(rows)
+                rows = []
+    db.executemany("INSERT INTO appointment_slots (slot_id, doctor_id, department_id, slot_date, start_time, end_time, max_capacity, current_booking, status) VALUES (?,?,?,?,?,?,?,?,?)", rows)
+    return written + len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', required=True, help='database file to create')
+    parser.add_argument('--force', action='store_true', help='replace --db if it exists')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--doctors', type=int, default=500, help='doctors in total, the 8 stock ones included')
+    parser.add_argument('--bookings', type=int, default=2000000)
+    parser.add_argument('--days', type=int, default=365, help='length of the booking window')
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(), help='day that splits past from future')
+    parser.add_argument('--start', type=date.fromisoformat, help='first day of the window (default: 300 days before --today)')
+    parser.add_argument('--capacity', type=int, default=schedules.DEFAULT_CAPACITY, help='seats per slot (max 255)')
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent of doctor popularity; 0 = uniform')
+    parser.add_argument('--all-slots', action='store_true', help='also write the slots nobody booked')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--batch', type=int, default=50000, help='rows per executemany')
+    args = parser.parse_args()
+    if not 1 <= args.capacity <= 255:
+        parser.error('--capacity must be between 1 and 255')
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f'{args.db} exists; pass --force to replace it')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    started = time.perf_counter()
+    _common.use_database(args.db)
+    app = _common.get_app()
+    _common.init_schema(app)
+
+    rnd = random.Random(args.seed)
+    today = args.today
+    first = args.start or today - timedelta(days=300)
+    window = list(schedules.day_range(first, first + timedelta(days=args.days - 1)))
+
+    db = database.connect(args.db)
+    # A throwaway file: no need to survive a crash halfway
+    db.execute("PRAGMA synchronous = OFF")
+    with db:
+        names = add_users(db, rnd, args.users, today, args.batch)
+        add_doctors(db, rnd, args.doctors)
+        doctors = [Doctor(row, schedules.department_id_for(db, row['department']), window, args.capacity)
+                   for row in db.execute("SELECT * FROM doctors ORDER BY id_doctor").fetchall()]
+        bookings = add_bookings(db, rnd, doctors, names, args.bookings, today, args.skew, args.batch)
+        slots = add_slots(db, doctors, args.all_slots, args.batch)
+    db.close()
+
+    print(json.dumps({
+        'database': args.db,
+        'users': args.users,
+        'doctors': len(doctors),
+        'bookings': bookings,
+        'slots': slots,
+        'window': [window[0].isoformat(), window[-1].isoformat()],
+        'skew': args.skew,
+        'seed': args.seed,
+        'seconds': round(time.perf_counter() - started, 1),
+        'size_mb': round(os.path.getsize(args.db) / 2**20, 1),
+    }, indent=2, ensure_ascii=False))
+    if bookings < args.bookings:
+        print(f'only {bookings} of {args.bookings} bookings fit: every seat in the window is taken', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()